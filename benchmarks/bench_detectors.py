@@ -0,0 +1,147 @@
+"""
+Detector benchmark on data from SyntheticDataGenerator: times data generation,
+input preparation and every detector (plus the streaming update/finalize path
+with --chunksize) across data sizes, with CPU time and peak memory, and writes
+machine-readable JSON results.
+
+Every detector runs in its own forked process, so peak RSS is not skewed by
+earlier runs. With --compare, stages that got slower than a previous results
+file by more than --tolerance are listed and the exit status is 1.
+
+Usage:
+    python benchmarks/bench_detectors.py --rows 100000 1000000 --output bench.json
+    python benchmarks/bench_detectors.py --rows 100000 1000000 --compare bench.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+import ih_korupsi
+from ih_korupsi.core.engine import FraudEngine
+from ih_korupsi.utils.synthetic import SyntheticDataGenerator
+
+# Stages faster than this in the baseline are too noisy to call regressions.
+NOISE_FLOOR_S = 0.05
+
+
+def measure(func, queue):
+    import resource
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        func()
+        status = "ok"
+    except Exception as e:
+        status = f"error: {e}"
+    seconds, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    queue.put((seconds, cpu, peak * 1024, status))
+
+
+def forked(func) -> dict:
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=measure, args=(func, queue))
+    proc.start()
+    seconds, cpu, peak, status = queue.get()
+    proc.join()
+    return {"seconds": seconds, "cpu_seconds": cpu, "peak_memory_bytes": peak, "status": status}
+
+
+def streamed(detector, df: pd.DataFrame, chunksize: int):
+    engine = FraudEngine()
+    state = detector.init_state()
+    for start in range(0, len(df), chunksize):
+        chunk = engine.prepare_inputs(df.iloc[start:start + chunksize])[detector.name]
+        state = detector.update_state(state, chunk)
+    detector.finalize(state)
+
+
+def environment() -> dict:
+    return {
+        "ih_korupsi": ih_korupsi.__version__,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": pd.Timestamp.now().isoformat(timespec="seconds")
+    }
+
+
+def compare(results: list, baseline_path: str, tolerance: float) -> list:
+    with open(baseline_path) as f:
+        baseline = {(r["rows"], r["stage"]): r for r in json.load(f)["results"]}
+    regressions = []
+    for result in results:
+        old = baseline.get((result["rows"], result["stage"]))
+        if old is None or old["seconds"] < NOISE_FLOOR_S or result["status"] != "ok":
+            continue
+        ratio = result["seconds"] / old["seconds"]
+        print(f"{result['rows']:>12,}  {result['stage']:<36} {old['seconds']:8.2f} s -> {result['seconds']:8.2f} s  ({ratio:.2f}x)")
+        if ratio > 1 + tolerance:
+            regressions.append({**result, "baseline_seconds": old["seconds"], "ratio": ratio})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detector benchmark on synthetic data")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000], help="Data sizes")
+    parser.add_argument("--vendors", type=int, default=5000)
+    parser.add_argument("--agencies", type=int, default=100)
+    parser.add_argument("--cycles", type=int, default=50, help="Planted payment cycles")
+    parser.add_argument("--chunksize", type=int, help="Also benchmark the streaming path with chunks of this many rows")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=str, help="Write the results as JSON to this path")
+    parser.add_argument("--compare", type=str, metavar="PATH", help="Results JSON of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Slowdown (fraction) reported as a regression")
+    args = parser.parse_args()
+
+    generator = SyntheticDataGenerator(vendors=args.vendors, agencies=args.agencies, cycles=args.cycles, seed=args.seed)
+    engine = FraudEngine()
+    results = []
+
+    def record(rows: int, stage: str, measured: dict):
+        results.append({"rows": rows, "stage": stage, **measured})
+        memory = measured["peak_memory_bytes"]
+        status = "" if measured["status"] == "ok" else f"  [{measured['status']}]"
+        print(f"{rows:>12,}  {stage:<36} {measured['seconds']:8.2f} s  cpu {measured['cpu_seconds']:8.2f} s  peak +{memory / 2**20:8.1f} MB{status}")
+
+    for rows in args.rows:
+        record(rows, "generate", forked(lambda: generator.generate(rows)))
+        df = generator.generate(rows)
+        record(rows, "prepare_inputs", forked(lambda: engine.prepare_inputs(df)))
+        inputs = engine.prepare_inputs(df)
+        for detector in engine.detectors:
+            record(rows, detector.name, forked(lambda: detector.run(inputs[detector.name])))
+            if args.chunksize:
+                record(rows, f"{detector.name} (streaming)", forked(lambda: streamed(detector, df, args.chunksize)))
+        del df, inputs
+
+    report = {"environment": environment(), "parameters": vars(args), "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"Results saved to {args.output}")
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} stage(s) slower than {args.compare} by more than {args.tolerance:.0%}:")
+            for r in regressions:
+                print(f"  {r['rows']:,} rows, {r['stage']}: {r['ratio']:.2f}x")
+            sys.exit(1)
+        print(f"No regressions against {args.compare}.")
+
+
+if __name__ == "__main__":
+    main()
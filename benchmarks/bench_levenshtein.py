@@ -0,0 +1,89 @@
+"""
+Microbenchmark: StringDetective.levenshtein_ratio (one pair per call) versus
+StringDetective.batch_ratio (one name against many candidates per call).
+
+Usage:
+    python benchmarks/bench_levenshtein.py --candidates 5000 --repeat 3
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ih_korupsi.detectors.string_detective import StringDetective
+
+PREFIXES = ["PT.", "PT", "CV.", "CV", "UD.", "PD.", "Koperasi"]
+WORDS = [
+    "Maju", "Jaya", "Sumber", "Makmur", "Berdikari", "Sejahtera", "Abadi", "Karya",
+    "Mandiri", "Sentosa", "Utama", "Bangun", "Cipta", "Nusantara", "Persada", "Mega",
+    "Prima", "Tunggal", "Agung", "Rejeki", "Lestari", "Bersama", "Teknik", "Konstruksi",
+    "Sarana", "Mitra", "Global", "Perkasa", "Kencana", "Wijaya", "Santoso", "Hidayat",
+]
+SUFFIXES = ["", "", "", " Tbk", " (Persero)", " Indonesia"]
+
+
+def company_name(rng: random.Random) -> str:
+    words = " ".join(rng.sample(WORDS, rng.randint(2, 3)))
+    return f"{rng.choice(PREFIXES)} {words}{rng.choice(SUFFIXES)}"
+
+
+def variant(name: str, rng: random.Random) -> str:
+    chars = list(name)
+    pos = rng.randrange(len(chars))
+    op = rng.choice(["insert", "delete", "replace", "space"])
+    if op == "insert":
+        chars.insert(pos, rng.choice("abcdefghijklmnopqrstuvwxyz"))
+    elif op == "delete":
+        del chars[pos]
+    elif op == "replace":
+        chars[pos] = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    else:
+        chars.insert(pos, " ")
+    return "".join(chars)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Levenshtein kernel microbenchmark")
+    parser.add_argument("--candidates", type=int, default=5000, help="Candidates scored per name")
+    parser.add_argument("--names", type=int, default=5, help="Number of query names")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions (best is reported)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    detective = StringDetective()
+    queries = [company_name(rng).lower() for _ in range(args.names)]
+    candidates = []
+    for _ in range(args.candidates):
+        name = company_name(rng)
+        candidates.append((variant(name, rng) if rng.random() < 0.2 else name).lower())
+
+    def scalar():
+        return [[detective.levenshtein_ratio(q, c) for c in candidates] for q in queries]
+
+    def batch():
+        return [detective.batch_ratio(q, candidates).tolist() for q in queries]
+
+    assert scalar() == batch(), "batch_ratio disagrees with levenshtein_ratio"
+
+    results = {}
+    for label, fn in (("levenshtein_ratio", scalar), ("batch_ratio", batch)):
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        results[label] = best
+
+    pairs = args.names * args.candidates
+    print(f"{pairs:,} comparisons, e.g. {queries[0]!r} vs {candidates[0]!r}")
+    for label, seconds in results.items():
+        print(f"{label:>18}: {seconds:8.3f} s  ({pairs / seconds:12,.0f} pairs/s)")
+    print(f"{'speed-up':>18}: {results['levenshtein_ratio'] / results['batch_ratio']:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Load-time and memory benchmark: pd.read_csv of a full CSV dump versus
+DataLoader.load of the same data converted to Parquet/Feather, with the
+engine's column projection and an optional date range pushed down.
+
+Every measurement runs in its own forked process, so peak RSS is not skewed
+by earlier runs. Requires pyarrow.
+
+Usage:
+    python benchmarks/bench_loading.py --rows 2000000 --date-from 2025-10-01
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from ih_korupsi.core.engine import FraudEngine
+from ih_korupsi.utils.data_loader import DataLoader
+
+
+def write_csv(path: str, rows: int, seed: int):
+    rng = np.random.default_rng(seed)
+    vendor_ids = rng.integers(0, 5000, rows)
+    vendor_names = np.array([f"PT. Vendor {i}" for i in range(5000)], dtype=object)[vendor_ids]
+    days = np.sort(rng.integers(0, 365, rows))
+    pd.DataFrame({
+        "transaction_id": np.arange(rows),
+        "date": (pd.Timestamp("2025-01-01") + pd.to_timedelta(days, unit="D")).strftime("%Y-%m-%d"),
+        "amount": rng.lognormal(10, 1.5, rows).round(2),
+        "vendor_name": vendor_names,
+        "vendor_id": vendor_ids,
+        "sender_id": "Treasury_Dept",
+        "receiver_id": vendor_names,
+        "memo": "Pengadaan barang dan jasa",
+    }).to_csv(path, index=False)
+
+
+def measure(label, load, queue):
+    import resource
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    df = load()
+    seconds = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    queue.put((label, seconds, peak * 1024, len(df), len(df.columns)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV versus Parquet/Feather loading benchmark")
+    parser.add_argument("--rows", type=int, default=1000000, help="Rows in the generated dump")
+    parser.add_argument("--date-from", type=str, help="Also benchmark a pushed-down date range starting here")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    columns = FraudEngine().input_columns()
+    date_range = (args.date_from, None) if args.date_from else None
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "dump.csv")
+        write_csv(csv_path, args.rows, args.seed)
+        paths = {"parquet": os.path.join(tmp, "dump.parquet"), "feather": os.path.join(tmp, "dump.feather")}
+        for fmt, path in paths.items():
+            DataLoader.convert_csv(csv_path, path, fmt, chunksize=max(args.rows // 20, 1))
+
+        cases = [
+            ("read_csv (all columns)", lambda: pd.read_csv(csv_path)),
+            ("csv, projected", lambda: DataLoader.load(csv_path, "csv", columns)),
+            ("parquet, projected", lambda: DataLoader.load(paths["parquet"], "parquet", columns)),
+            ("feather, projected", lambda: DataLoader.load(paths["feather"], "feather", columns)),
+        ]
+        if date_range:
+            cases.append((f"parquet, from {args.date_from}", lambda: DataLoader.load(paths["parquet"], "parquet", columns, date_range)))
+
+        sizes = {"csv": os.path.getsize(csv_path), **{fmt: os.path.getsize(p) for fmt, p in paths.items()}}
+        print(f"{args.rows:,} rows; file sizes: " + ", ".join(f"{fmt} {size / 2**20:.1f} MB" for fmt, size in sizes.items()))
+
+        ctx = multiprocessing.get_context("fork")
+        for label, load in cases:
+            queue = ctx.Queue()
+            proc = ctx.Process(target=measure, args=(label, load, queue))
+            proc.start()
+            label, seconds, peak, rows, cols = queue.get()
+            proc.join()
+            print(f"{label:>26}: {seconds:7.2f} s  peak +{peak / 2**20:8.1f} MB  ({rows:,} rows x {cols} cols)")
+
+
+if __name__ == "__main__":
+    main()
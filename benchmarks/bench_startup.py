@@ -0,0 +1,91 @@
+"""
+Startup benchmark: times `python main.py --help` and the import of every
+registered detector module, each in a fresh interpreter, and checks the CLI
+against an import-time budget.
+
+--help must stay within --budget seconds (median of --repeat runs) and must not
+import any of the heavy analysis libraries; otherwise the exit status is 1.
+Per-module import times come from `python -X importtime`.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --budget 0.2 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ih_korupsi.core.registry import registry
+
+# Libraries --help must not import.
+HEAVY_MODULES = ("pandas", "numpy", "scipy", "networkx", "jinja2", "pyarrow")
+
+
+def timed(command: list, repeat: int) -> float:
+    """Median wall time of running command repeat times."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, capture_output=True, check=True)
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def import_times(command: list) -> dict:
+    """Import time in seconds per top-level package the command imports (the self time of all its modules)."""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", *command], cwd=ROOT, capture_output=True, text=True, check=True).stderr
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, _, module = line[len("import time:"):].split("|")
+        if own.strip().isdigit():
+            name = module.strip().split(".")[0]
+            totals[name] = totals.get(name, 0.0) + int(own) / 1e6
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI startup and detector import benchmark")
+    parser.add_argument("--budget", type=float, default=0.25, help="Seconds `main.py --help` may take")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement")
+    parser.add_argument("--output", type=str, help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    baseline = timed([sys.executable, "-c", "pass"], args.repeat)
+    help_seconds = timed([sys.executable, "main.py", "--help"], args.repeat)
+    heavy = sorted(set(import_times(["main.py", "--help"])) & set(HEAVY_MODULES))
+    print(f"{'python -c pass':<40} {baseline:8.3f} s")
+    print(f"{'main.py --help':<40} {help_seconds:8.3f} s  (budget {args.budget:.3f} s)")
+
+    detectors = {}
+    for name in registry.names():
+        module = registry.module(name)
+        seconds = timed([sys.executable, "-c", f"import {module}"], args.repeat)
+        detectors[name] = {"module": module, "seconds": seconds, "imports": import_times(["-c", f"import {module}"])}
+        top = sorted(detectors[name]["imports"].items(), key=lambda item: item[1], reverse=True)[:3]
+        print(f"{'import ' + name:<40} {seconds:8.3f} s  ({', '.join(f'{m} {s:.3f} s' for m, s in top)})")
+
+    results = {"python": baseline, "help": help_seconds, "budget": args.budget, "help_heavy_imports": heavy, "detectors": detectors}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+        print(f"Results saved to {args.output}")
+    if heavy:
+        print(f"main.py --help imports {', '.join(heavy)}")
+    if help_seconds > args.budget:
+        print(f"main.py --help took {help_seconds:.3f} s, over the {args.budget:.3f} s budget")
+    if heavy or help_seconds > args.budget:
+        sys.exit(1)
+    print("Within budget.")
+
+
+if __name__ == "__main__":
+    main()
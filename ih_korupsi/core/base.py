@@ -1,12 +1,26 @@
+import contextlib
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, ContextManager, Tuple
 import pandas as pd
+from .tracing import Tracer
+
+# Columns derived from the parsed 'date' column. The engine computes them once per
+# run and shares them with every detector that lists them in required_columns.
+DERIVED_COLUMNS = {
+    '_month': lambda dates: dates.dt.month,
+    '_day': lambda dates: dates.dt.normalize(),
+    '_year_month': lambda dates: dates.dt.to_period('M'),
+}
 
 class BaseDetector(ABC):
     """
     Base class for all forensic detectors in IH-Korupsi.
     Each detector must provide a deterministic mathematical explanation for its findings.
     """
+    _tracer: Optional[Tracer] = None
+    # Constructor options the partial state (init_state/update_state) depends on, or
+    # None for all of them. Runs differing only in other options can share a state.
+    state_options: Optional[Tuple[str, ...]] = None
     
     @property
     @abstractmethod
@@ -20,14 +34,92 @@ class BaseDetector(ABC):
         """Returns a brief description of the detector's logic."""
         pass
 
+    @property
+    def required_columns(self) -> Optional[List[str]]:
+        """
+        Columns read by run() with its default arguments, or None for all columns.
+        The engine passes each detector a projection containing only these columns.
+        """
+        return None
+
     @abstractmethod
     def run(self, df: pd.DataFrame, **kwargs) -> Dict[str, Any]:
         """
         Executes the detection logic on the provided DataFrame.
+        The DataFrame is shared with other detectors and must be treated as read-only.
         Returns a dictionary containing findings, statistics, and flagged records.
         """
         pass
 
+    def init_state(self) -> Any:
+        """
+        Returns an empty partial state for streaming (chunked) execution.
+
+        Streaming runs call update_state() once per chunk, may combine states built
+        from different chunks with merge_states() (in chunk order), and call
+        finalize() once to produce the same findings as run() on the whole input.
+        The default keeps the chunks themselves; detectors override these methods
+        with compact, mergeable summaries.
+        """
+        return []
+
+    def update_state(self, state: Any, df: pd.DataFrame, **kwargs) -> Any:
+        """Folds one chunk into the partial state (possibly in place) and returns it."""
+        return state + [df]
+
+    def merge_states(self, left: Any, right: Any) -> Any:
+        """Combines the states of two consecutive runs of chunks."""
+        return left + right
+
+    def finalize(self, state: Any, **kwargs) -> Dict[str, Any]:
+        """Turns a partial state into findings, in the same format as run()."""
+        return self.run(pd.concat(state, ignore_index=True), **kwargs)
+
+    def state_from_sql(self, source: Any) -> Optional[Any]:
+        """
+        Builds the partial state from aggregate queries pushed down to a SQL
+        source (utils.sql_source.SQLSource), or returns None when the detector
+        needs the rows themselves, which the engine then streams to update_state().
+        """
+        return None
+
+    def set_tracer(self, tracer: Optional[Tracer]):
+        """Attaches a Tracer that records this detector's spans (None detaches it)."""
+        self._tracer = tracer
+
+    def span(self, name: str, rows: Optional[int] = None, **args) -> ContextManager[Dict[str, Any]]:
+        """
+        Times one sub-step (e.g. 'benford_test') when a Tracer is attached, and is a
+        no-op otherwise. Set span["rows"] inside the block if the count comes later.
+        """
+        if self._tracer is None:
+            return contextlib.nullcontext({})
+        return self._tracer.span(name, self.name, rows, **args)
+
+    @staticmethod
+    def plain(series: pd.Series) -> pd.Series:
+        """Decodes a categorical column so keys from different chunks compare equal."""
+        if not isinstance(series.dtype, pd.CategoricalDtype):
+            return series
+        dtype = series.cat.categories.dtype
+        if series.hasnans and dtype.kind in 'iub':
+            # Same dtype read_csv infers for an integer column with missing values.
+            dtype = 'float64'
+        return series.astype(dtype)
+
+    @staticmethod
+    def _derived(df: pd.DataFrame, date_col: str, column: str) -> pd.Series:
+        """
+        Returns a shared derived column when the engine provided it, otherwise
+        computes it locally without touching the caller's DataFrame.
+        """
+        if date_col == 'date' and column in df.columns:
+            return df[column]
+        dates = df[date_col]
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates)
+        return DERIVED_COLUMNS[column](dates)
+
     def explain(self, finding_id: str) -> str:
         """
         Provides a mathematical explanation for a specific finding.
@@ -0,0 +1,145 @@
+import hashlib
+import inspect
+import os
+import pickle
+import sys
+from types import ModuleType
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from .. import __version__
+from .base import BaseDetector
+
+def column_digest(series: pd.Series) -> str:
+    """
+    SHA-256 of a column's dtype and values. Fixed-width columns are hashed from
+    their raw buffer, categoricals from their categories and codes, and anything
+    else (strings, objects) from pandas' per-row hashes.
+    """
+    digest = hashlib.sha256(str(series.dtype).encode())
+    values = series.array
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        digest.update(pd.util.hash_pandas_object(series.cat.categories.to_series(), index=False).to_numpy().tobytes())
+        digest.update(np.ascontiguousarray(series.cat.codes.to_numpy()).tobytes())
+    elif isinstance(series.dtype, pd.PeriodDtype):
+        digest.update(np.ascontiguousarray(values.asi8).tobytes())
+    elif isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biufcmM':
+        digest.update(np.ascontiguousarray(series.to_numpy()).tobytes())
+    else:
+        digest.update(pd.util.hash_pandas_object(series, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def index_digest(index: pd.Index) -> str:
+    """SHA-256 of a row index (detectors use it for rows without a transaction ID)."""
+    if isinstance(index, pd.RangeIndex):
+        return hashlib.sha256(repr((index.start, index.stop, index.step)).encode()).hexdigest()
+    return column_digest(index.to_series())
+
+class ResultCache:
+    """
+    Content-addressed on-disk cache of detector findings.
+
+    A detector's findings are stored under a hash of everything they depend on:
+    the detector class, its parameters, the package version and the source of its
+    module and of the package modules it uses, and the digest of every input column it reads. Changing a column only
+    invalidates the detectors that read it. Entries are pickled (only point this at
+    directories you trust), and the least recently used ones are evicted once the
+    directory grows beyond max_bytes.
+    """
+    def __init__(self, directory: str, max_bytes: int = 1 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    @staticmethod
+    def dependencies(module: ModuleType) -> List[ModuleType]:
+        """
+        module and, transitively, the modules of this package and of its own that
+        it refers to at module level (imported modules, classes, functions and
+        instances), sorted by name.
+        """
+        packages = {__name__.split('.')[0], module.__name__.split('.')[0]}
+        found = {}
+        pending = [module]
+        while pending:
+            current = pending.pop()
+            if current.__name__ in found:
+                continue
+            found[current.__name__] = current
+            for value in vars(current).values():
+                name = value.__name__ if inspect.ismodule(value) else getattr(value, '__module__', None)
+                if isinstance(name, str) and name.split('.')[0] in packages and name not in found and name in sys.modules:
+                    pending.append(sys.modules[name])
+        return [found[name] for name in sorted(found)]
+
+    @staticmethod
+    def detector_version(detector: BaseDetector) -> str:
+        """Package version plus a digest of the source of the detector's module and its dependencies."""
+        digest = hashlib.sha256()
+        for module in ResultCache.dependencies(inspect.getmodule(type(detector))):
+            try:
+                source = inspect.getsource(module)
+            except (OSError, TypeError):
+                source = ""
+            digest.update(f"{module.__name__}\n{source}\n".encode())
+        return f"{__version__}:{digest.hexdigest()}"
+
+    def key(self, detector: BaseDetector, df: pd.DataFrame, digests: Optional[Dict[str, str]] = None) -> str:
+        """
+        Cache key of running detector on df. digests memoizes column digests, so
+        columns shared by several detectors are hashed once per run.
+        """
+        digests = {} if digests is None else digests
+        parts = [
+            f"{type(detector).__module__}.{type(detector).__qualname__}",
+            self.detector_version(detector),
+            # Private attributes (e.g. an attached tracer) do not affect the findings.
+            repr(sorted((k, v) for k, v in vars(detector).items() if not k.startswith('_')))
+        ]
+        if "__index__" not in digests:
+            digests["__index__"] = index_digest(df.index)
+        parts.append(digests["__index__"])
+        for column in df.columns:
+            if column not in digests:
+                digests[column] = column_digest(df[column])
+            parts.append(f"{column}={digests[column]}")
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                findings = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        # Reads refresh the modification time, which orders eviction.
+        os.utime(path)
+        return findings
+
+    def put(self, key: str, findings: Any):
+        path = self._path(key)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(findings, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        """Removes the least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pkl"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -1,22 +1,184 @@
-import json
-from typing import List, Dict, Any
+import contextlib
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+from multiprocessing.pool import Pool, ThreadPool
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Iterable, Union
 import pandas as pd
-from .base import BaseDetector
-from ..detectors.mathematician import Mathematician
-from ..detectors.connector import Connector
-from ..detectors.chronologist import Chronologist
-from ..detectors.string_detective import StringDetective
+from .base import BaseDetector, DERIVED_COLUMNS
+from .state_store import StateStore
+from .cache import ResultCache
+from .tracing import Tracer
+from .registry import registry
+from .risk_index import RiskIndex
+from ..utils.report_writer import ReportWriter
+from ..utils.data_loader import DataLoader, DateRange
+from ..utils.sql_source import SQLSource
+
+EXECUTION_MODES = ('sequential', 'thread', 'process')
+
+# Detector inputs published before a fork-based process pool starts, so workers
+# inherit them copy-on-write instead of receiving pickled copies.
+_INHERITED_INPUTS: Dict[str, Tuple[BaseDetector, pd.DataFrame]] = {}
+
+def _rss_bytes() -> int:
+    """Current resident set size of this process (high-water mark where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class _PeakRSS:
+    """
+    Samples the process RSS on a daemon thread while a detector runs; used is the
+    peak growth over the RSS at the start, i.e. the memory the detector added.
+    Unlike tracemalloc this adds no per-allocation overhead, so it is safe to leave on.
+    """
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.start = self.peak = _rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss_bytes())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+
+    @property
+    def used(self) -> int:
+        return self.peak - self.start
+
+def _measured(func, args: Tuple, cpu_clock: str = 'process', track_memory: bool = True, tracer: Optional[Tracer] = None,
+              detector: Optional[BaseDetector] = None, label: str = 'run', rows: Optional[int] = None) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Calls func(*args) and measures it. Returns (result, stats); an exception is
+    returned as {"error": ..., "traceback": ...} with status "error". With a tracer,
+    the call is one span (label) of the detector, whose sub-step spans are recorded too.
+    """
+    clock = time.thread_time if cpu_clock == 'thread' else time.process_time
+    sampler = _PeakRSS()
+    status = "ok"
+    if tracer is not None and detector is not None:
+        detector.set_tracer(tracer)
+    category = detector.name if detector is not None else 'engine'
+    with sampler if track_memory else contextlib.nullcontext():
+        wall_start, cpu_start = time.perf_counter(), clock()
+        try:
+            with tracer.span(label, category, rows) if tracer else contextlib.nullcontext(), \
+                    tracer.profiled(f"{category}.{label}") if tracer else contextlib.nullcontext():
+                result = func(*args)
+        except Exception as e:
+            result = {"error": str(e), "traceback": traceback.format_exc()}
+            status = "error"
+        finally:
+            if tracer is not None and detector is not None:
+                detector.set_tracer(None)
+        wall_end, cpu_end = time.perf_counter(), clock()
+    stats = {
+        "status": status,
+        "wall_time_s": wall_end - wall_start,
+        "cpu_time_s": cpu_end - cpu_start,
+        "peak_memory_bytes": sampler.used if track_memory else None
+    }
+    return result, stats
+
+def _run_detector(detector: BaseDetector, df: pd.DataFrame, cpu_clock: str = 'process', track_memory: bool = True,
+                  trace_options: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Runs one detector and measures it. Module-level so process pools can pickle it.
+    Returns (findings, stats); failures are reported as {"error": ...} like before.
+    With trace_options, the spans and profile recorded by a Tracer built from them
+    are returned in stats["spans"] and stats["profiles"].
+    """
+    tracer = Tracer(**trace_options) if trace_options is not None else None
+    if tracer is not None:
+        tracer.start()
+    try:
+        findings, stats = _measured(detector.run, (df,), cpu_clock, track_memory, tracer, detector, 'run', len(df))
+    finally:
+        if tracer is not None:
+            tracer.stop()
+    if tracer is not None:
+        stats["spans"] = tracer.spans
+        stats["profiles"] = tracer.profiles()
+    return findings, stats
+
+def _run_inherited(name: str, cpu_clock: str, track_memory: bool, trace_options: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    detector, df = _INHERITED_INPUTS[name]
+    return _run_detector(detector, df, cpu_clock, track_memory, trace_options)
+
+# Engine of a partition pool worker, set up once per process by _init_partition_worker.
+_PARTITION_ENGINE: Optional['FraudEngine'] = None
+
+def _init_partition_worker(detectors: List[BaseDetector]):
+    global _PARTITION_ENGINE
+    _PARTITION_ENGINE = FraudEngine()
+    _PARTITION_ENGINE.detectors = detectors
+
+def _map_partition(task: Tuple) -> Dict[str, Any]:
+    return _PARTITION_ENGINE.map_partition(*task)
+
+def _empty_stats(detectors: Sequence[BaseDetector]) -> Dict[str, Dict[str, Any]]:
+    return {d.name: {"status": "ok", "wall_time_s": 0.0, "cpu_time_s": 0.0, "peak_memory_bytes": 0} for d in detectors}
+
+def _record(stats: Dict[str, Dict[str, Any]], outcomes: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]], name: str, result: Any, call_stats: Dict[str, Any]):
+    """
+    Adds one measured call of a folding run to the detector's totals. A failed
+    call ends the detector's run: its error becomes the detector's outcome.
+    """
+    for key in ("wall_time_s", "cpu_time_s"):
+        stats[name][key] += call_stats[key]
+    stats[name]["peak_memory_bytes"] = max(stats[name]["peak_memory_bytes"], call_stats["peak_memory_bytes"])
+    if call_stats["status"] != "ok":
+        stats[name]["status"] = call_stats["status"]
+        outcomes[name] = (result, stats[name])
 
 class FraudEngine:
     """
     Orchestration layer for IH-Korupsi.
+
+    Detectors are independent, so besides the default sequential mode they can run
+    concurrently on a thread or process pool. Per-detector timeouts (in seconds,
+    measured from submission) keep a runaway detector from blocking the report.
+    With a ResultCache, process() reuses the findings of detectors whose inputs
+    and configuration are unchanged since an earlier run. With a Tracer, engine
+    stages and detector sub-steps are recorded as spans, summarized per detector
+    in the report metadata.
+
+    detectors lists the detectors to run, as registry names (see
+    core.registry) or instances; by default every registered detector runs.
+    Detector modules are only imported once selected.
     """
-    def __init__(self):
+    def __init__(self, mode: str = 'sequential', workers: Optional[int] = None, timeout: Optional[float] = None, timeouts: Optional[Dict[str, float]] = None,
+                 cache: Optional[ResultCache] = None, tracer: Optional[Tracer] = None, detectors: Optional[Sequence[Union[str, BaseDetector]]] = None):
+        if mode not in EXECUTION_MODES:
+            raise ValueError(f"Unsupported execution mode: {mode}")
+        self.mode = mode
+        self.workers = workers
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        self.cache = cache
+        self.tracer = tracer
         self.detectors: List[BaseDetector] = [
-            Mathematician(),
-            Connector(),
-            Chronologist(),
-            StringDetective()
+            registry.create(detector) if isinstance(detector, str) else detector
+            for detector in (registry.names() if detectors is None else detectors)
         ]
 
     def process(self, df: pd.DataFrame) -> Dict[str, Any]:
@@ -29,16 +191,506 @@ class FraudEngine:
             "findings": {}
         }
 
+        if self.tracer is not None:
+            self.tracer.start()
+        try:
+            with self._span("prepare_inputs", len(df)):
+                inputs = self.prepare_inputs(df)
+            with self._span("cache_lookup"):
+                outcomes, keys = self._cached_outcomes(inputs)
+            pending = [d for d in self.detectors if d.name not in outcomes]
+            with self._span(f"run_detectors ({self.mode})"):
+                if self.mode == 'sequential':
+                    computed = self._run_sequential(pending, inputs)
+                else:
+                    computed = self._run_pool(pending, inputs) if pending else {}
+        finally:
+            if self.tracer is not None:
+                self.tracer.stop()
+        for name, (findings, stats) in computed.items():
+            if self.tracer is not None and "spans" in stats:
+                self.tracer.extend(stats["spans"], stats["profiles"])
+                stats["spans"] = Tracer.summarize(stats["spans"])
+                if not self.tracer.profile:
+                    del stats["profiles"]
+            if name in keys and stats["status"] == "ok":
+                self.cache.put(keys[name], findings)
+        outcomes.update(computed)
+
+        full_report["metadata"]["execution"] = {
+            "mode": self.mode,
+            "workers": self._worker_count() if self.mode != 'sequential' else 1
+        }
+        full_report["metadata"]["detectors"] = {}
         for detector in self.detectors:
-            print(f"Running {detector.name}...")
-            try:
-                full_report["findings"][detector.name] = detector.run(df)
-            except Exception as e:
-                full_report["findings"][detector.name] = {"error": str(e)}
+            findings, stats = outcomes[detector.name]
+            full_report["findings"][detector.name] = findings
+            full_report["metadata"]["detectors"][detector.name] = stats
 
         return full_report
 
-    def save_report(self, report: Dict[str, Any], output_path: str):
-        with open(output_path, 'w') as f:
-            json.dump(report, f, indent=4)
+    def process_chunks(self, chunks: Iterable[pd.DataFrame], store: Optional[StateStore] = None, batch_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Streaming variant of process() for inputs that do not fit in memory.
+
+        Every chunk is folded into each detector's partial state (see BaseDetector.init_state)
+        and the states are finalized once at the end, giving the same findings as process()
+        on the concatenated input. Detectors run sequentially, chunk by chunk; timing and
+        memory metrics are accumulated over all chunks.
+
+        With a StateStore the run is incremental: the new batch is folded into fresh
+        states, merged with the stored ones, and only the batch's own states are saved
+        as new segments (see StateStore), so the report covers every batch ingested so
+        far while only the new batch is read, parsed and written. A batch_id that was
+        already ingested is skipped, so re-running the same feed file does not double count.
+        """
+        if self.mode != 'sequential':
+            print(f"Streaming input: running detectors sequentially instead of in {self.mode} mode.")
+        states = {d.name: d.init_state() for d in self.detectors}
+        outcomes: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+        stats = _empty_stats(self.detectors)
+        total_rows, total_amount, chunk_count = 0, 0.0, 0
+        first_span = self._start_tracing()
+
+        stored, history = None, {}
+        if store is not None:
+            stored = store.load_metadata()
+            for detector in self.detectors:
+                for segment in store.load(detector.name, stored["segments"]):
+                    history[detector.name] = segment if detector.name not in history else detector.merge_states(history[detector.name], segment)
+            if batch_id is not None and batch_id in stored["batches"]:
+                print(f"Batch {batch_id} was already ingested; reporting the stored state.")
+                chunks = []
+
+        for chunk in chunks:
+            chunk_count += 1
+            total_rows += len(chunk)
+            total_amount += float(chunk['amount'].sum())
+            print(f"Processing chunk {chunk_count} ({total_rows} rows so far)...")
+            with self._span("prepare_inputs", len(chunk)):
+                inputs = self.prepare_inputs(chunk)
+            for detector in self.detectors:
+                if detector.name in outcomes:
+                    continue
+                states[detector.name], call_stats = _measured(detector.update_state, (states[detector.name], inputs[detector.name]),
+                                                              tracer=self.tracer, detector=detector, label='update_state', rows=len(chunk))
+                _record(stats, outcomes, detector.name, states[detector.name], call_stats)
+
+        batch = dict(states)
+        for detector in self.detectors:
+            if detector.name in outcomes or detector.name not in history:
+                continue
+            states[detector.name], call_stats = _measured(detector.merge_states, (history[detector.name], batch[detector.name]),
+                                                          tracer=self.tracer, detector=detector, label='merge_states')
+            _record(stats, outcomes, detector.name, states[detector.name], call_stats)
+        report = self._finalize_states(states, stats, outcomes, first_span, total_rows, total_amount,
+                                       {"mode": "sequential", "workers": 1, "chunks": chunk_count})
+        if store is not None:
+            totals, saved = self._save_states(store, states, batch, stored, stats, batch_id, total_rows, total_amount, chunk_count)
+            report["metadata"]["total_rows"] = totals["total_rows"]
+            report["metadata"]["total_amount"] = totals["total_amount"]
+            report["metadata"]["incremental"] = {
+                "state_dir": store.directory,
+                "batches_ingested": len(totals["batches"]),
+                "new_rows": total_rows,
+                "saved": saved
+            }
+        return report
+
+    def process_partitions(self, sources: List[str], type: str = 'csv', columns: Optional[List[str]] = None,
+                           date_range: Optional[DateRange] = None, chunksize: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Map-reduce variant of process_chunks() for datasets split over many files
+        (e.g. one export per agency per month, see DataLoader.expand_sources).
+
+        Partitions are read on a process pool (workers, default one per core).
+        Each worker folds its partition into fresh detector states (map side), so
+        only compact summaries travel back: digit counts and per-entity aggregates,
+        monthly sums, velocity events, the aggregated edge table and the distinct
+        names. The states are merged in partition order (reduce side) and finalized
+        once, giving the same findings as process() on the concatenated files.
+        """
+        workers = max(1, min(self.workers or os.cpu_count() or 1, len(sources)))
+        print(f"Processing {len(sources)} partitions on {workers} worker processes...")
+        states = {d.name: d.init_state() for d in self.detectors}
+        outcomes: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+        stats = _empty_stats(self.detectors)
+        total_rows, total_amount, chunk_count = 0, 0.0, 0
+        first_span = self._start_tracing()
+
+        tasks = [(source, type, columns, date_range, chunksize, self._trace_options()) for source in sources]
+        pool = Pool(workers, initializer=_init_partition_worker, initargs=(self.detectors,)) if workers > 1 else None
+        try:
+            # imap keeps partition order, so merging is deterministic.
+            results = pool.imap(_map_partition, tasks) if pool is not None else (self.map_partition(*task) for task in tasks)
+            for partition in results:
+                total_rows += partition["rows"]
+                total_amount += partition["amount"]
+                chunk_count += partition["chunks"]
+                if self.tracer is not None:
+                    self.tracer.extend(partition["spans"], partition["profiles"])
+                for detector in self.detectors:
+                    if detector.name in outcomes:
+                        continue
+                    state, call_stats = partition["states"][detector.name], partition["stats"][detector.name]
+                    _record(stats, outcomes, detector.name, state, call_stats)
+                    if detector.name in outcomes:
+                        continue
+                    states[detector.name], call_stats = _measured(detector.merge_states, (states[detector.name], state),
+                                                                  tracer=self.tracer, detector=detector, label='merge_states')
+                    _record(stats, outcomes, detector.name, states[detector.name], call_stats)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        return self._finalize_states(states, stats, outcomes, first_span, total_rows, total_amount,
+                                     {"mode": "partitioned", "workers": workers, "partitions": len(sources), "chunks": chunk_count})
+
+    def process_sql(self, source: SQLSource, chunksize: int = 100000) -> Dict[str, Any]:
+        """
+        SQL-backed variant of process_chunks() for a SQLite table.
+
+        Detectors that only need aggregates build their partial state from GROUP BY
+        queries pushed down to the database (see BaseDetector.state_from_sql), so
+        only the small results cross into Python. The others fold the rows of just
+        their columns, streamed once in chunks. All states are then finalized as usual.
+        """
+        states = {d.name: d.init_state() for d in self.detectors}
+        outcomes: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+        stats = _empty_stats(self.detectors)
+        first_span = self._start_tracing()
+
+        missing = source.suggested_indexes()
+        if missing:
+            print("Suggested indexes for faster queries (the database is opened read-only):\n  " + "\n  ".join(missing))
+        streamed = []
+        for detector in self.detectors:
+            print(f"Pushing {detector.name} aggregates down to SQLite...")
+            state, call_stats = _measured(detector.state_from_sql, (source,), tracer=self.tracer, detector=detector, label='state_from_sql')
+            _record(stats, outcomes, detector.name, state, call_stats)
+            if call_stats["status"] == "ok":
+                if state is None:
+                    streamed.append(detector)
+                else:
+                    stats[detector.name]["pushdown"] = True
+                    states[detector.name] = state
+
+        chunk_count = 0
+        if streamed:
+            columns = ['amount']
+            for detector in streamed:
+                columns += [c for c in detector.required_columns or source.table_columns() if c not in DERIVED_COLUMNS and c not in columns]
+            print(f"Streaming {', '.join(columns)} for {', '.join(d.name for d in streamed)}...")
+            for chunk in source.iter_chunks(columns, chunksize):
+                chunk_count += 1
+                with self._span("prepare_inputs", len(chunk)):
+                    inputs = self.prepare_inputs(chunk)
+                for detector in streamed:
+                    if detector.name in outcomes:
+                        continue
+                    states[detector.name], call_stats = _measured(detector.update_state, (states[detector.name], inputs[detector.name]),
+                                                                  tracer=self.tracer, detector=detector, label='update_state', rows=len(chunk))
+                    _record(stats, outcomes, detector.name, states[detector.name], call_stats)
+
+        total_rows, total_amount = source.totals()
+        return self._finalize_states(states, stats, outcomes, first_span, total_rows, total_amount,
+                                     {"mode": "sql", "workers": 1, "chunks": chunk_count})
+
+    def process_quick(self, chunks: Iterable[pd.DataFrame], sample_size: int = 100000, time_budget: Optional[float] = 60.0, **options: Any) -> Dict[str, Any]:
+        """
+        Quick triage instead of a full run (see core.quick_scan.QuickScan): the
+        Mathematician's Benford and outlier tests and the Chronologist's monthly
+        profile, estimated with confidence intervals from a stratified sample of
+        at most sample_size rows. Reading the chunks stops after time_budget
+        seconds. Runs the selected Mathematician and Chronologist instances, so
+        their settings apply; other detectors are skipped.
+        """
+        # Imported here: the quick scan builds on the Mathematician's module.
+        from .quick_scan import QuickScan
+        mathematician = next((d for d in self.detectors if isinstance(d, registry.load('mathematician'))), None)
+        chronologist = next((d for d in self.detectors if isinstance(d, registry.load('chronologist'))), None)
+        if mathematician is None and chronologist is None:
+            raise ValueError("The quick scan runs the Mathematician and the Chronologist; neither is selected")
+        scan = QuickScan(mathematician, chronologist, sample_size=sample_size, time_budget=time_budget, **options)
+        if self.tracer is not None:
+            self.tracer.start()
+        try:
+            start = time.perf_counter()
+            with self._span("quick_sample") as span:
+                reservoir, complete = scan.sample(chunks)
+                span["rows"] = reservoir.rows
+            with self._span("quick_estimates", len(reservoir.sample) if reservoir.sample is not None else 0):
+                report = scan.report(reservoir, complete, time.perf_counter() - start)
+        finally:
+            if self.tracer is not None:
+                self.tracer.stop()
+        report["metadata"]["execution"] = {"mode": "quick", "workers": 1}
+        return report
+
+    def map_partition(self, source: str, type: str = 'csv', columns: Optional[List[str]] = None, date_range: Optional[DateRange] = None,
+                      chunksize: Optional[int] = None, trace_options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Map side of process_partitions(): one partition folded into fresh detector
+        states, with its row count, amount and the measurements of every detector.
+        """
+        tracer = Tracer(**trace_options) if trace_options is not None else None
+        if tracer is not None:
+            tracer.start()
+        states = {d.name: d.init_state() for d in self.detectors}
+        stats = _empty_stats(self.detectors)
+        failed: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+        rows, amount, chunks = 0, 0.0, 0
+        try:
+            for chunk in DataLoader.iter_partition(source, type, chunksize, columns, date_range):
+                rows += len(chunk)
+                amount += float(chunk['amount'].sum())
+                chunks += 1
+                inputs = self.prepare_inputs(chunk)
+                for detector in self.detectors:
+                    if detector.name in failed:
+                        continue
+                    result, call_stats = _measured(detector.update_state, (states[detector.name], inputs[detector.name]),
+                                                   tracer=tracer, detector=detector, label='update_state', rows=len(chunk))
+                    if call_stats["status"] != "ok":
+                        result["error"] = f"{source}: {result['error']}"
+                    states[detector.name] = result
+                    _record(stats, failed, detector.name, result, call_stats)
+        finally:
+            if tracer is not None:
+                tracer.stop()
+        return {
+            "rows": rows,
+            "amount": amount,
+            "chunks": chunks,
+            "states": states,
+            "stats": stats,
+            "spans": tracer.spans if tracer is not None else [],
+            "profiles": tracer.profiles() if tracer is not None else {}
+        }
+
+    def _start_tracing(self) -> int:
+        """Starts the tracer of a folding run; returns the index of its first span."""
+        if self.tracer is None:
+            return 0
+        self.tracer.start()
+        return len(self.tracer.spans)
+
+    def _finalize_states(self, states: Dict[str, Any], stats: Dict[str, Dict[str, Any]], outcomes: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]],
+                         first_span: int, total_rows: int, total_amount: float, execution: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Shared end of the folding runs (process_chunks, process_partitions, process_sql):
+        finalizes the state of every detector that has not failed, stops the tracer and
+        attaches the spans since first_span to the detector stats, and assembles the report.
+        """
+        for detector in self.detectors:
+            if detector.name not in outcomes:
+                findings, call_stats = _measured(detector.finalize, (states[detector.name],), tracer=self.tracer, detector=detector, label='finalize')
+                _record(stats, outcomes, detector.name, findings, call_stats)
+                outcomes[detector.name] = (findings, stats[detector.name])
+        if self.tracer is not None:
+            self.tracer.stop()
+            spans = self.tracer.spans[first_span:]
+            profiles = self.tracer.profiles()
+            for detector in self.detectors:
+                stats[detector.name]["spans"] = Tracer.summarize([span for span in spans if span["category"] == detector.name])
+                if self.tracer.profile:
+                    stats[detector.name]["profiles"] = {key: top for key, top in profiles.items() if key.startswith(f"{detector.name}.")}
+
+        report = {
+            "metadata": {
+                "total_rows": total_rows,
+                "total_amount": total_amount,
+                "currency": "IDR",
+                "execution": execution,
+                "detectors": {}
+            },
+            "findings": {}
+        }
+        for detector in self.detectors:
+            findings, detector_stats = outcomes[detector.name]
+            report["findings"][detector.name] = findings
+            report["metadata"]["detectors"][detector.name] = detector_stats
+        return report
+
+    def _save_states(self, store: StateStore, states: Dict[str, Any], batch: Dict[str, Any], stored: Dict[str, Any], stats: Dict[str, Dict[str, Any]],
+                     batch_id: Optional[str], rows: int, amount: float, chunk_count: int) -> Tuple[Dict[str, Any], bool]:
+        """
+        Appends the batch's states as a new segment, or every COMPACT_SEGMENTS runs the
+        merged states (finalize() may have cached work in them) as the only one, and
+        updates the running totals. Nothing is saved if a detector failed, so the
+        stored states always describe the same set of batches.
+        """
+        failed = [name for name, detector_stats in stats.items() if detector_stats["status"] != "ok"]
+        metadata = dict(stored)
+        if not chunk_count:
+            return metadata, not failed
+        metadata["total_rows"] += rows
+        metadata["total_amount"] += amount
+        metadata["batches"] = stored["batches"] + [batch_id]
+        segment = stored["next_segment"]
+        compact = len(stored["segments"]) + 1 >= store.COMPACT_SEGMENTS
+        metadata["segments"] = [segment] if compact else stored["segments"] + [segment]
+        metadata["next_segment"] = segment + 1
+        if failed:
+            print(f"Not updating the state store: {', '.join(failed)} failed.")
+            return metadata, False
+        for detector in self.detectors:
+            store.save(detector.name, segment, (states if compact else batch)[detector.name])
+        store.save_metadata(metadata)
+        if compact:
+            store.remove_stale(metadata)
+        return metadata, True
+
+    def input_columns(self) -> Optional[List[str]]:
+        """
+        Source columns the detectors read (plus 'amount' for the report totals), so
+        loaders can skip the rest; None when some detector needs every column.
+        """
+        columns = ['amount']
+        for detector in self.detectors:
+            if detector.required_columns is None:
+                return None
+            columns += [c for c in detector.required_columns if c not in DERIVED_COLUMNS and c not in columns]
+        return columns
+
+    def prepare_inputs(self, df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        """
+        Builds the read-only input of every detector.
+
+        Dates are parsed and the shared derived columns (see DERIVED_COLUMNS) are computed
+        once; each detector then receives a projection of only the columns it declares.
+        With pandas copy-on-write these projections share the caller's buffers, and the
+        caller's DataFrame is never modified.
+        """
+        wanted: List[str] = []
+        for detector in self.detectors:
+            for col in detector.required_columns or df.columns:
+                if col not in wanted:
+                    wanted.append(col)
+
+        shared = df[[c for c in wanted if c in df.columns]]
+        derived = [c for c in wanted if c in DERIVED_COLUMNS and c not in df.columns]
+        if 'date' in shared.columns and derived:
+            try:
+                dates = shared['date']
+                if not pd.api.types.is_datetime64_any_dtype(dates):
+                    dates = pd.to_datetime(dates)
+                shared = shared.assign(date=dates, **{c: DERIVED_COLUMNS[c](dates) for c in derived})
+            except (ValueError, TypeError):
+                # Unparseable dates: the detectors that need them report the error themselves.
+                pass
+
+        inputs = {}
+        for detector in self.detectors:
+            columns = detector.required_columns
+            if columns is None:
+                inputs[detector.name] = df
+            else:
+                # Missing columns are left out so the detector raises its own KeyError.
+                inputs[detector.name] = shared[[c for c in columns if c in shared.columns]]
+        return inputs
+
+    def _span(self, name: str, rows: Optional[int] = None):
+        return self.tracer.span(name, 'engine', rows) if self.tracer is not None else contextlib.nullcontext({})
+
+    def _cached_outcomes(self, inputs: Dict[str, pd.DataFrame]) -> Tuple[Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]], Dict[str, str]]:
+        """
+        Findings of the detectors found in the cache, and the cache key of every
+        detector (empty without a cache).
+        """
+        outcomes, keys = {}, {}
+        if self.cache is None:
+            return outcomes, keys
+        digests: Dict[str, str] = {}
+        for detector in self.detectors:
+            start = time.perf_counter()
+            keys[detector.name] = self.cache.key(detector, inputs[detector.name], digests)
+            findings = self.cache.get(keys[detector.name])
+            if findings is not None:
+                print(f"Using cached findings of {detector.name}.")
+                outcomes[detector.name] = (findings, {
+                    "status": "ok",
+                    "cached": True,
+                    "wall_time_s": time.perf_counter() - start,
+                    "cpu_time_s": None,
+                    "peak_memory_bytes": None
+                })
+        return outcomes, keys
+
+    def _run_sequential(self, detectors: List[BaseDetector], inputs: Dict[str, pd.DataFrame]) -> Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]]:
+        outcomes = {}
+        for detector in detectors:
+            print(f"Running {detector.name}...")
+            outcomes[detector.name] = _run_detector(detector, inputs[detector.name], trace_options=self._trace_options())
+        return outcomes
+
+    def _run_pool(self, detectors: List[BaseDetector], inputs: Dict[str, pd.DataFrame]) -> Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]]:
+        workers = self._worker_count()
+        print(f"Running {len(detectors)} detectors on {workers} {self.mode} workers...")
+        # RSS is process-wide, so concurrent threads cannot be told apart.
+        threaded = self.mode == 'thread'
+        clock = 'thread' if threaded else 'process'
+        inherit = not threaded and multiprocessing.get_start_method() == 'fork'
+        if inherit:
+            _INHERITED_INPUTS.update({d.name: (d, inputs[d.name]) for d in detectors})
+        pool = ThreadPool(workers) if threaded else Pool(workers)
+        outcomes = {}
+        timed_out = False
+        try:
+            submitted = time.perf_counter()
+            pending = {}
+            for detector in detectors:
+                if inherit:
+                    pending[detector.name] = pool.apply_async(_run_inherited, (detector.name, clock, not threaded, self._trace_options()))
+                else:
+                    pending[detector.name] = pool.apply_async(_run_detector, (detector, inputs[detector.name], clock, not threaded, self._trace_options()))
+            for name, result in pending.items():
+                limit = self.timeouts.get(name, self.timeout)
+                remaining = None if limit is None else max(0.0, submitted + limit - time.perf_counter())
+                try:
+                    outcomes[name] = result.get(remaining)
+                except Exception as e:
+                    # multiprocessing.TimeoutError, or a worker that failed to unpickle/return.
+                    is_timeout = not result.ready()
+                    timed_out = timed_out or is_timeout
+                    message = f"Timed out after {limit} seconds" if is_timeout else str(e)
+                    outcomes[name] = ({"error": message}, {
+                        "status": "timeout" if is_timeout else "error",
+                        "wall_time_s": time.perf_counter() - submitted,
+                        "cpu_time_s": None,
+                        "peak_memory_bytes": None
+                    })
+        finally:
+            if timed_out:
+                # Kills runaway worker processes; runaway threads are daemonic and abandoned.
+                pool.terminate()
+            else:
+                pool.close()
+                pool.join()
+            _INHERITED_INPUTS.clear()
+        return outcomes
+
+    def _trace_options(self) -> Optional[Dict[str, Any]]:
+        return self.tracer.options() if self.tracer is not None else None
+
+    def _worker_count(self) -> int:
+        return self.workers or len(self.detectors)
+
+    def save_report(self, report: Dict[str, Any], output_path: str, format: str = 'json'):
+        """Writes the report as indented JSON, compact JSON or JSON Lines (see ReportWriter)."""
+        ReportWriter.save(report, output_path, format)
         print(f"Report saved to {output_path}")
+
+    def risk_index(self, report: Dict[str, Any], df: pd.DataFrame, directory: Optional[str] = None) -> RiskIndex:
+        """
+        Joins the report's findings with df, the transactions it was computed from
+        (only the ID, vendor and amount columns are read), into a RiskIndex; saves
+        it to directory if given and adds its summary to the report metadata.
+        """
+        with self._span("risk_index", len(df)):
+            index = RiskIndex.build(report, df)
+            if directory:
+                index.save(directory)
+        report["metadata"]["risk_index"] = {**index.summary(), "directory": directory}
+        return index
@@ -0,0 +1,481 @@
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from scipy import sparse, special
+from .base import BaseDetector
+from .registry import registry
+from .risk_index import _label
+from ..detectors.mathematician import BENFORD_TESTS, NO_PERIOD
+
+# Columns the quick scan reads; everything it estimates derives from these.
+QUICK_COLUMNS = ['transaction_id', 'date', 'vendor_id', 'amount']
+
+# Multiplier mixing the vendor and month hashes into one stratum hash.
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+class StratifiedReservoir:
+    """
+    A stratified random sample of a transaction stream: at most per_stratum rows
+    of every (vendor, month) stratum, with the exact row count of every stratum
+    and of every vendor.
+
+    Every row draws a uniform random key and a stratum keeps the rows with its
+    per_stratum smallest keys (bottom-k reservoir sampling), so merging a chunk
+    in is one sort. Beyond max_rows sampled rows, whole strata are dropped by
+    the hash of their (vendor, month) key, keeping a random fraction
+    (stratum_fraction) of them, so the sample never exceeds max_rows rows
+    however long the stream is.
+    """
+    def __init__(self, per_stratum: int = 20, max_rows: int = 100000, seed: int = 0, entity_col: str = 'vendor_id',
+                 date_col: str = 'date', amount_col: str = 'amount', id_col: str = 'transaction_id'):
+        self.per_stratum = per_stratum
+        self.max_rows = max_rows
+        self.entity_col = entity_col
+        self.date_col = date_col
+        self.amount_col = amount_col
+        self.id_col = id_col
+        self.rng = np.random.default_rng(seed)
+        self.rows = 0
+        self.amount = 0.0
+        self.cutoff: Optional[np.uint64] = None
+        self.sample: Optional[pd.DataFrame] = None
+        self.population: Optional[pd.Series] = None
+        self.vendor_rows: Optional[pd.Series] = None
+
+    @property
+    def stratum_fraction(self) -> float:
+        """Share of the strata kept (1.0 until the sample outgrows max_rows)."""
+        return 1.0 if self.cutoff is None else float(self.cutoff) / 2.0 ** 64
+
+    def add(self, chunk: pd.DataFrame):
+        n = len(chunk)
+        if self.entity_col in chunk.columns:
+            entities = BaseDetector.plain(chunk[self.entity_col])
+        else:
+            entities = pd.Series(np.nan, index=chunk.index)
+        if self.date_col in chunk.columns:
+            months = BaseDetector._derived(chunk, self.date_col, '_year_month').array.asi8
+        else:
+            months = np.full(n, NO_PERIOD)
+        frame = pd.DataFrame({
+            "entity": entities.to_numpy(),
+            "month": months,
+            "amount": chunk[self.amount_col].to_numpy(dtype=np.float64),
+            "id": BaseDetector.plain(chunk[self.id_col]).to_numpy() if self.id_col in chunk.columns else np.arange(self.rows, self.rows + n)
+        })
+        self.rows += n
+        self.amount += float(np.nansum(frame['amount'].to_numpy()))
+
+        # Vendors are hashed by their key text, so 3 and 3.0 from differently typed chunks agree.
+        codes, uniques = pd.factorize(frame['entity'])
+        vendor_hashes = pd.util.hash_array(np.array([_label(value) for value in uniques] + [''], dtype=object))
+        frame['vendor'] = vendor_hashes[codes]
+        strata = frame['vendor'].to_numpy() * _MIX ^ pd.util.hash_array(frame['month'].to_numpy())
+        frame['stratum'] = strata
+        # Counted before strata are dropped: vendor-level baselines need every row.
+        vendor_counts = frame.groupby('vendor', sort=False).size()
+        self.vendor_rows = vendor_counts if self.vendor_rows is None else self.vendor_rows.add(vendor_counts, fill_value=0).astype(np.int64)
+        if self.cutoff is not None:
+            frame = frame[strata < self.cutoff]
+        frame['key'] = self.rng.random(len(frame))
+
+        counts = frame.groupby('stratum', sort=False).size()
+        self.population = counts if self.population is None else self.population.add(counts, fill_value=0).astype(np.int64)
+        if self.sample is not None:
+            frame = pd.concat([self.sample, frame], ignore_index=True)
+        frame = frame.sort_values('key', kind='stable')
+        sample = frame[frame.groupby('stratum', sort=False).cumcount().to_numpy() < self.per_stratum]
+        if len(sample) > self.max_rows:
+            # Keep the strata with the smallest hashes that fit into max_rows rows.
+            sizes = np.minimum(self.population, self.per_stratum).sort_index()
+            fits = np.cumsum(sizes.to_numpy()) <= self.max_rows
+            self.cutoff = sizes.index.to_numpy(dtype=np.uint64)[np.count_nonzero(fits)]
+            self.population = self.population[self.population.index.to_numpy(dtype=np.uint64) < self.cutoff]
+            sample = sample[sample['stratum'].to_numpy() < self.cutoff]
+        self.sample = sample.reset_index(drop=True)
+
+class QuickScan:
+    """
+    First-look triage of an input of any size: the Mathematician's Benford and
+    outlier tests and the Chronologist's monthly profile, estimated from a
+    StratifiedReservoir sample, each statistic with a confidence interval and
+    each finding marked exact_run when its interval reaches the level at which
+    the full detector would flag it (for outlier counts: when the sample holds
+    outliers).
+
+    A sampled row stands for N_h / n_h rows of its stratum (divided by the
+    stratum fraction once strata are dropped). Intervals of the Benford, Z-Score,
+    IQR and monthly statistics are percentile intervals over bootstrap
+    replicates: each row draws Poisson(1) resampling weights, shrunk by its
+    stratum's finite-population correction and rescaled to the stratum's row
+    count, so fully sampled strata add no variance; dropped strata are accounted
+    for by resampling whole strata too. Robust outlier counts get an analytic
+    (normal) interval. Reading stops after time_budget seconds, and the
+    estimates then cover the rows read so far.
+    """
+    def __init__(self, mathematician: Optional[BaseDetector] = None, chronologist: Optional[BaseDetector] = None, sample_size: int = 100000,
+                 per_stratum: int = 20, bootstrap: int = 100, confidence: float = 0.95, time_budget: Optional[float] = 60.0, seed: int = 0):
+        if not 0 < confidence < 1:
+            raise ValueError("Confidence must be between 0 and 1")
+        if sample_size < per_stratum:
+            raise ValueError("The sample size must be at least per_stratum rows")
+        self.mathematician = mathematician
+        self.chronologist = chronologist
+        self.sample_size = sample_size
+        self.per_stratum = per_stratum
+        self.bootstrap = bootstrap
+        self.confidence = confidence
+        self.time_budget = time_budget
+        self.seed = seed
+
+    @classmethod
+    def with_defaults(cls, **options: Any) -> 'QuickScan':
+        """A QuickScan with default-configured detectors."""
+        return cls(registry.create('mathematician'), registry.create('chronologist'), **options)
+
+    def sample(self, chunks: Iterable[pd.DataFrame]) -> Tuple[StratifiedReservoir, bool]:
+        """The reservoir over chunks, and whether every chunk was read within the time budget."""
+        reservoir = StratifiedReservoir(self.per_stratum, self.sample_size, self.seed)
+        start = time.perf_counter()
+        for chunk in chunks:
+            if self.time_budget is not None and time.perf_counter() - start > self.time_budget:
+                return reservoir, False
+            reservoir.add(chunk)
+        return reservoir, True
+
+    def scan(self, chunks: Iterable[pd.DataFrame]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        reservoir, complete = self.sample(chunks)
+        return self.report(reservoir, complete, time.perf_counter() - start)
+
+    def report(self, reservoir: StratifiedReservoir, complete: bool = True, read_seconds: Optional[float] = None) -> Dict[str, Any]:
+        start = time.perf_counter()
+        sample = reservoir.sample if reservoir.sample is not None else pd.DataFrame(columns=["entity", "month", "amount", "id", "stratum", "key"])
+        weights, strata = self.weights(sample, reservoir)
+        findings: Dict[str, Any] = {}
+        if self.mathematician is not None:
+            first_two = self.mathematician.first_two_digits(sample['amount'])
+            findings[self.mathematician.name] = {
+                "detector_name": self.mathematician.name,
+                "benford_test": self.benford(first_two, weights),
+                "vendor_benford": self.vendor_benford(sample, first_two, weights),
+                "statistical_outliers": self.statistical_outliers(sample, weights),
+                "robust_outliers": self.robust_outliers(sample, strata, reservoir)
+            }
+        if self.chronologist is not None:
+            findings[self.chronologist.name] = {
+                "detector_name": self.chronologist.name,
+                "fiscal_cliff": self.fiscal_cliff(sample, weights)
+            }
+        exact_run = [f"{detector}.{test}" for detector, tests in findings.items() for test, result in tests.items()
+                     if isinstance(result, dict) and result.get("exact_run")]
+        return {
+            "metadata": {
+                "total_rows": reservoir.rows,
+                "total_amount": reservoir.amount,
+                "currency": "IDR",
+                "quick_scan": {
+                    "input_complete": complete,
+                    "sample_rows": len(sample),
+                    "strata_sampled": len(strata),
+                    "per_stratum": self.per_stratum,
+                    "stratum_fraction": reservoir.stratum_fraction,
+                    "bootstrap_replicates": self.bootstrap,
+                    "confidence": self.confidence,
+                    "seed": self.seed,
+                    "read_seconds": read_seconds,
+                    "estimate_seconds": time.perf_counter() - start,
+                    "exact_run": exact_run,
+                    "explanation": ("Estimates from a stratified (vendor x month) sample with confidence intervals. Findings listed under exact_run "
+                                    "may be real at the full detector's thresholds; rerun without --quick to confirm them and get every flagged transaction."
+                                    + ("" if complete else " The time budget ran out before the end of the input: estimates cover the rows read so far."))
+                }
+            },
+            "findings": findings
+        }
+
+    def weights(self, sample: pd.DataFrame, reservoir: StratifiedReservoir) -> Tuple[np.ndarray, pd.DataFrame]:
+        """
+        Sampling weights of every sampled row: column 0 the estimation weight,
+        the others one bootstrap replicate each. Also the strata (n, N).
+        """
+        codes, keys = pd.factorize(sample['stratum'])
+        sampled = np.bincount(codes, minlength=len(keys)).astype(np.float64)
+        population = reservoir.population.reindex(keys).to_numpy(dtype=np.float64) if len(keys) else sampled
+        fraction = reservoir.stratum_fraction
+        rng = np.random.default_rng(self.seed + 1)
+
+        draws = rng.poisson(1.0, (len(sample), self.bootstrap)).astype(np.float32)
+        shrink = np.sqrt(1 - sampled / population).astype(np.float32)
+        draws = 1 + shrink[codes][:, None] * (draws - 1)
+        totals = self._group_sums(codes, len(keys), draws)
+        # A stratum whose draws are all zero keeps its plain weights in that replicate.
+        draws[(totals == 0)[codes]] = 1
+        totals[totals == 0] = sampled[np.nonzero(totals == 0)[0]]
+        draws *= (population[:, None] / totals).astype(np.float32)[codes]
+        if fraction < 1:
+            draws *= (1 + np.sqrt(1 - fraction) * (rng.poisson(1.0, (len(keys), self.bootstrap)) - 1)).astype(np.float32)[codes]
+        weights = np.empty((len(sample), self.bootstrap + 1), dtype=np.float32)
+        weights[:, 0] = (population / sampled)[codes]
+        weights[:, 1:] = draws
+        weights /= fraction
+        strata = pd.DataFrame({"sampled": sampled, "population": population}, index=keys)
+        return weights, strata
+
+    @staticmethod
+    def _group_sums(codes: np.ndarray, groups: int, weights: np.ndarray, values: Optional[np.ndarray] = None) -> np.ndarray:
+        """Per group code (rows with code < 0 skipped), the sums of every weights column, times values if given."""
+        keep = codes >= 0
+        data = np.ones(np.count_nonzero(keep)) if values is None else values[keep]
+        indicator = sparse.csr_matrix((data, (codes[keep], np.flatnonzero(keep))), shape=(groups, len(codes)))
+        return np.asarray(indicator @ weights, dtype=np.float64)
+
+    def _interval(self, replicates: np.ndarray) -> List[float]:
+        tail = (1 - self.confidence) / 2 * 100
+        if not len(replicates) or not np.isfinite(replicates).any():
+            return [float('nan'), float('nan')]
+        return [float(v) for v in np.nanpercentile(replicates, [tail, 100 - tail])]
+
+    def _debiased(self, estimates: np.ndarray, replicates: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Bias-corrected estimates and basic bootstrap intervals (clipped at 0) of
+        statistics with an upward small-sample bias, one per row of replicates.
+        """
+        if not np.isfinite(replicates).any():
+            return estimates, estimates, estimates
+        tail = (1 - self.confidence) / 2 * 100
+        low, high = np.nanpercentile(replicates, [tail, 100 - tail], axis=-1)
+        bias = np.nanmean(replicates, axis=-1) - estimates
+        return np.maximum(estimates - bias, 0), np.maximum(2 * estimates - high, 0), np.maximum(2 * estimates - low, 0)
+
+    @staticmethod
+    def _conformity(mad: np.ndarray, bounds: Tuple[float, float, float]) -> np.ndarray:
+        return np.select([mad > bounds[2], mad > bounds[1], mad > bounds[0]], ["Non-conformity", "Marginal", "Acceptable"], "High")
+
+    def _digit_mad(self, counts: np.ndarray) -> np.ndarray:
+        """MAD from Benford of (..., 9 digits, columns) weighted digit counts."""
+        expected = BENFORD_TESTS["first_digit"][1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            observed = counts / counts.sum(axis=-2, keepdims=True)
+        return np.abs(observed - expected[:, None]).mean(axis=-2)
+
+    def benford(self, first_two: np.ndarray, weights: np.ndarray) -> Dict[str, Any]:
+        """First-digit Benford MAD of the estimated population."""
+        digits = first_two // 10
+        counts = self._group_sums(np.where(digits > 0, digits - 1, -1), 9, weights)
+        mad = self._digit_mad(counts)
+        bounds = BENFORD_TESTS["first_digit"][2]
+        estimate, low, high = (float(v[0]) for v in self._debiased(mad[:1], mad[None, 1:]))
+        observed = counts[:, 0] / counts[:, 0].sum() if counts[:, 0].sum() else counts[:, 0]
+        return {
+            "observed": dict(zip(range(1, 10), observed.tolist())),
+            "expected": dict(zip(range(1, 10), BENFORD_TESTS["first_digit"][1].tolist())),
+            "sample_size": int(np.count_nonzero(digits)),
+            "mad": estimate,
+            "mad_ci": [low, high],
+            "conformity_status": str(self._conformity(np.array([estimate]), bounds)[0]),
+            "status_range": [str(s) for s in self._conformity(np.array([low, high]), bounds)],
+            "exact_run": bool(high > bounds[2]),
+            "explanation": "First-digit Benford MAD estimated from the sample. Sampling noise alone makes a MAD larger, so the estimate and its interval are bootstrap bias-corrected."
+        }
+
+    def vendor_benford(self, sample: pd.DataFrame, first_two: np.ndarray, weights: np.ndarray, block: int = 1000) -> Dict[str, Any]:
+        """Per-vendor first-digit MAD of the vendors with benford_min_count sampled amounts."""
+        digits = first_two // 10
+        vendors, labels = pd.factorize(sample['entity'])
+        valid = (vendors >= 0) & (digits > 0)
+        sampled = np.bincount(vendors[valid], minlength=len(labels))
+        estimated = np.bincount(vendors[valid], weights=weights[valid, 0], minlength=len(labels))
+        tested = np.flatnonzero(sampled >= self.mathematician.benford_min_count)
+        position = np.full(len(labels) + 1, -1)
+        position[tested] = np.arange(len(tested))
+        row_vendor = np.where(valid, position[vendors], -1)
+
+        mad = np.empty((len(tested), weights.shape[1]))
+        for start in range(0, len(tested), block):
+            size = min(block, len(tested) - start)
+            in_block = (row_vendor >= start) & (row_vendor < start + size)
+            codes = np.where(in_block, (row_vendor - start) * 9 + digits - 1, -1)
+            mad[start:start + size] = self._digit_mad(self._group_sums(codes, size * 9, weights).reshape(size, 9, -1))
+
+        bounds = BENFORD_TESTS["first_digit"][2]
+        estimate, low, high = self._debiased(mad[:, 0], mad[:, 1:])
+        vendors_out = []
+        for i in np.argsort(-estimate, kind='stable')[:self.mathematician.benford_top].tolist():
+            entity = labels[tested[i]]
+            vendors_out.append({
+                "entity": entity.item() if hasattr(entity, 'item') else entity,
+                "sampled_transactions": int(sampled[tested[i]]),
+                "estimated_transactions": float(estimated[tested[i]]),
+                "mad": float(estimate[i]),
+                "mad_ci": [float(low[i]), float(high[i])],
+                "conformity_status": str(self._conformity(estimate[i:i + 1], bounds)[0]),
+                "exact_run": bool(high[i] > bounds[2])
+            })
+        return {
+            "vendors_tested": len(tested),
+            "non_conforming_count": int(np.count_nonzero(estimate > bounds[2])),
+            "non_conforming_range": [int(np.count_nonzero(low > bounds[2])), int(np.count_nonzero(high > bounds[2]))],
+            "top_vendors": vendors_out,
+            "exact_run": bool(np.any(high > bounds[2])),
+            "explanation": "Per-vendor first-digit Benford MAD (bias-corrected) from each vendor's sampled amounts; non_conforming_range counts the vendors certainly and possibly non-conforming."
+        }
+
+    def statistical_outliers(self, sample: pd.DataFrame, weights: np.ndarray) -> Dict[str, Any]:
+        """Estimated Z-Score (> 3) and IQR outlier counts, each replicate with its own mean, deviation and quartiles."""
+        amounts = sample['amount'].to_numpy(dtype=np.float64)
+        valid = np.isfinite(amounts)
+        order = np.argsort(amounts[valid], kind='stable')
+        data = amounts[valid][order]
+        columns = weights[valid][order].astype(np.float64)
+        z_counts = np.zeros(columns.shape[1])
+        iqr_counts = np.zeros(columns.shape[1])
+        for j in range(columns.shape[1] if len(data) else 0):
+            w = columns[:, j]
+            total = w.sum()
+            mean = (w * data).sum() / total
+            std = np.sqrt((w * (data - mean) ** 2).sum() / total)
+            z_counts[j] = w[np.abs(data - mean) > 3 * std].sum()
+            cumulative = np.r_[0, np.cumsum(w)]
+            q1, q3 = data[np.minimum(np.searchsorted(cumulative[1:], [0.25 * total, 0.75 * total]), len(data) - 1)]
+            iqr = q3 - q1
+            below = cumulative[np.searchsorted(data, q1 - 1.5 * iqr, side='left')]
+            above = total - cumulative[np.searchsorted(data, q3 + 1.5 * iqr, side='right')]
+            iqr_counts[j] = below + above
+        z_ci, iqr_ci = self._interval(z_counts[1:]), self._interval(iqr_counts[1:])
+        if len(data):
+            w = columns[:, 0]
+            mean = (w * data).sum() / w.sum()
+            std = np.sqrt((w * (data - mean) ** 2).sum() / w.sum())
+            top = data[np.abs(data - mean) > 3 * std][::-1][:5].tolist()
+        else:
+            top = []
+        return {
+            "z_score_outliers_count": float(z_counts[0]),
+            "z_score_outliers_ci": z_ci,
+            "iqr_outliers_count": float(iqr_counts[0]),
+            "iqr_outliers_ci": iqr_ci,
+            "top_outliers": top,
+            "exact_run": bool(z_counts[0] > 0 or iqr_counts[0] > 0),
+            "explanation": "Estimated counts of Z-Score (>3) and IQR outliers; the sampled extremes are listed, an exact run lists them all."
+        }
+
+    @staticmethod
+    def _weighted_medians(codes: np.ndarray, groups: int, values: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """Weighted median of values per group code (every code in range(groups) present)."""
+        order = np.lexsort((values, codes))
+        codes, values, cumulative = codes[order], values[order], np.cumsum(weights[order])
+        starts = np.searchsorted(codes, np.arange(groups))
+        ends = np.searchsorted(codes, np.arange(groups), side='right')
+        before = np.r_[0.0, cumulative][starts]
+        position = np.searchsorted(cumulative, before + (cumulative[ends - 1] - before) / 2)
+        return values[np.clip(position, starts, ends - 1)]
+
+    def robust_outliers(self, sample: pd.DataFrame, strata: pd.DataFrame, reservoir: StratifiedReservoir) -> Dict[str, Any]:
+        """
+        Estimated count of transactions above robust_threshold against their
+        vendor-month median and MAD (the vendor's overall ones for months with
+        fewer than robust_min_count transactions, as in the full detector), both
+        estimated from the sample, with a normal interval of the stratified estimator.
+        """
+        math = self.mathematician
+        frame = sample[sample['entity'].notna().to_numpy() & np.isfinite(sample['amount'].to_numpy())]
+        amounts = frame['amount'].to_numpy()
+        groups = frame.groupby('stratum', sort=False)['amount']
+        median = groups.transform('median').to_numpy()
+        mad = (frame['amount'] - median).abs().groupby(frame['stratum'], sort=False).transform('median').to_numpy()
+        population = strata['population'].reindex(frame['stratum'].to_numpy()).to_numpy()
+        sampled = strata['sampled'].reindex(frame['stratum'].to_numpy()).to_numpy()
+
+        # Vendor-level baselines, rows weighted by their stratum's sampling weight.
+        vendors, vendor_keys = pd.factorize(frame['vendor'])
+        vendor_population = reservoir.vendor_rows.reindex(vendor_keys).to_numpy(dtype=np.float64)
+        vendor_sampled = np.bincount(vendors, minlength=len(vendor_keys)).astype(np.float64)
+        weight = population / sampled
+        vendor_median = self._weighted_medians(vendors, len(vendor_keys), amounts, weight)
+        vendor_mad = self._weighted_medians(vendors, len(vendor_keys), np.abs(amounts - vendor_median[vendors]), weight)
+        sparse_month = population < math.robust_min_count
+        median = np.where(sparse_month, vendor_median[vendors], median)
+        mad = np.where(sparse_month, vendor_mad[vendors], mad)
+        count = np.where(sparse_month, vendor_population[vendors], population)
+        n = np.where(sparse_month, vendor_sampled[vendors], sampled)
+        mad = np.maximum(mad, math.sketch_accuracy * np.abs(median))
+
+        # A median and MAD of a few sampled rows are noisy, and a too small MAD makes
+        # ordinary amounts look extreme. Rows are therefore also scored against a
+        # conservative baseline: the median raised and the MAD widened by their
+        # standard errors (1.85 and 1.17 MAD / sqrt(n) for normal data) at the
+        # confidence level, shrunk by the finite-population correction, so fully
+        # sampled baselines stay exact. The estimate uses the plain baseline; the
+        # interval spans both, each with its sampling margin.
+        z = special.ndtri((1 + self.confidence) / 2)
+        error = z * np.sqrt(np.maximum(1 - n / count, 0) / n)
+        scored = (count >= math.robust_min_count) & (mad > 0)
+        stratum_codes, stratum_keys = pd.factorize(frame['stratum'])
+        has_scored = np.bincount(stratum_codes, scored, len(stratum_keys)) > 0
+        counts = strata.loc[stratum_keys[has_scored]]
+        sizes, big_n = counts['sampled'].to_numpy(), counts['population'].to_numpy()
+        fraction = reservoir.stratum_fraction
+
+        def flag(shift: int) -> Tuple[np.ndarray, np.ndarray, float, float]:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                spread = mad * (1 + 1.17 * error) ** shift
+                robust_z = 0.6745 * (amounts - median - shift * 1.85 * error * mad) / spread
+            flagged = scored & (robust_z > math.robust_threshold)
+            hits = np.bincount(stratum_codes, flagged, len(stratum_keys))[has_scored]
+            totals = big_n * hits / sizes
+            smoothed = (hits + 0.5) / (sizes + 1)
+            variance = (np.sum(big_n ** 2 * (1 - sizes / big_n) * smoothed * (1 - smoothed) / sizes) + (1 - fraction) * np.sum(totals ** 2)) / fraction ** 2
+            return flagged, robust_z, float(totals.sum() / fraction), float(z * np.sqrt(variance))
+
+        _, _, estimate, margin = flag(0)
+        flagged, robust_z, conservative, conservative_margin = flag(1)
+
+        top = frame[flagged].assign(robust_z=robust_z[flagged]).sort_values('robust_z', ascending=False, kind='stable').head(math.robust_top)
+        examples = [{
+            "transaction_id": row.id.item() if hasattr(row.id, 'item') else row.id,
+            "entity": row.entity.item() if hasattr(row.entity, 'item') else row.entity,
+            "period": None if row.month == NO_PERIOD else str(pd.Period(ordinal=row.month, freq='M')),
+            "amount": float(row.amount),
+            "robust_z": float(row.robust_z)
+        } for row in top.itertuples(index=False)]
+        return {
+            "threshold": math.robust_threshold,
+            "groups_scored": int(round(np.count_nonzero(has_scored) / fraction)),
+            "flagged_count": estimate,
+            "flagged_count_ci": [max(0.0, min(estimate, conservative - conservative_margin)), estimate + margin],
+            "flagged_in_sample": int(np.count_nonzero(flagged)),
+            "top_flagged": examples,
+            "exact_run": bool(flagged.any()),
+            "explanation": "Estimated count of transactions far above their vendor-month median (robust Z-Score), with a baseline from the sample; the interval also covers a conservative baseline, and top_flagged lists the sampled transactions flagged even against it. Vendor-months with fewer than robust_min_count transactions are scored against the vendor's overall median and MAD."
+        }
+
+    def fiscal_cliff(self, sample: pd.DataFrame, weights: np.ndarray) -> Dict[str, Any]:
+        """The Chronologist's fiscal cliff check on estimated monthly spending, with intervals of every ratio."""
+        chrono = self.chronologist
+        amounts = sample['amount'].to_numpy(dtype=np.float64)
+        months = sample['month'].to_numpy()
+        dated = (months != NO_PERIOD) & np.isfinite(amounts)
+        codes = np.full(len(sample), -1)
+        ordinals, codes[dated] = np.unique(months[dated], return_inverse=True)
+        totals = self._group_sums(codes, len(ordinals), weights, np.where(dated, amounts, 0.0))
+        result = chrono.fiscal_cliff_from_monthly(pd.Series(totals[:, 0], index=ordinals))
+
+        calendar = ordinals % 12
+        by_month = np.zeros((12, weights.shape[1]))
+        np.add.at(by_month, calendar, totals)
+        present = np.unique(calendar)
+        average = by_month[present].mean(axis=0) if len(present) else np.zeros(weights.shape[1])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(average > 0, by_month[chrono.fiscal_year_end - 1] / average, 0)
+            december = np.where(average > 0, by_month[11] / average, 0)
+        low, high = self._interval(ratio[1:])
+        result.update({
+            "monthly_spending_ci": {str(month + 1): self._interval(by_month[month, 1:]) for month in present.tolist()},
+            "year_end_vs_avg_ratio_ci": [low, high],
+            "december_vs_avg_ratio_ci": self._interval(december[1:]),
+            "status_range": [chrono.cliff_status(low), chrono.cliff_status(high)],
+            "exact_run": chrono.cliff_status(high) != "Normal"
+        })
+        return result
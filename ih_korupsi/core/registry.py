@@ -0,0 +1,86 @@
+import importlib
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+# Short name -> "module:Class" of the bundled detectors, in report order.
+BUILTIN_DETECTORS = {
+    'mathematician': 'ih_korupsi.detectors.mathematician:Mathematician',
+    'connector': 'ih_korupsi.detectors.connector:Connector',
+    'chronologist': 'ih_korupsi.detectors.chronologist:Chronologist',
+    'string_detective': 'ih_korupsi.detectors.string_detective:StringDetective',
+}
+
+# Installed packages add detectors under this entry point group, e.g. in pyproject.toml:
+#   [project.entry-points."ih_korupsi.detectors"]
+#   shell_company = "my_plugin.detectors:ShellCompanyDetector"
+ENTRY_POINT_GROUP = 'ih_korupsi.detectors'
+
+class DetectorRegistry:
+    """
+    Detector classes by short name, kept as "module:Class" references and only
+    imported when a detector is created, so the heavy dependencies of one
+    detector (networkx, scipy.stats, ...) are not loaded unless it runs.
+
+    Besides the bundled detectors, the registry lists those registered with
+    register() and, once discover() has run, those that installed packages
+    advertise under the ENTRY_POINT_GROUP entry point group.
+    """
+    def __init__(self, group: str = ENTRY_POINT_GROUP):
+        self.group = group
+        self._targets: Dict[str, Union[str, type]] = dict(BUILTIN_DETECTORS)
+        self._discovered = False
+
+    def register(self, name: str, target: Union[str, type]):
+        """Adds a detector class, or a lazy "module:Class" reference to one; replaces a detector of the same name."""
+        if isinstance(target, str) and ':' not in target:
+            raise ValueError(f"Detector reference must be 'module:Class', got {target!r}")
+        self._targets[name] = target
+
+    def discover(self):
+        """Adds the entry point detectors (once); they never shadow an existing name."""
+        if self._discovered:
+            return
+        self._discovered = True
+        # Scanning installed distributions costs tens of milliseconds, hence only on demand.
+        from importlib.metadata import entry_points
+        for entry_point in entry_points(group=self.group):
+            self._targets.setdefault(entry_point.name, entry_point.value)
+
+    def names(self) -> List[str]:
+        self.discover()
+        return list(self._targets)
+
+    def module(self, name: str) -> str:
+        """The module defining the detector name, without importing it."""
+        target = self._targets[name]
+        return target.partition(':')[0] if isinstance(target, str) else target.__module__
+
+    def load(self, name: str) -> type:
+        """The detector class of name, imported on first use."""
+        self.discover()
+        if name not in self._targets:
+            raise ValueError(f"Unknown detector: {name} (available: {', '.join(self._targets)})")
+        target = self._targets[name]
+        if isinstance(target, str):
+            module, _, attribute = target.partition(':')
+            target = getattr(importlib.import_module(module), attribute)
+            self._targets[name] = target
+        return target
+
+    def create(self, name: str, **options: Any) -> Any:
+        """A new instance of the detector name, with constructor options."""
+        return self.load(name)(**options)
+
+    def select(self, include: Optional[Sequence[str]] = None, skip: Optional[Sequence[str]] = None) -> List[str]:
+        """
+        Names of the detectors to run: include (in that order) or all of them,
+        minus skip. Unknown names raise a ValueError.
+        """
+        available = self.names()
+        unknown = [name for name in list(include or []) + list(skip or []) if name not in available]
+        if unknown:
+            raise ValueError(f"Unknown detector(s): {', '.join(unknown)} (available: {', '.join(available)})")
+        selected = list(dict.fromkeys(include)) if include else available
+        return [name for name in selected if name not in set(skip or [])]
+
+# The registry FraudEngine and the CLI resolve detector names with.
+registry = DetectorRegistry()
@@ -0,0 +1,321 @@
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+# Entity signals: (column, weight, half). A signal's severity is value / (value + half),
+# 0 for no finding and approaching 1 (or the value itself where half is None, for
+# values already in [0, 1]); the entity score is the weighted sum of severities.
+ENTITY_SIGNALS = {
+    'rsf': ('rsf_value', 1.0, 10.0),
+    'benford': ('benford_mad', 1.0, 0.015),
+    'spike': ('spike_ratio', 1.0, 2.5),
+    'velocity': ('velocity_transactions', 1.0, 10.0),
+    'outlier': ('outlier_transactions', 1.0, 1.0),
+    'ghost': ('ghost_similarity', 1.0, None),
+    'cycle': ('cycles', 1.0, 1.0),
+}
+# Transaction flags (bits of the flags column); a transaction scores its entity's score plus 1 per flag.
+TRANSACTION_FLAGS = ('outlier', 'velocity')
+
+ENTITY_COLUMNS = ('key', 'name', 'transactions', 'amount', 'pagerank', 'score', 'flags') + tuple(c for c, _, _ in ENTITY_SIGNALS.values())
+# Input columns build() reads.
+INDEX_COLUMNS = ['transaction_id', 'vendor_id', 'vendor_name', 'amount']
+
+def _label(value: Any) -> str:
+    """Entity key text; whole floats lose their '.0', as vendor IDs read from a CSV with gaps are floats."""
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        value = int(value)
+    return str(value)
+
+class RiskIndex:
+    """
+    One score table over all detector findings: a row per entity and per
+    transaction, keyed consistently.
+
+    Findings name vendors by ID (Mathematician, Chronologist), by name (String
+    Detective) or by graph label (Connector); all are resolved to one
+    dictionary-encoded entity code, preferring the vendor ID, so every table
+    column is a flat NumPy array. Entity signals come from the report's lists, so
+    entities outside a detector's top entries carry no value for its signal; the
+    transaction flags cover every flagged transaction.
+
+    Transactions are stored grouped by entity (offsets), highest score first
+    within each, and both tables carry a precomputed descending-score order, so
+    a drill-down into one entity is a binary search plus a slice and an
+    unfiltered top-k is a slice; ranking by another column uses a partial
+    selection (argpartition) of k. save() writes the
+    arrays as .npy files that load() memory-maps, so a saved index answers
+    queries without recomputing anything.
+    """
+    def __init__(self, entities: Dict[str, np.ndarray], transactions: Dict[str, np.ndarray], metadata: Dict[str, Any]):
+        self.entities = entities
+        self.transactions = transactions
+        self.metadata = metadata
+
+    @classmethod
+    def build(cls, report: Dict[str, Any], df: 'pd.DataFrame', id_col: str = 'transaction_id', entity_col: str = 'vendor_id',
+              name_col: str = 'vendor_name', amount_col: str = 'amount') -> 'RiskIndex':
+        """Joins the findings of report with df, the input it was computed from."""
+        # Imported here: loading and querying a saved index needs NumPy only.
+        import pandas as pd
+        findings = report.get("findings", {})
+        math = cls._findings(findings, 'The Mathematician')
+        graph = cls._findings(findings, 'The Connector')
+        chrono = cls._findings(findings, 'The Chronologist')
+        strings = cls._findings(findings, 'String Detective')
+
+        # Entity dictionary: vendor IDs in order of first appearance, each with the first
+        # name seen for it.
+        if entity_col in df.columns:
+            codes, uniques = pd.factorize(df[entity_col])
+        else:
+            codes, uniques = np.full(len(df), -1, dtype=np.intp), pd.Index([])
+        keys = cls._labels(uniques)
+        names = np.full(len(keys), '', dtype=object)
+        if name_col in df.columns:
+            pairs = pd.DataFrame({"code": codes, "name": df[name_col].to_numpy()})
+            pairs = pairs[(pairs["code"] >= 0) & pairs["name"].notna()].drop_duplicates("code")
+            names[pairs["code"].to_numpy()] = pairs["name"].astype(str).to_numpy()
+
+        # Findings as (column, label, value).
+        found: List[Tuple[str, Any, float]] = []
+        for item in math.get('rsf_test', {}).get('high_risk_entities', []):
+            found.append(('rsf_value', item['entity'], item['rsf_value']))
+        for item in math.get('vendor_benford', {}).get('top_vendors', []):
+            if item.get('conformity_status') == 'Non-conformity':
+                found.append(('benford_mad', item['entity'], item['mad']))
+        for item in chrono.get('period_spikes', {}).get('top_entities', []):
+            found.append(('spike_ratio', item['entity'], item['peak_ratio']))
+        for item in strings.get('potential_ghost_vendors', []):
+            found += [('ghost_similarity', item['name_1'], item['similarity_score']), ('ghost_similarity', item['name_2'], item['similarity_score'])]
+        for cycle in graph.get('circular_trading', {}).get('sample_cycles', []):
+            found += [('cycles', label, 1) for label in set(map(_label, cycle))]
+        for label, value in graph.get('centrality_analysis', {}).get('top_influencers_pagerank', []):
+            found.append(('pagerank', label, value))
+
+        # Labels resolve to a vendor ID, else to a vendor name, else (e.g. paying agencies
+        # in the transaction graph) to a new entity of their own.
+        labels = pd.Index([_label(label) for _, label, _ in found], dtype=object)
+        distinct = labels.unique()
+        by_key, by_name = cls._first_positions(distinct, keys), cls._first_positions(distinct, names)
+        found_codes = np.where(np.isnan(by_key), by_name, by_key)[distinct.get_indexer(labels)]
+        unresolved = labels[np.isnan(found_codes)].unique()
+        new_codes = pd.Series(np.arange(len(keys), len(keys) + len(unresolved)), index=unresolved)
+        found_codes[np.isnan(found_codes)] = new_codes.reindex(labels[np.isnan(found_codes)]).to_numpy()
+        found_codes = found_codes.astype(np.intp)
+        keys = np.concatenate([keys, np.asarray(unresolved, dtype=object)])
+        names = np.concatenate([names, np.asarray(unresolved, dtype=object)])
+
+        # Transactions: flags from the complete lists of flagged IDs.
+        ids = df[id_col].to_numpy() if id_col in df.columns else df.index.to_numpy()
+        id_index = pd.Index(ids)
+        flags = np.zeros(len(df), dtype=np.uint8)
+        flagged_lists = {
+            'outlier': math.get('robust_outliers', {}).get('flagged_transaction_ids', []),
+            'velocity': chrono.get('velocity_anomalies', {}).get('flagged_transaction_ids', [])
+        }
+        for bit, flag in enumerate(TRANSACTION_FLAGS):
+            positions = id_index.get_indexer(pd.Index(flagged_lists[flag]))
+            flags[positions[positions >= 0]] |= np.uint8(1 << bit)
+        amounts = df[amount_col].to_numpy(dtype=np.float64) if amount_col in df.columns else np.zeros(len(df))
+
+        n = len(keys)
+        known = codes >= 0
+        entities: Dict[str, np.ndarray] = {
+            "key": keys.astype(str),
+            "name": names.astype(str),
+            "transactions": np.bincount(codes[known], minlength=n).astype(np.int64),
+            "amount": np.bincount(codes[known], weights=amounts[known], minlength=n)
+        }
+        columns = np.array([column for column, _, _ in found], dtype=object)
+        found_values = np.array([value for _, _, value in found], dtype=np.float64)
+        for column in [c for c, _, _ in ENTITY_SIGNALS.values()] + ['pagerank']:
+            array = np.zeros(n, dtype=np.float64)
+            selected = columns == column
+            # An entity listed twice (by ID and by name) keeps the larger value; cycles are counted.
+            (np.add if column == 'cycles' else np.maximum).at(array, found_codes[selected], found_values[selected])
+            entities[column] = array
+        for bit, flag in enumerate(TRANSACTION_FLAGS):
+            marked = known & ((flags & (1 << bit)) > 0)
+            entities[ENTITY_SIGNALS[flag][0]] = np.bincount(codes[marked], minlength=n).astype(np.float64)
+        score = np.zeros(n, dtype=np.float64)
+        entity_flags = np.zeros(n, dtype=np.uint16)
+        for bit, (column, weight, half) in enumerate(ENTITY_SIGNALS.values()):
+            value = entities[column]
+            score += weight * (value if half is None else value / (value + half))
+            entity_flags |= np.where(value > 0, 1 << bit, 0).astype(np.uint16)
+        entities["score"] = score
+        entities["flags"] = entity_flags
+
+        tx_score = np.where(known, score[np.maximum(codes, 0)], 0.0) + np.unpackbits(flags[:, None], axis=1)[:, -len(TRANSACTION_FLAGS):].sum(axis=1)
+        # Grouped by entity (unknown ones last), by descending score within each entity.
+        grouping = np.where(known, codes, n)
+        order = np.lexsort((-tx_score, grouping))
+        transactions: Dict[str, np.ndarray] = {
+            "id": ids[order].astype(str) if ids.dtype == object else ids[order],
+            "entity": codes[order].astype(np.int32),
+            "amount": amounts[order],
+            "flags": flags[order],
+            "score": tx_score[order].astype(np.float32)
+        }
+        index = cls(entities, transactions, {
+            "total_rows": len(df),
+            "entities": n,
+            "source_metadata": {k: v for k, v in report.get("metadata", {}).items() if k in ("total_rows", "total_amount", "currency")},
+            "signals": {name: {"column": c, "weight": w, "half": h} for name, (c, w, h) in ENTITY_SIGNALS.items()},
+            "transaction_flags": list(TRANSACTION_FLAGS)
+        })
+        index._add_orders(np.bincount(grouping, minlength=n + 1))
+        return index
+
+    @staticmethod
+    def _labels(values: 'pd.Index') -> np.ndarray:
+        """_label of every value, vectorized for integer IDs and floats holding integers."""
+        array = np.asarray(values)
+        if array.dtype.kind == 'f' and np.all(np.mod(array, 1) == 0):
+            array = array.astype(np.int64)
+        if array.dtype.kind in 'iu':
+            return array.astype(str).astype(object)
+        return np.array([_label(value) for value in array], dtype=object)
+
+    @staticmethod
+    def _first_positions(labels: 'pd.Index', values: np.ndarray) -> np.ndarray:
+        """Position of the first occurrence of each of the (few, distinct) labels in values; NaN if absent."""
+        hits = labels.get_indexer(values)
+        positions = np.flatnonzero(hits >= 0)
+        found, first = np.unique(hits[positions], return_index=True)
+        result = np.full(len(labels), np.nan)
+        result[found] = positions[first]
+        return result
+
+    @staticmethod
+    def _findings(findings: Dict[str, Any], name: str) -> Dict[str, Any]:
+        result = findings.get(name)
+        return result if isinstance(result, dict) and "error" not in result else {}
+
+    def _add_orders(self, group_sizes: np.ndarray):
+        self.entities["order"] = np.argsort(-self.entities["score"], kind='stable')
+        self.entities["key_order"] = np.argsort(self.entities["key"], kind='stable')
+        self.transactions["offsets"] = np.r_[0, np.cumsum(group_sizes)].astype(np.int64)
+        self.transactions["order"] = np.argsort(-self.transactions["score"], kind='stable')
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        for table, columns in (("entity", self.entities), ("transaction", self.transactions)):
+            for column, array in columns.items():
+                np.save(os.path.join(directory, f"{table}_{column}.npy"), array, allow_pickle=False)
+        with open(os.path.join(directory, "index.json"), 'w') as f:
+            json.dump({**self.metadata, "entity_columns": list(self.entities), "transaction_columns": list(self.transactions)}, f, indent=4, default=str)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'RiskIndex':
+        """A saved index; with mmap the arrays are memory-mapped and paged in on demand."""
+        with open(os.path.join(directory, "index.json")) as f:
+            metadata = json.load(f)
+        mode = 'r' if mmap else None
+        tables = [{column: np.load(os.path.join(directory, f"{table}_{column}.npy"), mmap_mode=mode, allow_pickle=False)
+                   for column in metadata.pop(f"{table}_columns")} for table in ("entity", "transaction")]
+        return cls(tables[0], tables[1], metadata)
+
+    def lookup(self, key: Any) -> int:
+        """Entity code of a vendor ID, vendor name or graph label; KeyError if unknown."""
+        key = _label(key)
+        for column, order in (("key", self.entities["key_order"]), ("name", None)):
+            if order is not None:
+                position = int(np.searchsorted(self.entities[column], key, sorter=order))
+                if position < len(order) and self.entities[column][order[position]] == key:
+                    return int(order[position])
+            else:
+                # Names are not sorted; an exact scan is still a vectorized comparison.
+                matches = np.flatnonzero(self.entities[column] == key)
+                if len(matches):
+                    return int(matches[0])
+        raise KeyError(f"Unknown entity: {key}")
+
+    def _entity_record(self, code: int) -> Dict[str, Any]:
+        record = {"code": code}
+        for column in ENTITY_COLUMNS:
+            value = self.entities[column][code]
+            record[column] = value.item() if hasattr(value, 'item') else value
+        record["signals"] = [name for bit, name in enumerate(ENTITY_SIGNALS) if record["flags"] & (1 << bit)]
+        return record
+
+    def _transaction_records(self, positions: np.ndarray) -> List[Dict[str, Any]]:
+        keys = self.entities["key"]
+        records = []
+        for position in positions.tolist():
+            entity = int(self.transactions["entity"][position])
+            flags = int(self.transactions["flags"][position])
+            records.append({
+                "id": self.transactions["id"][position].item(),
+                "entity": str(keys[entity]) if entity >= 0 else None,
+                "amount": float(self.transactions["amount"][position]),
+                "score": float(self.transactions["score"][position]),
+                "flags": [flag for bit, flag in enumerate(TRANSACTION_FLAGS) if flags & (1 << bit)]
+            })
+        return records
+
+    def entity(self, key: Any, transactions: int = 20) -> Dict[str, Any]:
+        """Everything on one entity: its scores and signals and its highest-scored transactions."""
+        code = self.lookup(key)
+        start, end = self.transactions["offsets"][code], self.transactions["offsets"][code + 1]
+        record = self._entity_record(code)
+        record["top_transactions"] = self._transaction_records(np.arange(start, min(end, start + transactions)))
+        return record
+
+    def top_entities(self, k: int = 10, signal: Optional[str] = None, by: Optional[str] = None, min_score: float = 0.0) -> List[Dict[str, Any]]:
+        """
+        The k highest-scored entities, optionally only those with signal, and
+        ranked by another numeric column (by) instead of the score.
+        """
+        if by is None:
+            order = self.entities["order"]
+            mask = self.entities["score"][order] >= min_score if min_score > 0 else None
+            if signal is not None:
+                signal_mask = (self.entities["flags"][order] & (1 << self._bit(signal, ENTITY_SIGNALS))) > 0
+                mask = signal_mask if mask is None else mask & signal_mask
+            selected = order[:k] if mask is None else order[np.flatnonzero(mask)[:k]]
+        else:
+            values = np.asarray(self.entities[by], dtype=np.float64)
+            candidates = np.flatnonzero(self.entities["score"] >= min_score)
+            if signal is not None:
+                candidates = candidates[(self.entities["flags"][candidates] & (1 << self._bit(signal, ENTITY_SIGNALS))) > 0]
+            selected = self._largest(values, candidates, k)
+        return [self._entity_record(int(code)) for code in selected]
+
+    def top_transactions(self, k: int = 10, flag: Optional[str] = None, entity: Any = None) -> List[Dict[str, Any]]:
+        """The k highest-scored transactions, optionally of one entity or with flag."""
+        if entity is not None:
+            code = self.lookup(entity)
+            positions = np.arange(self.transactions["offsets"][code], self.transactions["offsets"][code + 1])
+        else:
+            positions = self.transactions["order"]
+        if flag is not None:
+            positions = positions[(self.transactions["flags"][positions] & (1 << self._bit(flag, TRANSACTION_FLAGS))) > 0]
+        return self._transaction_records(np.asarray(positions[:k]))
+
+    @staticmethod
+    def _bit(name: str, names) -> int:
+        names = list(names)
+        if name not in names:
+            raise ValueError(f"Unknown signal: {name} (available: {', '.join(names)})")
+        return names.index(name)
+
+    @staticmethod
+    def _largest(values: np.ndarray, candidates: np.ndarray, k: int) -> np.ndarray:
+        """Candidates with the k largest values, in descending order, by partial selection."""
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-values[candidates], k - 1)[:k]]
+        return candidates[np.argsort(-values[candidates], kind='stable')]
+
+    def summary(self) -> Dict[str, Any]:
+        """Entity and transaction counts per signal, for the report."""
+        flags = np.asarray(self.entities["flags"])
+        tx_flags = np.asarray(self.transactions["flags"])
+        return {
+            "entities": len(flags),
+            "transactions": len(tx_flags),
+            "entities_by_signal": {name: int(((flags & (1 << bit)) > 0).sum()) for bit, name in enumerate(ENTITY_SIGNALS)},
+            "transactions_by_flag": {name: int(((tx_flags & (1 << bit)) > 0).sum()) for bit, name in enumerate(TRANSACTION_FLAGS)}
+        }
@@ -0,0 +1,303 @@
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+import pandas as pd
+from .base import BaseDetector
+from .engine import FraudEngine, _measured
+from .registry import registry
+from ..utils.data_loader import DataLoader
+
+# Findings kept per dataset for repeated jobs; least recently used ones are dropped.
+MAX_RESULTS = 256
+
+class Dataset:
+    """
+    A dataset kept in memory by the server: the loaded rows, the detector inputs
+    prepared once (parsed dates, derived columns, projections), the partial
+    states built from them (see BaseDetector.state_options) and the findings of
+    earlier jobs.
+    """
+    def __init__(self, name: str, df: pd.DataFrame, source: Optional[str] = None):
+        self.name = name
+        self.source = source
+        self.df = df
+        self.inputs = FraudEngine(detectors=registry.names()).prepare_inputs(df)
+        self.total_rows = len(df)
+        self.total_amount = float(df['amount'].sum())
+        self.loaded_at = time.time()
+        self.states: Dict[Tuple, Tuple[Any, threading.Lock]] = {}
+        self.results: 'OrderedDict[str, Tuple[Dict[str, Any], Dict[str, Any]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def describe(self) -> Dict[str, Any]:
+        return {"name": self.name, "source": self.source, "rows": self.total_rows, "states": len(self.states), "results": len(self.results)}
+
+    def run(self, key: str, options: Dict[str, Any], arguments: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Findings and stats of the detector key with constructor options and
+        finalize() arguments, reusing earlier findings or a partial state built
+        for the same state options. Called on worker threads.
+        """
+        result_key = json.dumps([key, options, arguments], sort_keys=True, default=str)
+        with self._lock:
+            if result_key in self.results:
+                self.results.move_to_end(result_key)
+                findings, stats = self.results[result_key]
+                return findings, {**stats, "cached": True}
+        detector: BaseDetector = registry.create(key, **options)
+        names = detector.state_options
+        state_key = (key, json.dumps(options if names is None else {n: options.get(n) for n in names}, sort_keys=True, default=str))
+        with self._lock:
+            if state_key not in self.states:
+                self.states[state_key] = (None, threading.Lock())
+            state_lock = self.states[state_key][1]
+        # finalize() may cache work in the state, so jobs sharing one take turns.
+        with state_lock:
+            state = self.states[state_key][0]
+            warm = state is not None
+            if not warm:
+                df = self.inputs.get(detector.name, self.df)
+                state, stats = _measured(detector.update_state, (detector.init_state(), df), 'thread', False, detector=detector,
+                                         label='update_state', rows=len(df))
+                if stats["status"] != "ok":
+                    return state, stats
+                self.states[state_key] = (state, state_lock)
+            findings, stats = _measured(lambda state: detector.finalize(state, **arguments), (state,), 'thread', False, detector=detector, label='finalize')
+        stats = {**stats, "cached": False, "warm_state": warm}
+        if stats["status"] == "ok":
+            with self._lock:
+                self.results[result_key] = (findings, stats)
+                while len(self.results) > MAX_RESULTS:
+                    self.results.popitem(last=False)
+        return findings, stats
+
+class Job:
+    """One request to run detectors on a dataset, with its progress events."""
+    def __init__(self, job_id: str, dataset: Dataset, detectors: List[str], options: Dict[str, Dict[str, Any]], arguments: Dict[str, Dict[str, Any]]):
+        self.id = job_id
+        self.dataset = dataset
+        self.detectors = detectors
+        self.options = options
+        self.arguments = arguments
+        self.status = "queued"
+        self.events: List[Dict[str, Any]] = []
+        self.report: Optional[Dict[str, Any]] = None
+        self.changed = asyncio.Event()
+
+    def emit(self, event: str, **data):
+        self.events.append({"event": event, "job": self.id, "time": time.time(), **data})
+        # Wakes every waiting stream, then re-arms for the next event.
+        self.changed.set()
+        self.changed.clear()
+
+    def describe(self) -> Dict[str, Any]:
+        return {"id": self.id, "dataset": self.dataset.name, "detectors": self.detectors, "status": self.status, "report": self.report}
+
+class AnalysisServer:
+    """
+    Long-running analysis service: keeps datasets loaded (see Dataset) and runs
+    jobs on a thread pool, so repeated questions about the same data skip
+    imports, loading, date parsing and the per-row work of the detectors.
+
+    Speaks JSON over HTTP/1.1 on TCP or a Unix socket:
+        GET    /health
+        GET    /detectors
+        GET    /datasets
+        POST   /datasets            {"name", "path", "type", "date_from", "date_to"}
+        DELETE /datasets/<name>
+        POST   /jobs                {"dataset", "detectors", "options", "arguments", "wait"}
+        GET    /jobs/<id>
+        GET    /jobs/<id>/events    progress as JSON Lines until the job is done
+    options and arguments map detector names to constructor options and
+    finalize() arguments. Worker threads share the resident data; NumPy and
+    pandas release the GIL in most of the heavy work.
+    """
+    def __init__(self, workers: Optional[int] = None, max_jobs: int = 1000):
+        # ThreadPoolExecutor's own default.
+        self.workers = workers or min(32, (os.cpu_count() or 1) + 4)
+        self.executor = ThreadPoolExecutor(self.workers)
+        self.max_jobs = max_jobs
+        self.datasets: Dict[str, Dataset] = {}
+        self.jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._ids = itertools.count(1)
+        self.started_at = time.time()
+
+    def add_dataset(self, name: str, df: pd.DataFrame, source: Optional[str] = None) -> Dataset:
+        self.datasets[name] = Dataset(name, df, source)
+        return self.datasets[name]
+
+    async def load_dataset(self, name: str, path: str, type: str = 'csv', date_range=None) -> Dataset:
+        """Loads and prepares a dataset on a worker thread, replacing one of the same name."""
+        loop = asyncio.get_running_loop()
+        df = await loop.run_in_executor(self.executor, lambda: DataLoader.load(path, type, date_range=date_range))
+        dataset = await loop.run_in_executor(self.executor, Dataset, name, df, path)
+        self.datasets[name] = dataset
+        return dataset
+
+    def job(self, job_id: str) -> Job:
+        if job_id not in self.jobs:
+            raise KeyError(f"Unknown job: {job_id}")
+        return self.jobs[job_id]
+
+    def submit(self, dataset: str, detectors: Optional[List[str]] = None, options: Optional[Dict[str, Dict[str, Any]]] = None,
+               arguments: Optional[Dict[str, Dict[str, Any]]] = None) -> Job:
+        if dataset not in self.datasets:
+            raise KeyError(f"Unknown dataset: {dataset}")
+        selected = registry.select(detectors)
+        unknown = set(options or {}) | set(arguments or {})
+        unknown -= set(selected)
+        if unknown:
+            raise ValueError(f"Options for detectors not in the job: {', '.join(sorted(unknown))}")
+        for key, detector_options in (options or {}).items():
+            try:
+                registry.create(key, **detector_options)
+            except TypeError as e:
+                raise ValueError(f"Invalid options for {key}: {e}")
+        job = Job(str(next(self._ids)), self.datasets[dataset], selected, options or {}, arguments or {})
+        self.jobs[job.id] = job
+        while len(self.jobs) > self.max_jobs:
+            self.jobs.popitem(last=False)
+        job.emit("queued", detectors=selected)
+        asyncio.get_running_loop().create_task(self._run(job))
+        return job
+
+    async def _run(self, job: Job):
+        loop = asyncio.get_running_loop()
+        job.status = "running"
+        start = time.perf_counter()
+
+        async def run_one(key: str) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
+            job.emit("started", detector=key)
+            try:
+                findings, stats = await loop.run_in_executor(self.executor, job.dataset.run, key, job.options.get(key, {}), job.arguments.get(key, {}))
+            except Exception as e:
+                findings, stats = {"error": str(e)}, {"status": "error", "wall_time_s": 0.0}
+            job.emit("finished", detector=key, status=stats["status"], cached=stats.get("cached", False), wall_time_s=stats["wall_time_s"])
+            return key, findings, stats
+
+        outcomes = await asyncio.gather(*(run_one(key) for key in job.detectors))
+        report = {
+            "metadata": {
+                "total_rows": job.dataset.total_rows,
+                "total_amount": job.dataset.total_amount,
+                "currency": "IDR",
+                "execution": {"mode": "server", "workers": self.workers, "dataset": job.dataset.name, "wall_time_s": time.perf_counter() - start},
+                "detectors": {}
+            },
+            "findings": {}
+        }
+        for key, findings, stats in outcomes:
+            name = findings.get("detector_name", key) if isinstance(findings, dict) else key
+            report["findings"][name] = findings
+            report["metadata"]["detectors"][name] = stats
+        job.report = report
+        job.status = "done" if all(stats["status"] == "ok" for _, _, stats in outcomes) else "failed"
+        job.emit(job.status, wall_time_s=report["metadata"]["execution"]["wall_time_s"])
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8765, path: Optional[str] = None):
+        """Serves until cancelled, on a Unix socket at path or on host:port."""
+        if path is not None:
+            server = await asyncio.start_unix_server(self._handle, path=path)
+        else:
+            server = await asyncio.start_server(self._handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                key, _, value = line.decode('latin-1').partition(':')
+                headers[key.strip().lower()] = value.strip()
+            raw = await reader.readexactly(int(headers.get('content-length', 0) or 0))
+            body = json.loads(raw) if raw.strip() else {}
+            if not isinstance(body, dict):
+                raise ValueError("The request body must be a JSON object")
+            await self._route(method.upper(), urlsplit(target).path.rstrip('/') or '/', body, writer)
+        except (KeyError, LookupError) as e:
+            self._respond(writer, 404, {"error": str(e.args[0]) if e.args else "Not found"})
+        except (ValueError, TypeError) as e:
+            self._respond(writer, 400, {"error": str(e)})
+        except Exception as e:
+            self._respond(writer, 500, {"error": f"{type(e).__name__}: {e}"})
+        finally:
+            try:
+                await writer.drain()
+                writer.close()
+                await writer.wait_closed()
+            except (ConnectionError, RuntimeError):
+                pass
+
+    async def _route(self, method: str, path: str, body: Dict[str, Any], writer: asyncio.StreamWriter):
+        parts = path.strip('/').split('/')
+        if method == 'GET' and path == '/health':
+            self._respond(writer, 200, {"status": "ok", "uptime_s": time.time() - self.started_at, "workers": self.workers,
+                                        "datasets": list(self.datasets), "jobs": len(self.jobs)})
+        elif method == 'GET' and path == '/detectors':
+            self._respond(writer, 200, {"detectors": registry.names()})
+        elif method == 'GET' and path == '/datasets':
+            self._respond(writer, 200, {"datasets": [d.describe() for d in self.datasets.values()]})
+        elif method == 'POST' and path == '/datasets':
+            start = time.perf_counter()
+            date_range = (body.get("date_from"), body.get("date_to")) if body.get("date_from") or body.get("date_to") else None
+            dataset = await self.load_dataset(body["name"], body["path"], body.get("type", 'csv'), date_range)
+            self._respond(writer, 201, {**dataset.describe(), "load_time_s": time.perf_counter() - start})
+        elif method == 'DELETE' and parts[0] == 'datasets' and len(parts) == 2:
+            if parts[1] not in self.datasets:
+                raise KeyError(f"Unknown dataset: {parts[1]}")
+            del self.datasets[parts[1]]
+            self._respond(writer, 200, {"deleted": parts[1]})
+        elif method == 'POST' and path == '/jobs':
+            job = self.submit(body["dataset"], body.get("detectors"), body.get("options"), body.get("arguments"))
+            if body.get("wait"):
+                await self._finished(job)
+                self._respond(writer, 200, job.describe())
+            else:
+                self._respond(writer, 202, {"id": job.id, "status": job.status})
+        elif method == 'GET' and parts[0] == 'jobs' and len(parts) == 2:
+            self._respond(writer, 200, self.job(parts[1]).describe())
+        elif method == 'GET' and parts[0] == 'jobs' and len(parts) == 3 and parts[2] == 'events':
+            await self._stream_events(self.job(parts[1]), writer)
+        else:
+            self._respond(writer, 404, {"error": f"No route for {method} {path}"})
+
+    @staticmethod
+    async def _finished(job: Job):
+        while job.status not in ("done", "failed"):
+            await job.changed.wait()
+
+    async def _stream_events(self, job: Job, writer: asyncio.StreamWriter):
+        """JSON Lines of the job's events, replayed from the start and then live; the last one carries the report."""
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nCache-Control: no-cache\r\nConnection: close\r\n\r\n")
+        sent = 0
+        while True:
+            for event in job.events[sent:]:
+                if event["event"] in ("done", "failed"):
+                    event = {**event, "report": job.report}
+                writer.write(json.dumps(event, default=str).encode() + b"\n")
+            sent = len(job.events)
+            await writer.drain()
+            if job.status in ("done", "failed"):
+                return
+            await job.changed.wait()
+
+    @staticmethod
+    def _respond(writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any]):
+        reasons = {200: "OK", 201: "Created", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}
+        body = json.dumps(payload, default=str).encode()
+        writer.write(f"HTTP/1.1 {status} {reasons[status]}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                     f"Connection: close\r\n\r\n".encode() + body)
@@ -0,0 +1,63 @@
+import json
+import os
+import pickle
+import re
+from typing import Any, Dict, Iterator, List
+
+class StateStore:
+    """
+    Local directory holding the partial state of every detector between runs.
+
+    States are kept as append-only segments: every run pickles the state folded
+    from its own batch only (so its size follows the batch, not the history) to
+    one file per detector, and loading merges a detector's segments in order.
+    Once COMPACT_SEGMENTS have piled up, a run saves its merged state as a single
+    new segment instead. A small JSON file keeps the running totals, the batches
+    already ingested and the live segments; it is replaced atomically after the
+    segment files are written, so an interrupted run leaves the previous state.
+    States are unpickled on load, so only point this at directories you trust.
+    """
+    METADATA_FILE = "metadata.json"
+    COMPACT_SEGMENTS = 16
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, detector_name: str, segment: int) -> str:
+        slug = re.sub(r'[^0-9a-z]+', '_', detector_name.lower()).strip('_')
+        return os.path.join(self.directory, f"{slug}.{segment:06d}.pkl")
+
+    def _write(self, path: str, data: bytes):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def load(self, detector_name: str, segments: List[int]) -> Iterator[Any]:
+        """Yields the detector's stored segments in order (missing ones are skipped)."""
+        for segment in segments:
+            path = self._path(detector_name, segment)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    yield pickle.load(f)
+
+    def save(self, detector_name: str, segment: int, state: Any):
+        self._write(self._path(detector_name, segment), pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def load_metadata(self) -> Dict[str, Any]:
+        path = os.path.join(self.directory, self.METADATA_FILE)
+        if not os.path.exists(path):
+            return {"total_rows": 0, "total_amount": 0.0, "batches": [], "segments": [], "next_segment": 0}
+        with open(path) as f:
+            return json.load(f)
+
+    def save_metadata(self, metadata: Dict[str, Any]):
+        self._write(os.path.join(self.directory, self.METADATA_FILE), json.dumps(metadata, indent=4).encode('utf-8'))
+
+    def remove_stale(self, metadata: Dict[str, Any]):
+        """Deletes segment files (e.g. compacted ones) that metadata no longer lists."""
+        live = {f".{segment:06d}.pkl" for segment in metadata["segments"]}
+        for name in os.listdir(self.directory):
+            if re.fullmatch(r'.+\.\d{6}\.pkl(\.tmp)?', name) and name[name.index('.'):] not in live:
+                os.remove(os.path.join(self.directory, name))
@@ -0,0 +1,195 @@
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, Iterator, List, Optional
+
+class Tracer:
+    """
+    Records spans: named, timed sections of a run (engine stages and detector
+    sub-steps, see BaseDetector.span) with the rows they processed.
+
+    Timestamps come from the system-wide monotonic clock, so spans recorded in
+    worker processes line up with the parent's. With memory=True, tracemalloc
+    also measures the bytes each span allocated and its peak (this slows Python
+    allocations down, and concurrent threads share one measurement). With
+    profile=True every detector call is also profiled with cProfile.
+    """
+    def __init__(self, memory: bool = False, profile: bool = False, profile_top: int = 25):
+        self.memory = memory
+        self.profile = profile
+        self.profile_top = profile_top
+        self.spans: List[Dict[str, Any]] = []
+        self._profilers: Dict[str, cProfile.Profile] = {}
+        self._profiles: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started_tracemalloc = False
+
+    def options(self) -> Dict[str, Any]:
+        """Constructor arguments, for a Tracer in a worker process."""
+        return {"memory": self.memory, "profile": self.profile, "profile_top": self.profile_top}
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def stop(self):
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def _stack(self) -> List[Dict[str, Any]]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str = 'engine', rows: Optional[int] = None, **args) -> Iterator[Dict[str, Any]]:
+        """
+        Times the enclosed block. The yielded record can be updated inside the
+        block, e.g. span["rows"] = n once the row count is known.
+        """
+        stack = self._stack()
+        record = {
+            "name": name,
+            "category": category,
+            "rows": rows,
+            "args": args,
+            "pid": os.getpid(),
+            "tid": threading.get_native_id(),
+            "depth": len(stack),
+            "status": "ok"
+        }
+        measure_memory = self.memory and tracemalloc.is_tracing()
+        if measure_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # The enclosing span keeps the peak seen so far before it is reset.
+            if stack and "_peak" in stack[-1]:
+                stack[-1]["_peak"] = max(stack[-1]["_peak"], peak)
+            tracemalloc.reset_peak()
+            record["_start_memory"] = record["_peak"] = current
+        stack.append(record)
+        record["start_ns"] = time.perf_counter_ns()
+        try:
+            yield record
+        except BaseException as e:
+            record["status"] = f"error: {type(e).__name__}"
+            raise
+        finally:
+            record["duration_ns"] = time.perf_counter_ns() - record["start_ns"]
+            stack.pop()
+            if measure_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                peak = max(record.pop("_peak"), peak)
+                start = record.pop("_start_memory")
+                record["allocated_bytes"] = current - start
+                record["peak_bytes"] = peak - start
+                if stack and "_peak" in stack[-1]:
+                    stack[-1]["_peak"] = max(stack[-1]["_peak"], peak)
+            with self._lock:
+                self.spans.append(record)
+
+    @contextlib.contextmanager
+    def profiled(self, key: str) -> Iterator[None]:
+        """Profiles the enclosed block with cProfile; repeated blocks with the same key accumulate."""
+        if not self.profile:
+            yield
+            return
+        profiler = self._profilers.setdefault(key, cProfile.Profile())
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is active in this thread (e.g. a concurrent detector on 3.12+).
+            yield
+            return
+        try:
+            yield
+        finally:
+            profiler.disable()
+
+    def profiles(self) -> Dict[str, List[Dict[str, Any]]]:
+        """The profile_top functions by cumulative time of every profiled key."""
+        profiles = dict(self._profiles)
+        for key, profiler in self._profilers.items():
+            try:
+                stats = pstats.Stats(profiler).stats
+            except TypeError:
+                # Never enabled, so nothing was recorded.
+                continue
+            top = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:self.profile_top]
+            profiles[key] = [{
+                "function": f"{filename}:{line}({function})",
+                "calls": calls,
+                "total_s": total,
+                "cumulative_s": cumulative
+            } for (filename, line, function), (_, calls, total, cumulative, _) in top]
+        return profiles
+
+    def extend(self, spans: List[Dict[str, Any]], profiles: Optional[Dict[str, List[Dict[str, Any]]]] = None):
+        """Adds spans and profile summaries recorded by another Tracer (e.g. in a worker)."""
+        with self._lock:
+            self.spans.extend(spans)
+            self._profiles.update(profiles or {})
+
+    @staticmethod
+    def summarize(spans: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Report-friendly totals per span name, in order of first start: calls,
+        duration in seconds, rows, bytes allocated and the largest peak.
+        """
+        totals: Dict[str, Dict[str, Any]] = {}
+        for span in sorted(spans, key=lambda span: span["start_ns"]):
+            total = totals.setdefault(span["name"], {"calls": 0, "duration_s": 0.0, "rows": None, "allocated_bytes": None, "peak_bytes": None, "status": "ok"})
+            total["calls"] += 1
+            total["duration_s"] += span["duration_ns"] / 1e9
+            if span["rows"] is not None:
+                total["rows"] = (total["rows"] or 0) + span["rows"]
+            if "allocated_bytes" in span:
+                total["allocated_bytes"] = (total["allocated_bytes"] or 0) + span["allocated_bytes"]
+                total["peak_bytes"] = max(total["peak_bytes"] or 0, span["peak_bytes"])
+            if span["status"] != "ok":
+                total["status"] = span["status"]
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        origin = min((span["start_ns"] for span in self.spans), default=0)
+        spans = [{
+            **{k: v for k, v in span.items() if k not in ("start_ns", "duration_ns")},
+            "start_s": (span["start_ns"] - origin) / 1e9,
+            "duration_s": span["duration_ns"] / 1e9
+        } for span in sorted(self.spans, key=lambda span: span["start_ns"])]
+        return {"spans": spans, "profiles": self.profiles()}
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """The spans as Chrome trace events (chrome://tracing, Perfetto)."""
+        origin = min((span["start_ns"] for span in self.spans), default=0)
+        events = []
+        for span in sorted(self.spans, key=lambda span: span["start_ns"]):
+            args = {"rows": span["rows"], "status": span["status"], **span["args"]}
+            for key in ("allocated_bytes", "peak_bytes"):
+                if key in span:
+                    args[key] = span[key]
+            events.append({
+                "name": span["name"],
+                "cat": span["category"],
+                "ph": "X",
+                "ts": (span["start_ns"] - origin) / 1e3,
+                "dur": span["duration_ns"] / 1e3,
+                "pid": span["pid"],
+                "tid": span["tid"],
+                "args": args
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save(self, path: str, format: str = 'chrome'):
+        """Writes the spans as a Chrome trace ('chrome') or as plain JSON with profiles ('json')."""
+        if format not in ('chrome', 'json'):
+            raise ValueError(f"Unsupported trace format: {format}")
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace() if format == 'chrome' else self.to_dict(), f, indent=1, default=str)
@@ -1,64 +1,642 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+from scipy import special
 from ..core.base import BaseDetector
+from ..utils.sql_source import SQLSource
+
+# Above this share of candidate transactions, joining them back in SQLite is
+# slower than streaming every event.
+SQL_EVENT_SHARE = 0.1
+
+# Windows at least this unlikely at an entity's current rate keep their events
+# when old events are pruned (see Chronologist.prune_events), so that a somewhat
+# lower final rate does not need pruned events.
+VELOCITY_PRUNE_ALPHA = 1e-3
 
 class Chronologist(BaseDetector):
+    state_options = ('spike_period', 'velocity_windows', 'velocity_min_count', 'velocity_alpha')
+
+    def __init__(self, velocity_windows: Sequence[str] = ('1h', '24h', '7D'), velocity_min_count: int = 6,
+                 velocity_alpha: float = 1e-6, velocity_top: int = 10, fiscal_year_end: int = 12,
+                 spike_period: str = 'M', spike_baseline: int = 12, spike_min_periods: int = 3,
+                 spike_threshold: float = 2.5, spike_top: int = 10):
+        """
+        Velocity is checked over sliding windows of each length in velocity_windows
+        (pandas Timedelta strings). A window is flagged when it holds at least
+        velocity_min_count transactions and a count a Poisson process at the entity's
+        own average rate exceeds with probability below velocity_alpha.
+
+        fiscal_year_end is the last month (1-12) of the fiscal year. Period spikes
+        compare each entity's spending per spike_period ('M' months or 'W' weeks)
+        with its average over up to spike_baseline preceding periods (at least
+        spike_min_periods since its first transaction); ratios of spike_threshold
+        or more are spikes.
+        """
+        self.velocity_windows = tuple(velocity_windows)
+        self.window_lengths = [pd.Timedelta(w).value for w in self.velocity_windows]
+        if any(length <= 0 for length in self.window_lengths):
+            raise ValueError("Velocity windows must be positive durations")
+        self.velocity_min_count = velocity_min_count
+        self.velocity_alpha = velocity_alpha
+        self.velocity_top = velocity_top
+        if not 1 <= fiscal_year_end <= 12:
+            raise ValueError("fiscal_year_end must be a month number (1-12)")
+        if spike_period not in ('M', 'W'):
+            raise ValueError("spike_period must be 'M' (months) or 'W' (weeks)")
+        self.fiscal_year_end = fiscal_year_end
+        self.spike_period = spike_period
+        self.spike_baseline = spike_baseline
+        self.spike_min_periods = max(1, spike_min_periods)
+        self.spike_threshold = spike_threshold
+        self.spike_top = spike_top
+
     @property
     def name(self) -> str:
         return "The Chronologist"
 
     @property
     def description(self) -> str:
-        return "Time-series anomaly detection: Velocity checks and Fiscal Cliff dumping."
+        return "Time-series anomaly detection: Velocity checks, Fiscal Cliff dumping and per-entity period spikes."
 
-    def run(self, df: pd.DataFrame, date_col: str = 'date', amount_col: str = 'amount', entity_col: str = 'vendor_id') -> Dict[str, Any]:
+    @property
+    def required_columns(self) -> List[str]:
+        return ['date', 'amount', 'vendor_id', 'transaction_id', '_year_month']
+
+    def run(self, df: pd.DataFrame, date_col: str = 'date', amount_col: str = 'amount', entity_col: str = 'vendor_id', id_col: str = 'transaction_id') -> Dict[str, Any]:
         """
         Analyzes timing patterns of transactions.
         """
-        df[date_col] = pd.to_datetime(df[date_col])
-        
-        results = {
+        return self.finalize(self.update_state(self.init_state(), df, date_col, amount_col, entity_col, id_col))
+
+    def init_state(self) -> Dict[str, Any]:
+        return {"monthly": None, "periods": None, "events": [], "velocity": self.velocity_summary(None)}
+
+    def update_state(self, state: Dict[str, Any], df: pd.DataFrame, date_col: str = 'date', amount_col: str = 'amount', entity_col: str = 'vendor_id', id_col: str = 'transaction_id') -> Dict[str, Any]:
+        """
+        Keeps spending per month and per (entity, period). Sliding windows need the
+        individual events (entity, timestamp, amount, ID: 32 bytes/row), but only
+        recent ones and those that can still belong to a flagged window are kept
+        (see prune_events), with the transactions per entity and the time span.
+        """
+        rows = len(df)
+        with self.span("monthly_spending", rows):
+            monthly = self.monthly_spending(df, date_col, amount_col)
+        with self.span("period_totals", rows):
+            periods = self.period_totals(df, date_col, amount_col, entity_col)
+        with self.span("velocity_events", rows):
+            events = self.velocity_events(df, date_col, amount_col, entity_col, id_col)
+        chunk = {"monthly": monthly, "periods": periods, "events": [events], "velocity": self.velocity_summary(events)}
+        with self.span("merge_states"):
+            state = self._merge_states(state, chunk)
+        if len(events):
+            with self.span("prune_events"):
+                state = self.prune_events(state, int(events['time'].min()))
+        return state
+
+    def merge_states(self, left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        When right starts no earlier than left ends (time-ordered partitions, or stored
+        batches of a feed), events are pruned as in update_state.
+        """
+        merged = self._merge_states(left, right)
+        end, start = left["velocity"]["last"], right["velocity"]["first"]
+        if end is not None and start is not None and start >= end:
+            with self.span("prune_events"):
+                merged = self.prune_events(merged, start)
+        return merged
+
+    def _merge_states(self, left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+        merged = {"events": left["events"] + right["events"], "velocity": self.merge_velocity_summaries(left, right)}
+        for key in ("monthly", "periods"):
+            if left[key] is None or right[key] is None:
+                merged[key] = right[key] if left[key] is None else left[key]
+            else:
+                combined = pd.concat([left[key], right[key]])
+                merged[key] = combined.groupby(level=list(range(combined.index.nlevels))).sum()
+        return merged
+
+    def state_from_sql(self, source: SQLSource) -> Dict[str, Any]:
+        """
+        Monthly and per-(entity, period) sums are pushed down to the database.
+        Sliding windows need individual events, but per-(entity, day) counts bound
+        every window's count, so only the events of days where some window can
+        reach its threshold are read (see velocity_candidate_days), or all events
+        when those are more than SQL_EVENT_SHARE of them. The rates come from the
+        totals, kept in the velocity summary.
+        """
+        with self.span("monthly_spending") as span:
+            monthly = source.monthly_totals()
+            span["rows"] = len(monthly)
+            monthly = pd.Series(monthly['amount'].to_numpy(dtype=np.float64), index=monthly['period'].to_numpy(dtype=np.int64), name='amount')
+        with self.span("period_totals") as span:
+            totals = source.entity_period_totals(self.spike_period)
+            span["rows"] = len(totals)
+            if self.spike_period == 'M':
+                periods = totals['period'].to_numpy(dtype=np.int64)
+            else:
+                periods = pd.PeriodIndex(pd.to_datetime(totals['period']), freq='W').asi8
+            index = pd.MultiIndex.from_arrays([totals['entity'].to_numpy(), periods], names=['entity', 'period'])
+            periods = pd.Series(totals['amount'].to_numpy(dtype=np.float64), index=index, name='amount')
+        with self.span("velocity_events") as span:
+            first, last = source.date_bounds()
+            time_span = float((pd.Timestamp(last) - pd.Timestamp(first)).value) if first is not None else 0.0
+            days, sizes = self.velocity_candidate_days(source.entity_day_counts(), time_span)
+            if days['count'].sum() > SQL_EVENT_SHARE * sizes.sum():
+                events, rows = [], 0
+                has_ids = 'transaction_id' in source.table_columns()
+                for chunk in source.iter_chunks(['vendor_id', 'date', 'amount', 'transaction_id']):
+                    if not has_ids:
+                        # Row positions stand in for missing IDs.
+                        chunk.index += rows
+                    rows += len(chunk)
+                    events.append(self.velocity_events(chunk, 'date', 'amount', 'vendor_id', 'transaction_id'))
+                span["rows"] = rows
+            else:
+                found = source.entity_day_events(days)
+                span["rows"] = len(found)
+                events = [pd.DataFrame({
+                    'vendor_id': found['entity'].to_numpy(),
+                    "time": pd.to_datetime(found['date']).to_numpy(dtype='datetime64[ns]').view(np.int64),
+                    "amount": found['amount'].to_numpy(dtype=np.float64),
+                    "id": found['id'].to_numpy()
+                })]
+        velocity = self.velocity_summary(None)
+        if first is not None:
+            velocity.update(sizes=sizes, first=pd.Timestamp(first).value, last=pd.Timestamp(last).value)
+        return {"monthly": monthly, "periods": periods, "events": events, "velocity": velocity}
+
+    def velocity_candidate_days(self, counts: pd.DataFrame, span: float) -> Tuple[pd.DataFrame, pd.Series]:
+        """
+        From transactions per (entity, day) (columns entity, day, count), the
+        (entity, day) pairs (with their count) whose events can belong to a flagged
+        window, and the transactions per entity. A window of length L starting on day s ends by day
+        s + ceil(L / 1 day), so its count is at most the sum over those days; days
+        from which no window can reach the threshold are skipped, unless a window
+        starting on an earlier candidate day reaches into them.
+        """
+        codes, entities = pd.factorize(counts['entity'])
+        day_numbers = pd.to_datetime(counts['day']).to_numpy(dtype='datetime64[D]').view(np.int64)
+        order = np.lexsort((day_numbers, codes))
+        codes, day_numbers, daily = codes[order], day_numbers[order], counts['count'].to_numpy(dtype=np.int64)[order]
+        sizes = np.bincount(codes, weights=daily, minlength=len(entities)).astype(np.int64)
+        keep = np.zeros(len(codes), dtype=bool)
+        if len(codes):
+            day_ns = pd.Timedelta(days=1).value
+            reach = max(-(-length // day_ns) for length in self.window_lengths)
+            # One sorted key per (entity, day), spaced so that reaches never cross entities.
+            offset = day_numbers - day_numbers.min()
+            keys = codes.astype(np.int64) * (int(offset.max()) + reach + 1) + offset
+            cumulative = np.r_[0, np.cumsum(daily)]
+            positions = np.arange(len(keys))
+            for length in self.window_lengths:
+                ends = np.searchsorted(keys, keys + -(-length // day_ns), side='right')
+                possible = cumulative[ends] - cumulative[positions] >= self.velocity_threshold(sizes, length, span)[codes]
+                marks = np.zeros(len(keys) + 1, dtype=np.int64)
+                np.add.at(marks, positions[possible], 1)
+                np.add.at(marks, ends[possible], -1)
+                keep |= np.cumsum(marks[:-1]) > 0
+        days = pd.DataFrame({'entity': counts['entity'].to_numpy()[order][keep], 'day': counts['day'].to_numpy()[order][keep], 'count': daily[keep]})
+        return days, pd.Series(sizes, index=entities)
+
+    def velocity_summary(self, events: Optional[pd.DataFrame]) -> Dict[str, Any]:
+        """
+        What the velocity check needs beyond the kept events: transactions per entity,
+        first and last timestamp (ns), the time range [lo, hi) whose events were
+        pruned, and per pruned entity and window the largest count of a window that
+        held a pruned event.
+        """
+        labels = list(self.velocity_windows)
+        summary = {"sizes": pd.Series(dtype=np.int64), "first": None, "last": None, "pruned": None,
+                   "peaks": pd.DataFrame(columns=labels, dtype=np.float64)}
+        if events is not None and len(events):
+            times = events['time'].to_numpy()
+            summary.update(sizes=events.groupby(events.columns[0], sort=False).size(), first=int(times.min()), last=int(times.max()))
+        return summary
+
+    def merge_velocity_summaries(self, left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+        a, b = left["velocity"], right["velocity"]
+        if not len(a["sizes"]) or not len(b["sizes"]):
+            sizes = b["sizes"] if not len(a["sizes"]) else a["sizes"]
+        else:
+            sizes = a["sizes"].add(b["sizes"], fill_value=0).astype(np.int64)
+        bounds = [x for x in (a["first"], b["first"]) if x is not None]
+        ends = [x for x in (a["last"], b["last"]) if x is not None]
+        ranges = [r for r in (a["pruned"], b["pruned"]) if r is not None]
+        peaks = pd.concat([p for p in (a["peaks"], b["peaks"]) if len(p)] or [a["peaks"]])
+        peaks = peaks.groupby(level=0).max() if len(peaks) else peaks
+        # Events landing where the other side already pruned that entity's events
+        # may complete windows whose other events are gone.
+        late = self.late_entities(a, right["events"]).union(self.late_entities(b, left["events"]))
+        if len(late):
+            peaks = peaks.reindex(peaks.index.union(late))
+            peaks.loc[late] = np.inf
+        return {
+            "sizes": sizes,
+            "first": min(bounds) if bounds else None,
+            "last": max(ends) if ends else None,
+            "pruned": (min(r[0] for r in ranges), max(r[1] for r in ranges)) if ranges else None,
+            "peaks": peaks
+        }
+
+    @staticmethod
+    def late_entities(summary: Dict[str, Any], events: List[pd.DataFrame]) -> pd.Index:
+        """Entities of events inside the pruned range of summary that had events pruned there."""
+        if summary["pruned"] is None:
+            return pd.Index([])
+        lo, hi = summary["pruned"]
+        late = [frame[frame.columns[0]][((frame['time'] >= lo) & (frame['time'] < hi)).to_numpy()] for frame in events]
+        found = pd.Index(pd.concat(late).unique()) if late else pd.Index([])
+        return found.intersection(summary["peaks"].index)
+
+    def prune_events(self, state: Dict[str, Any], watermark: int) -> Dict[str, Any]:
+        """
+        Drops events that can no longer belong to a flagged window, assuming later rows
+        are not older than watermark (the first timestamp of the latest batch). Events
+        within twice the longest window of the first timestamp (so earlier partitions
+        can still be merged in) or of watermark are kept, as are those inside a window
+        whose count is at least as unlikely as VELOCITY_PRUNE_ALPHA at the entity's
+        current rate. In time-ordered feeds the kept events are thus the recent ones
+        plus the bursts; shuffled input keeps every event. Per entity and window the
+        largest count of a window holding a pruned event is kept, so finalize can tell
+        when the final rates would have flagged it.
+        """
+        summary = state["velocity"]
+        reach = 2 * max(self.window_lengths)
+        lo, hi = summary["first"] + reach, watermark - reach
+        if hi <= lo or not state["events"]:
+            return state
+        events = pd.concat(state["events"], ignore_index=True) if len(state["events"]) > 1 else state["events"][0]
+        times = events['time'].to_numpy()
+        if not ((times >= lo) & (times < hi)).any():
+            return dict(state, events=[events])
+
+        codes, entities = pd.factorize(events[events.columns[0]])
+        order = np.lexsort((times, codes))
+        codes, times = codes[order], times[order]
+        keep = (times < lo) | (times >= hi)
+        sizes = summary["sizes"].reindex(entities).to_numpy(dtype=np.float64)
+        span = float(summary["last"] - summary["first"])
+        positions = np.arange(len(times))
+        windows = []
+        for length in self.window_lengths:
+            ends = self.window_ends(times, codes, length)
+            counts = ends - positions
+            possible = np.flatnonzero(counts >= self.velocity_min_count)
+            candidates, at = np.unique(codes[possible], return_inverse=True)
+            alpha = max(VELOCITY_PRUNE_ALPHA, self.velocity_alpha)
+            possible = possible[counts[possible] >= self.velocity_threshold(sizes[candidates], length, span, alpha)[at]]
+            marks = np.zeros(len(times) + 1, dtype=np.int64)
+            np.add.at(marks, possible, 1)
+            np.add.at(marks, ends[possible], -1)
+            keep |= np.cumsum(marks[:-1]) > 0
+            windows.append((ends, counts))
+        dropped = np.r_[0, np.cumsum(~keep)]
+        peaks = np.zeros((len(entities), len(windows)))
+        for w, (ends, counts) in enumerate(windows):
+            holds = dropped[ends] > dropped[positions]
+            np.maximum.at(peaks[:, w], codes[holds], counts[holds])
+        pruned_entities = np.unique(codes[~keep])
+        peaks = pd.DataFrame(peaks[pruned_entities], index=entities[pruned_entities], columns=list(self.velocity_windows))
+        peaks = pd.concat([p for p in (summary["peaks"], peaks) if len(p)]).groupby(level=0).max()
+        pruned = (lo, hi) if summary["pruned"] is None else (min(summary["pruned"][0], lo), max(summary["pruned"][1], hi))
+        kept = np.zeros(len(events), dtype=bool)
+        kept[order] = keep
+        return dict(state, events=[events[kept].reset_index(drop=True)], velocity=dict(summary, pruned=pruned, peaks=peaks))
+
+    def incomplete_entities(self, summary: Dict[str, Any], span: float) -> int:
+        """
+        Entities whose pruned events could belong to a flagged window at the final
+        rates (or that received events where theirs were already pruned), so their
+        bursts may be missing.
+        """
+        peaks = summary["peaks"]
+        if not len(peaks):
+            return 0
+        sizes = summary["sizes"].reindex(peaks.index).to_numpy(dtype=np.float64)
+        incomplete = np.zeros(len(peaks), dtype=bool)
+        for label, length in zip(self.velocity_windows, self.window_lengths):
+            incomplete |= peaks[label].to_numpy() >= self.velocity_threshold(sizes, length, span)
+        return int(incomplete.sum())
+
+    def finalize(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        with self.span("fiscal_cliff"):
+            fiscal_cliff = self.fiscal_cliff_from_monthly(state["monthly"])
+        with self.span("period_spikes", len(state["periods"])):
+            period_spikes = self.period_spikes_from_totals(state["periods"])
+        with self.span("velocity_check") as span:
+            events = pd.concat(state["events"], ignore_index=True) if state["events"] else None
+            span["rows"] = 0 if events is None else len(events)
+            summary = state["velocity"]
+            velocity = {}
+            if events is not None and summary["first"] is not None:
+                span_ns = float(summary["last"] - summary["first"])
+                velocity = self.velocity_from_events(events, summary["sizes"], span_ns)
+                velocity["incomplete_entities"] = self.incomplete_entities(summary, span_ns)
+        return {
             "detector_name": self.name,
-            "fiscal_cliff": self.detect_fiscal_cliff(df, date_col, amount_col),
-            "velocity_anomalies": self.velocity_check(df, date_col, entity_col)
+            "fiscal_cliff": fiscal_cliff,
+            "period_spikes": period_spikes,
+            "velocity_anomalies": velocity
         }
-        return results
+
+    def monthly_spending(self, df: pd.DataFrame, date_col: str, amount_col: str) -> pd.Series:
+        """
+        Spending per calendar month, indexed by monthly period ordinal (months since 1970-01).
+        """
+        months = self._derived(df, date_col, '_year_month')
+        dated = months.notna().to_numpy()
+        return df[amount_col][dated].groupby(months.array.asi8[dated]).sum()
 
     def detect_fiscal_cliff(self, df: pd.DataFrame, date_col: str, amount_col: str) -> Dict[str, Any]:
         """
         Detects year-end spending spikes.
         """
-        df['month'] = df[date_col].dt.month
-        monthly_spending = df.groupby('month')[amount_col].sum()
-        
-        avg_spending = monthly_spending.mean()
-        dec_spending = monthly_spending.get(12, 0)
-        
-        ratio = dec_spending / avg_spending if avg_spending > 0 else 0
-        
-        status = "Normal"
-        if ratio > 2.5: status = "Extreme Dumping"
-        elif ratio > 1.5: status = "Significant Increase"
+        return self.fiscal_cliff_from_monthly(self.monthly_spending(df, date_col, amount_col))
+
+    def fiscal_cliff_from_monthly(self, monthly_spending: pd.Series) -> Dict[str, Any]:
+        ordinals = monthly_spending.index.to_numpy(dtype=np.int64)
+        months = ordinals % 12 + 1
+        by_month = monthly_spending.groupby(months).sum()
+        avg_spending = by_month.mean()
+        ratio = by_month.get(self.fiscal_year_end, 0) / avg_spending if avg_spending > 0 else 0
+        dec_ratio = by_month.get(12, 0) / avg_spending if avg_spending > 0 else 0
+
+        status = self.cliff_status(ratio)
+
+        # Fiscal years are named by the calendar year they end in.
+        fiscal_years = ordinals // 12 + 1970 + (months > self.fiscal_year_end)
+        year_average = monthly_spending.groupby(fiscal_years).mean()
+        year_end = monthly_spending[months == self.fiscal_year_end]
+        year_end.index = fiscal_years[months == self.fiscal_year_end]
+        by_fiscal_year = (year_end / year_average[year_end.index]).where(year_average[year_end.index] > 0, 0)
 
         return {
-            "monthly_spending": {str(k): float(v) for k, v in monthly_spending.to_dict().items()},
-            "december_vs_avg_ratio": float(ratio),
+            "monthly_spending": {str(k): float(v) for k, v in by_month.to_dict().items()},
+            "fiscal_year_end": self.fiscal_year_end,
+            "year_end_vs_avg_ratio": float(ratio),
+            "december_vs_avg_ratio": float(dec_ratio),
+            "year_end_ratio_by_fiscal_year": {str(k): float(v) for k, v in by_fiscal_year.items()},
             "status": status,
-            "explanation": "Compares December spending to the yearly average. High ratios suggest 'budget dumping' to avoid losing funds."
+            "explanation": "Compares spending in the last month of the fiscal year to the monthly average. High ratios suggest 'budget dumping' to avoid losing funds."
+        }
+
+    @staticmethod
+    def cliff_status(ratio: float) -> str:
+        """Fiscal cliff status of a year-end vs. average ratio."""
+        if ratio > 2.5: return "Extreme Dumping"
+        if ratio > 1.5: return "Significant Increase"
+        return "Normal"
+
+    def period_totals(self, df: pd.DataFrame, date_col: str, amount_col: str, entity_col: str) -> pd.Series:
+        """
+        Spending per (entity, period), the period as a period ordinal of spike_period.
+        """
+        if self.spike_period == 'M':
+            periods = self._derived(df, date_col, '_year_month')
+        else:
+            dates = df[date_col]
+            if not pd.api.types.is_datetime64_any_dtype(dates):
+                dates = pd.to_datetime(dates)
+            periods = dates.dt.to_period('W')
+        entities = self.plain(df[entity_col])
+        keep = (periods.notna() & entities.notna()).to_numpy()
+        frame = pd.DataFrame({
+            "entity": entities.to_numpy()[keep],
+            "period": periods.array.asi8[keep],
+            "amount": df[amount_col].to_numpy(dtype=np.float64)[keep]
+        })
+        return frame.groupby(['entity', 'period'], sort=False)['amount'].sum()
+
+    def period_matrix(self, totals: pd.Series) -> Tuple[np.ndarray, pd.Index, pd.PeriodIndex]:
+        """
+        Dense (entity x period) spending matrix over every period from the first to
+        the last one seen (zero where an entity spent nothing), with its row and
+        column labels.
+        """
+        codes, entities = pd.factorize(totals.index.get_level_values('entity'))
+        ordinals = totals.index.get_level_values('period').to_numpy(dtype=np.int64)
+        first = ordinals.min(initial=0)
+        last = ordinals.max(initial=-1)
+        matrix = np.zeros((len(entities), last - first + 1))
+        matrix[codes, ordinals - first] = totals.to_numpy(dtype=np.float64)
+        return matrix, entities, pd.PeriodIndex.from_ordinals(np.arange(first, last + 1), freq=self.spike_period)
+
+    def spike_table(self, totals: pd.Series) -> pd.DataFrame:
+        """
+        Period spikes of every entity, ranked by peak ratio: each period's spending
+        divided by the entity's average over the preceding spike_baseline periods
+        (counted from its first active period). Columns: periods (scored), spikes,
+        year_end_spikes, peak_period, peak_amount, peak_baseline, peak_ratio and
+        year_end_ratio (mean ratio of the fiscal year-end periods).
+        """
+        if totals.empty:
+            # No row with both a date and an entity (e.g. an empty date range).
+            return pd.DataFrame({
+                "periods": pd.Series(dtype=np.int64), "spikes": pd.Series(dtype=np.int64),
+                "year_end_spikes": pd.Series(dtype=np.int64), "peak_period": pd.Series(dtype=object),
+                "peak_amount": pd.Series(dtype=np.float64), "peak_baseline": pd.Series(dtype=np.float64),
+                "peak_ratio": pd.Series(dtype=np.float64), "year_end_ratio": pd.Series(dtype=np.float64)
+            })
+        matrix, entities, periods = self.period_matrix(totals)
+        n_entities, n_periods = matrix.shape
+        first_active = np.argmax(matrix != 0, axis=1)
+        cumulative = np.concatenate([np.zeros((n_entities, 1)), np.cumsum(matrix, axis=1)], axis=1)
+        # Baseline of period j: periods [max(j - spike_baseline, first active), j).
+        position = np.arange(n_periods)
+        start = np.maximum(position[None, :] - self.spike_baseline, first_active[:, None])
+        length = position[None, :] - start
+        with np.errstate(divide='ignore', invalid='ignore'):
+            baseline = (cumulative[:, :n_periods] - np.take_along_axis(cumulative, start, axis=1)) / length
+            ratio = np.where((length >= self.spike_min_periods) & (baseline > 0), matrix / baseline, np.nan)
+
+        scored = np.isfinite(ratio)
+        spikes = scored & (ratio >= self.spike_threshold)
+        year_end = np.asarray(periods.month == self.fiscal_year_end)
+        peak = np.argmax(np.where(scored, ratio, -np.inf), axis=1)
+        rows = np.arange(n_entities)
+        year_end_ratio = np.where(scored[:, year_end], ratio[:, year_end], 0).sum(axis=1)
+        year_end_scored = scored[:, year_end].sum(axis=1)
+        table = pd.DataFrame({
+            "periods": scored.sum(axis=1),
+            "spikes": spikes.sum(axis=1),
+            "year_end_spikes": spikes[:, year_end].sum(axis=1),
+            "peak_period": periods[peak].astype(str),
+            "peak_amount": matrix[rows, peak],
+            "peak_baseline": baseline[rows, peak],
+            "peak_ratio": ratio[rows, peak],
+            "year_end_ratio": np.divide(year_end_ratio, year_end_scored, out=np.full(n_entities, np.nan), where=year_end_scored > 0)
+        }, index=entities)
+        table = table[table['periods'] > 0]
+        return table.sort_values(['peak_ratio', 'peak_amount'], ascending=False, kind='stable')
+
+    def period_spikes_from_totals(self, totals: pd.Series) -> Dict[str, Any]:
+        table = self.spike_table(totals)
+        top = table[table['spikes'] > 0].head(self.spike_top)
+        return {
+            "period": self.spike_period,
+            "fiscal_year_end": self.fiscal_year_end,
+            "baseline_periods": self.spike_baseline,
+            "threshold": self.spike_threshold,
+            "entities_scored": int(len(table)),
+            "flagged_entities": int((table['spikes'] > 0).sum()),
+            "spikes": int(table['spikes'].sum()),
+            "year_end_spikes": int(table['year_end_spikes'].sum()),
+            "top_entities": [
+                {"entity": entity.item() if hasattr(entity, 'item') else entity, **{
+                    k: (v.item() if hasattr(v, 'item') else v) for k, v in row.items()}}
+                for entity, row in zip(top.index, top.to_dict(orient='records'))
+            ],
+            "explanation": "Compares every period's spending of each entity with its own average over the preceding periods. "
+                           "Repeated spikes at the fiscal year-end suggest budget dumping by that entity."
         }
 
-    def velocity_check(self, df: pd.DataFrame, date_col: str, entity_col: str) -> Dict[str, Any]:
+    def velocity_check(self, df: pd.DataFrame, date_col: str, entity_col: str, amount_col: str = 'amount', id_col: str = 'transaction_id') -> Dict[str, Any]:
         """
         Detects high transaction frequency.
         """
-        df['date_only'] = df[date_col].dt.date
-        freq = df.groupby([entity_col, 'date_only']).size().reset_index(name='count')
-        
-        high_velocity = freq[freq['count'] > 5].sort_values(by='count', ascending=False)
-        high_velocity['date_only'] = high_velocity['date_only'].astype(str)
-        
+        return self.velocity_from_events(self.velocity_events(df, date_col, amount_col, entity_col, id_col))
+
+    def velocity_events(self, df: pd.DataFrame, date_col: str, amount_col: str, entity_col: str, id_col: str) -> pd.DataFrame:
+        """
+        Entity, timestamp (int64 nanoseconds), amount and ID of every dated transaction;
+        the row index stands in for missing IDs.
+        """
+        dates = df[date_col]
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates)
+        if getattr(dates.dt, 'tz', None) is not None:
+            dates = dates.dt.tz_convert('UTC').dt.tz_localize(None)
+        events = pd.DataFrame({
+            entity_col: self.plain(df[entity_col]).to_numpy(),
+            "time": dates.to_numpy(dtype='datetime64[ns]').view(np.int64),
+            "amount": df[amount_col].to_numpy(dtype=np.float64),
+            "id": self.plain(df[id_col]).to_numpy() if id_col in df.columns else df.index.to_numpy()
+        })
+        return events[(events[entity_col].notna() & dates.notna().to_numpy()).to_numpy()]
+
+    @staticmethod
+    def window_ends(times: np.ndarray, codes: np.ndarray, length: int) -> np.ndarray:
+        """
+        For every event i, sorted by (codes, times), the index of the first event of
+        the same code at or after times[i] + length. Codes are spaced further apart
+        than the time span, so a block of codes is one sorted int64 key searched at once.
+        """
+        ends = np.empty(len(times), dtype=np.int64)
+        if not len(times):
+            return ends
+        offsets = times - times.min()
+        stride = int(offsets.max()) + length + 1
+        per_block = max(1, 2 ** 62 // stride)
+        bounds = np.searchsorted(codes, np.arange(0, int(codes[-1]) + per_block + 1, per_block))
+        for first_code, start, end in zip(range(0, int(codes[-1]) + 1, per_block), bounds[:-1].tolist(), bounds[1:].tolist()):
+            keys = offsets[start:end] + (codes[start:end] - first_code).astype(np.int64) * stride
+            ends[start:end] = start + np.searchsorted(keys, keys + length)
+        return ends
+
+    def velocity_threshold(self, sizes: np.ndarray, length: int, span: float, alpha: Optional[float] = None) -> np.ndarray:
+        """
+        Smallest flagged count of a window of length (ns) for entities with sizes
+        transactions over span (ns): at least velocity_min_count, and above what a
+        Poisson process at the entity's own average rate exceeds with probability
+        alpha (default velocity_alpha).
+        """
+        alpha = self.velocity_alpha if alpha is None else alpha
+        rate = np.asarray(sizes, dtype=np.float64) * length / max(span, length)
+        # Poisson inverse survival function from scipy.special, which imports in a
+        # fraction of the time scipy.stats takes: the smallest k with P(X > k) <= alpha.
+        k = np.ceil(special.pdtrik(1 - alpha, rate))
+        lower = np.maximum(k - 1, 0)
+        k = np.where(special.pdtrc(lower, rate) <= alpha, lower, k)
+        return np.maximum(self.velocity_min_count, np.nan_to_num(k) + 1)
+
+    def velocity_from_events(self, events: pd.DataFrame, sizes: Optional[pd.Series] = None, span: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Sorts the events once by (entity, time), then for every window length counts
+        the transactions in [t, t + window) from each transaction. Overlapping flagged
+        windows of an entity are merged into one burst, reported with its transaction IDs.
+
+        The rates behind the thresholds come from the events themselves, unless
+        they are only a subset: then sizes (transactions per entity) and span (ns)
+        describe all of them.
+        """
+        entity_col = events.columns[0]
+        try:
+            # Entities in label order, so pruned events do not reorder the results.
+            codes, entities = pd.factorize(events[entity_col], sort=True)
+        except TypeError:
+            codes, entities = pd.factorize(events[entity_col])
+        times = events['time'].to_numpy()
+        # Stable sorts by time, then entity; small codes get numpy's radix sort.
+        order = np.argsort(times, kind='stable')
+        narrow = codes.astype(np.uint16) if len(entities) <= np.iinfo(np.uint16).max else codes
+        order = order[np.argsort(narrow[order], kind='stable')]
+        codes, times = codes[order], times[order]
+        amounts = events['amount'].to_numpy()[order]
+        ids = events['id'].to_numpy()[order]
+
+        sizes = np.bincount(codes, minlength=len(entities)) if sizes is None else sizes.reindex(entities).to_numpy()
+        if span is None:
+            span = float(times.max() - times.min()) if len(times) else 0.0
+
+        summary = []
+        windows, firsts, last_ends, peaks, thresholds = [], [], [], [], []
+        for w, (label, length) in enumerate(zip(self.velocity_windows, self.window_lengths)):
+            ends = self.window_ends(times, codes, length)
+            counts = ends - np.arange(len(times))
+            threshold = self.velocity_threshold(sizes, length, span)
+            flagged = np.flatnonzero(counts >= threshold[codes])
+
+            # Window ends never decrease, so a flagged window starting at or after the
+            # previous one's end (or in a later entity) starts a new burst.
+            starts = np.flatnonzero(np.r_[True, flagged[1:] >= ends[flagged[:-1]]]) if len(flagged) else flagged
+            first = flagged[starts]
+            last_end = np.maximum.reduceat(ends[flagged], starts) if len(starts) else first
+            peak = np.maximum.reduceat(counts[flagged], starts) if len(starts) else first
+            summary.append({
+                "window": label,
+                "flagged_windows": int(len(flagged)),
+                "bursts": int(len(first)),
+                "flagged_entities": int(len(np.unique(codes[first])))
+            })
+            windows.append(np.full(len(first), w))
+            firsts.append(first)
+            last_ends.append(last_end)
+            peaks.append(peak)
+            thresholds.append(threshold[codes[first]])
+
+        windows, firsts, last_ends, peaks, thresholds = (np.concatenate(a) for a in (windows, firsts, last_ends, peaks, thresholds))
+        # Every transaction inside a burst of any window, in (entity, time) order.
+        marks = np.zeros(len(times) + 1, dtype=np.int64)
+        np.add.at(marks, firsts, 1)
+        np.add.at(marks, last_ends, -1)
+        in_burst = np.cumsum(marks[:-1]) > 0
+
+        # Bursts furthest above their threshold first.
+        top = np.lexsort((firsts, -peaks, -peaks / np.maximum(thresholds, 1)))[:self.velocity_top]
+        high_velocity = []
+        for i in top.tolist():
+            start, end, code = firsts[i], last_ends[i], codes[firsts[i]]
+            entity = entities[code]
+            high_velocity.append({
+                entity_col: entity.item() if hasattr(entity, 'item') else entity,
+                "window": self.velocity_windows[windows[i]],
+                "date_only": pd.Timestamp(times[start]).strftime('%Y-%m-%d'),
+                "start": pd.Timestamp(times[start]).isoformat(),
+                "end": pd.Timestamp(times[end - 1]).isoformat(),
+                "count": int(peaks[i]),
+                "threshold": int(thresholds[i]),
+                "burst_transactions": int(end - start),
+                "total_amount": float(amounts[start:end].sum()),
+                "transaction_ids": ids[start:end].tolist()
+            })
+
         return {
-            "high_velocity_events": high_velocity.head(10).to_dict(orient='records'),
-            "explanation": "Identifies entities with an unusually high volume of transactions on a single day."
+            "windows": summary,
+            "flagged_count": int(in_burst.sum()),
+            "flagged_transaction_ids": ids[in_burst].tolist(),
+            "high_velocity_events": high_velocity,
+            "explanation": "Counts each entity's transactions in sliding windows from every transaction. "
+                           "Windows holding far more than the entity's usual rate may indicate split "
+                           "purchases or automated fraud."
         }
@@ -1,9 +1,74 @@
+import heapq
+import random
+import time
 import networkx as nx
+import numpy as np
 import pandas as pd
-from typing import Dict, Any, List, Set
+from scipy import sparse
+from scipy.sparse import csgraph
+from typing import Dict, Any, List, Set, Tuple, Optional, NamedTuple, Iterator, Union
 from ..core.base import BaseDetector
+from ..utils.sql_source import SQLSource
+
+class CompactGraph(NamedTuple):
+    """
+    Integer-indexed edge arrays of a transfer graph: edge e runs from
+    nodes[source[e]] to nodes[target[e]] with total amount[e] over count[e] transfers.
+    """
+    nodes: List[Any]
+    source: np.ndarray
+    target: np.ndarray
+    amount: np.ndarray
+    count: np.ndarray
+
+    def csr(self, weighted: bool = False) -> sparse.csr_array:
+        n = len(self.nodes)
+        weights = self.amount if weighted else np.ones(len(self.source))
+        return sparse.csr_array((weights, (self.source, self.target)), shape=(n, n))
+
+    def labels(self, connection: str) -> np.ndarray:
+        """Component label of every node ('strong' or 'weak' connectivity)."""
+        return csgraph.connected_components(self.csr(), directed=True, connection=connection)[1]
+
+    def subgraph(self, members: np.ndarray, amount_col: str = 'amount') -> nx.DiGraph:
+        """DiGraph of the edges between the given node indices."""
+        inside = np.zeros(len(self.nodes), dtype=bool)
+        inside[members] = True
+        keep = np.flatnonzero(inside[self.source] & inside[self.target])
+        G = nx.DiGraph()
+        G.add_edges_from((self.nodes[u], self.nodes[v], {amount_col: a, 'count': c}) for u, v, a, c in
+                         zip(self.source[keep].tolist(), self.target[keep].tolist(), self.amount[keep].tolist(), self.count[keep].tolist()))
+        return G
+
+def _groups(labels: np.ndarray) -> List[np.ndarray]:
+    """Node indices per label, labels in order of first appearance."""
+    order = np.argsort(labels, kind='stable')
+    bounds = np.flatnonzero(np.r_[True, labels[order][1:] != labels[order][:-1], True])
+    groups = [order[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:])]
+    return sorted(groups, key=lambda g: g[0])
 
 class Connector(BaseDetector):
+    state_options = ()
+
+    def __init__(self, max_cycle_length: Optional[int] = None, max_cycles: int = 100000, cycle_time_budget: Optional[float] = 30.0, rank_cycles_by_amount: bool = False,
+                 pagerank_weighted: bool = False, betweenness_k: Optional[int] = 256, betweenness_seed: int = 42, compact: bool = False):
+        """
+        Cycle enumeration is exponential in the worst case, so it is bounded by cycle
+        length, number of cycles and time (seconds); see detect_cycles.
+        Betweenness is estimated from betweenness_k sampled sources (exact when the
+        graph has at most that many nodes, or when it is None); see analyze_centrality.
+        With compact=True the analyses run on a CompactGraph instead of a networkx
+        DiGraph, which is only built for the components searched for cycles.
+        """
+        self.max_cycle_length = max_cycle_length
+        self.max_cycles = max_cycles
+        self.cycle_time_budget = cycle_time_budget
+        self.rank_cycles_by_amount = rank_cycles_by_amount
+        self.pagerank_weighted = pagerank_weighted
+        self.betweenness_k = betweenness_k
+        self.betweenness_seed = betweenness_seed
+        self.compact = compact
+
     @property
     def name(self) -> str:
         return "The Connector"
@@ -12,55 +77,324 @@ class Connector(BaseDetector):
     def description(self) -> str:
         return "Graph-based detection for circular trading and hidden communities."
 
-    def run(self, df: pd.DataFrame, source_col: str = 'sender_id', target_col: str = 'receiver_id', amount_col: str = 'amount') -> Dict[str, Any]:
+    @property
+    def required_columns(self) -> List[str]:
+        return ['sender_id', 'receiver_id', 'amount', 'date']
+
+    def run(self, df: pd.DataFrame, source_col: str = 'sender_id', target_col: str = 'receiver_id', amount_col: str = 'amount', date_col: str = 'date') -> Dict[str, Any]:
         """
         Builds a network and analyzes connections.
         """
-        G = nx.from_pandas_edgelist(df, source_col, target_col, [amount_col], create_using=nx.DiGraph())
-        
+        return self.finalize(self.update_state(self.init_state(), df, source_col, target_col, amount_col, date_col), amount_col)
+
+    def init_state(self) -> List[pd.DataFrame]:
+        return []
+
+    def update_state(self, state: List[pd.DataFrame], df: pd.DataFrame, source_col: str = 'sender_id', target_col: str = 'receiver_id', amount_col: str = 'amount', date_col: str = 'date') -> List[pd.DataFrame]:
+        """
+        Keeps partial edge tables (see aggregate_edges), combined whenever the
+        newer parts outgrow the combined one so the total work stays linear.
+        """
+        with self.span("aggregate_edges", len(df)):
+            edges = self.aggregate_edges(df, source_col, target_col, amount_col, date_col)
+        with self.span("merge_states"):
+            return self._compact(state + [edges])
+
+    def merge_states(self, left: List[pd.DataFrame], right: List[pd.DataFrame]) -> List[pd.DataFrame]:
+        return self._compact(left + right)
+
+    def state_from_sql(self, source: SQLSource) -> List[pd.DataFrame]:
+        """The edge table (see aggregate_edges), grouped by the database."""
+        with self.span("aggregate_edges") as span:
+            edges = source.edge_totals()
+            span["rows"] = len(edges)
+            edges = edges.assign(first_date=pd.to_datetime(edges['first_date']), last_date=pd.to_datetime(edges['last_date']))
+        return [edges.set_index(['source', 'target'])]
+
+    def _compact(self, parts: List[pd.DataFrame], force: bool = False) -> List[pd.DataFrame]:
+        if len(parts) < 2 or (not force and sum(map(len, parts[1:])) < len(parts[0])):
+            return parts
+        edges = pd.concat(parts)
+        grouped = edges.groupby(level=[0, 1], sort=False, dropna=False)
+        return [grouped.agg({'amount': 'sum', 'count': 'sum', 'first_date': 'min', 'last_date': 'max'})]
+
+    def aggregate_edges(self, df: pd.DataFrame, source_col: str = 'sender_id', target_col: str = 'receiver_id', amount_col: str = 'amount', date_col: str = 'date') -> pd.DataFrame:
+        """
+        One row per (sender, receiver) edge, in first-seen order: total amount,
+        number of transfers and first/last transfer date.
+        """
+        if date_col in df.columns:
+            dates = df[date_col]
+            if not pd.api.types.is_datetime64_any_dtype(dates):
+                # Dates are informational here, so unparseable ones become NaT.
+                dates = pd.to_datetime(dates, errors='coerce')
+        else:
+            dates = pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+        frame = pd.DataFrame({
+            'source': self.plain(df[source_col]),
+            'target': self.plain(df[target_col]),
+            'amount': df[amount_col],
+            'date': dates
+        })
+        grouped = frame.groupby(['source', 'target'], sort=False, dropna=False)
+        return grouped.agg(amount=('amount', 'sum'), count=('amount', 'size'), first_date=('date', 'min'), last_date=('date', 'max'))
+
+    def finalize(self, state: List[pd.DataFrame], amount_col: str = 'amount') -> Dict[str, Any]:
+        with self.span("build_graph") as span:
+            parts = self._compact(state, force=True)
+            edges = parts[0] if parts else self.aggregate_edges(pd.DataFrame({'sender_id': [], 'receiver_id': [], 'amount': []}))
+            span["rows"] = len(edges)
+            G = self.compact_graph(edges) if self.compact else self.build_graph(edges, amount_col)
+
+        with self.span("detect_cycles", len(edges)):
+            circular_trading = self.detect_cycles(G, amount_col=amount_col)
+        with self.span("analyze_centrality", len(edges)):
+            centrality_analysis = self.analyze_centrality(G, amount_col)
+        with self.span("detect_communities", len(edges)):
+            communities = self.detect_communities(G)
         results = {
             "detector_name": self.name,
-            "circular_trading": self.detect_cycles(G),
-            "centrality_analysis": self.analyze_centrality(G),
-            "communities": self.detect_communities(G)
+            "circular_trading": circular_trading,
+            "centrality_analysis": centrality_analysis,
+            "communities": communities
         }
         return results
 
-    def detect_cycles(self, G: nx.DiGraph) -> Dict[str, Any]:
+    @staticmethod
+    def build_graph(edges: pd.DataFrame, amount_col: str = 'amount') -> nx.DiGraph:
+        """
+        DiGraph of an aggregated edge table; each edge carries amount (the total),
+        count, first_date and last_date.
+        """
+        G = nx.DiGraph()
+        sources = edges.index.get_level_values(0).tolist()
+        targets = edges.index.get_level_values(1).tolist()
+        attributes = zip(edges['amount'].tolist(), edges['count'].tolist(), edges['first_date'].tolist(), edges['last_date'].tolist())
+        G.add_edges_from((source, target, {amount_col: amount, 'count': count, 'first_date': first, 'last_date': last})
+                         for source, target, (amount, count, first, last) in zip(sources, targets, attributes))
+        return G
+
+    @staticmethod
+    def compact_graph(edges: pd.DataFrame) -> 'CompactGraph':
+        """
+        Integer-indexed arrays of an aggregated edge table, numbering nodes in the
+        order a DiGraph built from the same table would list them.
+        """
+        sources = edges.index.get_level_values(0)
+        targets = edges.index.get_level_values(1)
+        interleaved = np.empty(2 * len(edges), dtype=object)
+        interleaved[0::2], interleaved[1::2] = sources, targets
+        codes, nodes = pd.factorize(interleaved, use_na_sentinel=False)
+        return CompactGraph(
+            nodes=list(nodes),
+            source=codes[0::2].astype(np.int64),
+            target=codes[1::2].astype(np.int64),
+            amount=edges['amount'].to_numpy(dtype=np.float64),
+            count=edges['count'].to_numpy(dtype=np.int64)
+        )
+
+    def detect_cycles(self, G: Union[nx.DiGraph, CompactGraph], amount_col: str = 'amount', sample_size: int = 10) -> Dict[str, Any]:
         """
         Detects circular transaction paths.
+
+        Cycles are enumerated lazily, one strongly connected component at a time
+        (components without a cycle are skipped), up to max_cycle_length edges. The
+        enumeration stops once more than max_cycles cycles exist or after cycle_time_budget
+        seconds (checked between cycles); cycles_count is then a lower bound. The sample holds the first
+        cycles found, or the ones moving the largest total amount when ranking.
         """
-        cycles = list(nx.simple_cycles(G))
-        top_cycles = cycles[:10]
+        start = time.perf_counter()
+        count = 0
+        stopped_by = None
+        sample: List[Tuple[float, int, List[Any]]] = []
+
+        for component in self._cycle_components(G, amount_col):
+            cycles = nx.simple_cycles(component, length_bound=self.max_cycle_length)
+            for cycle in cycles:
+                if self.max_cycles is not None and count >= self.max_cycles:
+                    # A cycle beyond the limit exists, so the count is only a lower bound.
+                    stopped_by = "max_cycles"
+                    break
+                count += 1
+                if self.rank_cycles_by_amount:
+                    entry = (self.cycle_amount(component, cycle, amount_col), -count, cycle)
+                    if len(sample) < sample_size:
+                        heapq.heappush(sample, entry)
+                    else:
+                        heapq.heappushpop(sample, entry)
+                elif len(sample) < sample_size:
+                    sample.append((self.cycle_amount(component, cycle, amount_col), -count, cycle))
+
+                if self.cycle_time_budget is not None and time.perf_counter() - start > self.cycle_time_budget:
+                    stopped_by = "time_budget"
+                    break
+            if stopped_by:
+                break
+
+        if self.rank_cycles_by_amount:
+            sample.sort(reverse=True)
         
         return {
-            "cycles_count": len(cycles),
-            "sample_cycles": top_cycles,
+            "cycles_count": count,
+            "cycles_count_is_exact": stopped_by is None,
+            "stopped_by": stopped_by,
+            "max_cycle_length": self.max_cycle_length,
+            "sample_cycles": [cycle for _, _, cycle in sample],
+            "sample_cycle_amounts": [amount for amount, _, _ in sample],
             "explanation": "Simple cycles in the graph indicate potential circular trading or money laundering loops."
         }
 
-    def analyze_centrality(self, G: nx.DiGraph) -> Dict[str, Any]:
+    @staticmethod
+    def _cycle_components(G: Union[nx.DiGraph, CompactGraph], amount_col: str = 'amount') -> Iterator[nx.DiGraph]:
+        """
+        Strongly connected components that can hold a cycle: more than one node, or a self-loop.
+        """
+        if isinstance(G, CompactGraph):
+            self_loops = set(G.source[G.source == G.target].tolist())
+            for members in _groups(G.labels('strong')):
+                if len(members) > 1 or int(members[0]) in self_loops:
+                    yield G.subgraph(members, amount_col)
+            return
+        for component in nx.strongly_connected_components(G):
+            if len(component) == 1:
+                node = next(iter(component))
+                if not G.has_edge(node, node):
+                    continue
+            yield G.subgraph(component)
+
+    @staticmethod
+    def cycle_amount(G: nx.DiGraph, cycle: List[Any], amount_col: str = 'amount') -> float:
+        """
+        Total amount on the edges around a cycle.
+        """
+        total = 0.0
+        for source, target in zip(cycle, cycle[1:] + cycle[:1]):
+            total += float(G[source][target].get(amount_col, 0.0))
+        return total
+
+    def analyze_centrality(self, G: Union[nx.DiGraph, CompactGraph], amount_col: str = 'amount') -> Dict[str, Any]:
         """
         Identifies key actors.
+
+        The graph is converted once to a SciPy CSR adjacency matrix. PageRank runs as
+        sparse power iteration (weighted by amount with pagerank_weighted), and
+        betweenness uses Brandes' algorithm from a random sample of sources, with the
+        same sampling and scaling as nx.betweenness_centrality(G, k, seed=seed).
         """
-        pagerank = nx.pagerank(G)
-        betweenness = nx.betweenness_centrality(G)
+        nodes = G.nodes if isinstance(G, CompactGraph) else list(G)
+        adjacency = self.to_csr(G, amount_col if self.pagerank_weighted else None)
+        pagerank = self.pagerank_csr(adjacency)
+        betweenness = self.betweenness_csr(adjacency, self.betweenness_k, self.betweenness_seed)
         
-        top_pagerank = sorted(pagerank.items(), key=lambda x: x[1], reverse=True)[:5]
-        top_betweenness = sorted(betweenness.items(), key=lambda x: x[1], reverse=True)[:5]
+        top_pagerank = [(nodes[i], float(pagerank[i])) for i in np.argsort(-pagerank, kind='stable')[:5]]
+        top_betweenness = [(nodes[i], float(betweenness[i])) for i in np.argsort(-betweenness, kind='stable')[:5]]
         
         return {
             "top_influencers_pagerank": top_pagerank,
             "top_bridges_betweenness": top_betweenness,
+            "pagerank_weighted_by": amount_col if self.pagerank_weighted else None,
+            "betweenness_sources": len(nodes) if self.betweenness_k is None else min(self.betweenness_k, len(nodes)),
             "explanation": "PageRank finds important entities, while Betweenness finds 'bridge' actors who control flows between groups."
         }
 
-    def detect_communities(self, G: nx.DiGraph) -> Dict[str, Any]:
+    @staticmethod
+    def to_csr(G: Union[nx.DiGraph, CompactGraph], weight: Optional[str] = None) -> sparse.csr_array:
+        """
+        Adjacency matrix in the order of G's nodes; entries are the weight attribute, or 1.
+        """
+        if isinstance(G, CompactGraph):
+            return G.csr(weighted=weight is not None)
+        index = {node: i for i, node in enumerate(G)}
+        sources, targets, weights = [], [], []
+        for source, target, value in G.edges(data=weight, default=1.0):
+            sources.append(index[source])
+            targets.append(index[target])
+            weights.append(1.0 if weight is None else float(value))
+        n = len(index)
+        return sparse.csr_array((np.asarray(weights, dtype=np.float64), (np.asarray(sources, dtype=np.int64), np.asarray(targets, dtype=np.int64))), shape=(n, n))
+
+    @staticmethod
+    def pagerank_csr(adjacency: sparse.csr_array, alpha: float = 0.85, max_iter: int = 100, tol: float = 1.0e-6) -> np.ndarray:
+        """
+        PageRank by power iteration, with the conventions of nx.pagerank: rows are
+        normalized by out-weight and dangling nodes link to every node uniformly.
+        """
+        n = adjacency.shape[0]
+        if n == 0:
+            return np.empty(0)
+        out_weight = np.asarray(adjacency.sum(axis=1)).ravel()
+        scale = np.divide(1.0, out_weight, out=np.zeros(n), where=out_weight != 0)
+        transition = sparse.csr_array(adjacency.multiply(scale[:, None]))
+        dangling = out_weight == 0
+        x = np.full(n, 1.0 / n)
+        for _ in range(max_iter):
+            last = x
+            x = alpha * (x @ transition + x[dangling].sum() / n) + (1 - alpha) / n
+            if np.abs(x - last).sum() < n * tol:
+                return x
+        raise nx.PowerIterationFailedConvergence(max_iter)
+
+    @staticmethod
+    def betweenness_csr(adjacency: sparse.csr_array, k: Optional[int] = None, seed: int = 42) -> np.ndarray:
+        """
+        Normalized betweenness of a directed, unweighted graph from k sampled sources
+        (all sources when k is None or k >= n). Each source runs a level-synchronous
+        BFS over the CSR arrays, so the per-edge work happens in NumPy.
+        """
+        n = adjacency.shape[0]
+        indptr, indices = adjacency.indptr.astype(np.int64), adjacency.indices.astype(np.int64)
+        sampled = k is not None and k < n
+        sources = random.Random(seed).sample(range(n), k) if sampled else range(n)
+
+        betweenness = np.zeros(n)
+        for source in sources:
+            dist = np.full(n, -1, dtype=np.int64)
+            sigma = np.zeros(n)
+            dist[source], sigma[source] = 0, 1.0
+            frontier = np.array([source], dtype=np.int64)
+            levels = []
+            depth = 0
+            while len(frontier):
+                starts = indptr[frontier]
+                counts = indptr[frontier + 1] - starts
+                if not counts.sum():
+                    break
+                edge_src = np.repeat(frontier, counts)
+                first = np.repeat(np.cumsum(counts) - counts, counts)
+                edge_dst = indices[np.repeat(starts, counts) + np.arange(len(edge_src)) - first]
+                dist[edge_dst[dist[edge_dst] < 0]] = depth + 1
+                # Edges on shortest paths lead exactly one level down.
+                down = dist[edge_dst] == depth + 1
+                edge_src, edge_dst = edge_src[down], edge_dst[down]
+                np.add.at(sigma, edge_dst, sigma[edge_src])
+                levels.append((edge_src, edge_dst))
+                frontier = np.unique(edge_dst)
+                depth += 1
+
+            delta = np.zeros(n)
+            for edge_src, edge_dst in reversed(levels):
+                np.add.at(delta, edge_src, sigma[edge_src] / sigma[edge_dst] * (1.0 + delta[edge_dst]))
+            delta[source] = 0.0
+            betweenness += delta
+
+        # Rescaled like networkx: over the (s, t) pairs with s sampled, t != s, v.
+        if n > 2:
+            if sampled:
+                scale = np.full(n, 1.0 / (k * (n - 2)))
+                scale[list(sources)] = 1.0 / ((k - 1) * (n - 2)) if k > 1 else np.nan
+                betweenness *= scale
+            else:
+                betweenness *= 1.0 / ((n - 1) * (n - 2))
+        return betweenness
+
+    def detect_communities(self, G: Union[nx.DiGraph, CompactGraph]) -> Dict[str, Any]:
         """
         Detects clusters.
         """
-        undirected_G = G.to_undirected()
-        components = list(nx.connected_components(undirected_G))
+        if isinstance(G, CompactGraph):
+            components = [[G.nodes[i] for i in members.tolist()] for members in _groups(G.labels('weak'))]
+        else:
+            components = list(nx.connected_components(G.to_undirected()))
         large_clusters = [list(c) for c in components if len(c) > 3]
         
         return {
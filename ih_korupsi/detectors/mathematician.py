@@ -1,10 +1,67 @@
 import numpy as np
 import pandas as pd
-from typing import Dict, Any, List
+from scipy import special
+from typing import Dict, Any, List, Tuple
 from ..core.base import BaseDetector
-from scipy import stats
+from ..utils.quantile_sketch import QuantileSketch
+
+def _second_digit_expected() -> np.ndarray:
+    first_two = np.arange(10, 100).reshape(9, 10)
+    return np.log10(1 + 1 / first_two).sum(axis=0)
+
+# Period ordinal of rows without a date (the NaT value of a monthly PeriodIndex).
+NO_PERIOD = np.iinfo(np.int64).min
+
+# Largest amounts kept for the Z-Score test's top_outliers.
+OUTLIER_TOP = 5
+
+# Standard errors of the median and MAD by which robust outlier candidates are kept
+# beyond the current bound, in case later rows of their vendor-month lower it.
+ROBUST_PRUNE_MARGIN = 4.0
+
+# Per test: the digit values, their expected frequencies, and Nigrini's MAD bounds
+# for close, acceptable and marginal conformity (None: judged by chi-square only).
+BENFORD_TESTS: Dict[str, Tuple[np.ndarray, np.ndarray, Any]] = {
+    "first_digit": (np.arange(1, 10), np.log10(1 + 1 / np.arange(1, 10)), (0.006, 0.012, 0.015)),
+    "second_digit": (np.arange(0, 10), _second_digit_expected(), (0.008, 0.010, 0.012)),
+    "first_two_digits": (np.arange(10, 100), np.log10(1 + 1 / np.arange(10, 100)), (0.0012, 0.0018, 0.0022)),
+    "last_two_digits": (np.arange(0, 100), np.full(100, 0.01), None)
+}
 
 class Mathematician(BaseDetector):
+    state_options = ('sketch_accuracy', 'robust_threshold', 'robust_min_count', 'rsf_method', 'rsf_k')
+
+    RSF_METHODS = ('mean_others', 'second_largest', 'top_k')
+
+    def __init__(self, rsf_method: str = 'mean_others', rsf_k: int = 2, rsf_threshold: float = 10.0, rsf_top: int = 10,
+                 benford_min_count: int = 50, benford_top: int = 10, robust_threshold: float = 3.5, robust_min_count: int = 10,
+                 robust_top: int = 10, sketch_accuracy: float = 0.01):
+        """
+        rsf_method picks the RSF baseline: the average of the other transactions
+        ('mean_others'), the second-largest transaction ('second_largest'), or the
+        average of the rsf_k largest against the average of the rest ('top_k').
+        Entities above rsf_threshold are flagged and the rsf_top highest reported.
+        Per-vendor Benford tests rank the benford_top vendors with at least
+        benford_min_count positive amounts.
+        Robust outliers are scored against each vendor's monthly median/MAD
+        (its overall one when the month has fewer than robust_min_count amounts),
+        estimated by quantile sketches with relative error sketch_accuracy.
+        """
+        if rsf_method not in self.RSF_METHODS:
+            raise ValueError(f"Unknown RSF method '{rsf_method}'; expected one of {', '.join(self.RSF_METHODS)}")
+        if rsf_k < 1:
+            raise ValueError("rsf_k must be at least 1")
+        self.rsf_method = rsf_method
+        self.rsf_k = rsf_k
+        self.rsf_threshold = rsf_threshold
+        self.rsf_top = rsf_top
+        self.benford_min_count = benford_min_count
+        self.benford_top = benford_top
+        self.robust_threshold = robust_threshold
+        self.robust_min_count = robust_min_count
+        self.robust_top = robust_top
+        self.sketch_accuracy = sketch_accuracy
+
     @property
     def name(self) -> str:
         return "The Mathematician"
@@ -13,74 +70,371 @@ class Mathematician(BaseDetector):
     def description(self) -> str:
         return "Statistical anomaly detection including Benford's Law, RSF, and Z-Score."
 
-    def run(self, df: pd.DataFrame, amount_col: str = 'amount', entity_col: str = 'vendor_id') -> Dict[str, Any]:
+    @property
+    def required_columns(self) -> List[str]:
+        return ['amount', 'vendor_id', 'transaction_id', 'date', '_year_month']
+
+    def run(self, df: pd.DataFrame, amount_col: str = 'amount', entity_col: str = 'vendor_id', id_col: str = 'transaction_id', date_col: str = 'date') -> Dict[str, Any]:
         """
         Runs multiple statistical tests on transaction data.
         """
-        results = {
+        return self.finalize(self.update_state(self.init_state(), df, amount_col, entity_col, id_col, date_col), amount_col)
+
+    def init_state(self) -> Dict[str, Any]:
+        return {
+            "digits": {test: np.zeros(100 if len(digits) > 10 else 10, dtype=np.int64) for test, (digits, _, _) in BENFORD_TESTS.items()},
+            "entity_digits": pd.DataFrame(columns=range(1, 10), dtype=np.int64),
+            "entities": pd.DataFrame({"max": [], "sum": [], "count": []}),
+            "amount_summary": self.amount_summary(np.empty(0, dtype=np.float64)),
+            "sketch": QuantileSketch(['entity', 'period'], self.sketch_accuracy),
+            "candidates": pd.DataFrame({"entity": [], "period": [], "amount": [], "id": []}),
+            "dropped": pd.DataFrame({"entity": [], "period": [], "amount": []})
+        }
+
+    def update_state(self, state: Dict[str, Any], df: pd.DataFrame, amount_col: str = 'amount', entity_col: str = 'vendor_id', id_col: str = 'transaction_id', date_col: str = 'date') -> Dict[str, Any]:
+        """
+        Benford digit counts (overall and per entity) and per-entity max/sum/count are exact summaries; the
+        Z-Score and IQR tests use a fixed-size amount summary (see amount_summary).
+        The robust baselines are mergeable sketches; the rows above their current
+        bound are kept with their transaction IDs (see prune_candidates).
+        """
+        rows = len(df)
+        with self.span("digit_counts", rows):
+            first_two = self.first_two_digits(df[amount_col])
+            digits = self.digit_counts(df[amount_col], first_two)
+            entity_digits = self.entity_digit_counts(self.plain(df[entity_col]), first_two)
+        with self.span("entity_summary", rows):
+            entities = self.entity_summary(df, amount_col, entity_col)
+        with self.span("amount_summary", rows):
+            amount_summary = self.amount_summary(df[amount_col].to_numpy(dtype=np.float64))
+        with self.span("robust_sketch", rows):
+            robust = self.robust_inputs(df, amount_col, entity_col, id_col, date_col)
+            sketch = QuantileSketch(['entity', 'period'], self.sketch_accuracy).update(robust, robust['amount'].to_numpy())
+            candidates = robust[robust['amount'].notna().to_numpy()]
+        chunk = {
+            "digits": digits,
+            "entity_digits": entity_digits,
+            "entities": entities,
+            "amount_summary": amount_summary,
+            "sketch": sketch,
+            "candidates": candidates,
+            "dropped": state["dropped"].iloc[:0]
+        }
+        with self.span("merge_states"):
+            return self.merge_states(state, chunk)
+
+    def merge_states(self, left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+        if not len(left["entities"]):
+            entities = right["entities"]
+        elif not len(right["entities"]):
+            entities = left["entities"]
+        else:
+            entities = self.merge_entity_summaries(left["entities"], right["entities"])
+        if not len(left["entity_digits"]):
+            entity_digits = right["entity_digits"]
+        elif not len(right["entity_digits"]):
+            entity_digits = left["entity_digits"]
+        else:
+            entity_digits = pd.concat([left["entity_digits"], right["entity_digits"]]).groupby(level=0).sum()
+        sketch = left["sketch"].merge(right["sketch"])
+        # Only the baselines of vendor-months that right has rows of can have changed.
+        touched = sketch.subset(right["sketch"].count().index) if len(left["sketch"].counts) else sketch
+        candidates, dropped = self.prune_candidates(touched, self._concat(left["candidates"], right["candidates"]),
+                                                    self._concat(left["dropped"], right["dropped"]))
+        return {
+            "digits": {test: left["digits"][test] + right["digits"][test] for test in BENFORD_TESTS},
+            "entity_digits": entity_digits,
+            "entities": entities,
+            "amount_summary": self.merge_amount_summaries(left["amount_summary"], right["amount_summary"]),
+            "sketch": sketch,
+            "candidates": candidates,
+            "dropped": dropped
+        }
+
+    def finalize(self, state: Dict[str, Any], amount_col: str = 'amount') -> Dict[str, Any]:
+        with self.span("benford_test", int(state["digits"]["first_digit"].sum())):
+            benford_test = self.benford_from_counts(state["digits"]["first_digit"])
+            benford_tests = {test: self.digit_test(test, state["digits"][test]) for test in BENFORD_TESTS if test != "first_digit"}
+        with self.span("vendor_benford", len(state["entity_digits"])):
+            vendor_benford = self.vendor_benford(state["entity_digits"])
+        with self.span("rsf_test", len(state["entities"])):
+            rsf_test = self.rsf_from_summary(state["entities"])
+        with self.span("statistical_outliers", len(state["amount_summary"]["sketch"].counts)):
+            statistical_outliers = self.outliers_from_summary(state["amount_summary"])
+        with self.span("robust_outliers", len(state["candidates"])):
+            robust_outliers = self.robust_outliers(state["sketch"], state["candidates"], state["dropped"])
+        return {
             "detector_name": self.name,
-            "benford_test": self.benford_law_test(df[amount_col]),
-            "rsf_test": self.relative_size_factor(df, amount_col, entity_col),
-            "statistical_outliers": self.detect_outliers(df, amount_col)
+            "benford_test": benford_test,
+            "benford_tests": benford_tests,
+            "vendor_benford": vendor_benford,
+            "rsf_test": rsf_test,
+            "statistical_outliers": statistical_outliers,
+            "robust_outliers": robust_outliers
         }
-        return results
+
+    @staticmethod
+    def first_two_digits(series: pd.Series) -> np.ndarray:
+        """
+        First two significant digits (10-99) of every amount, 0 where the amount is
+        not positive and finite. Pure arithmetic: the amount is scaled by a power of
+        ten from floor(log10), so scientific-notation values like 1e-05 work too.
+        """
+        amounts = np.asarray(series, dtype=np.float64)
+        valid = np.isfinite(amounts) & (amounts > 0)
+        safe = np.where(valid, amounts, 1.0)
+        exponent = np.floor(np.log10(safe)) - 1
+        # Dividing by 10**exponent for exponent < 0 would multiply by an inexact 0.1.
+        with np.errstate(over='ignore'):
+            scaled = np.where(exponent >= 0, safe / 10.0 ** np.maximum(exponent, 0), safe * 10.0 ** np.maximum(-exponent, 0))
+        # Tolerate representation error (0.29 is stored as 0.28999...) and log10 rounding.
+        digits = np.floor(scaled + 1e-9).astype(np.int64)
+        digits = np.where(digits >= 100, digits // 10, digits)
+        digits = np.where(digits < 10, np.floor(scaled * 10 + 1e-8).astype(np.int64), digits)
+        return np.where(valid, digits, 0)
+
+    @staticmethod
+    def digit_counts(series: pd.Series, first_two: np.ndarray = None) -> Dict[str, np.ndarray]:
+        """
+        Digit counts for every Benford test, from one digit extraction: first digit
+        and second digit (10 bins), first two digits and last two digits of the
+        integer part of amounts >= 10 (100 bins).
+        """
+        if first_two is None:
+            first_two = Mathematician.first_two_digits(series)
+        valid = first_two > 0
+        amounts = np.asarray(series, dtype=np.float64)
+        integral = amounts >= 10
+        last_two = np.floor(amounts[integral] + 1e-9) % 100
+        return {
+            "first_digit": np.bincount(first_two[valid] // 10, minlength=10),
+            "second_digit": np.bincount(first_two[valid] % 10, minlength=10),
+            "first_two_digits": np.bincount(first_two[valid], minlength=100),
+            "last_two_digits": np.bincount(last_two[np.isfinite(last_two)].astype(np.int64), minlength=100)
+        }
+
+    @staticmethod
+    def first_digit_counts(series: pd.Series) -> np.ndarray:
+        """
+        Counts of leading digits 0-9 of the positive amounts.
+        """
+        return Mathematician.digit_counts(series)["first_digit"]
+
+    @staticmethod
+    def entity_digit_counts(entities: pd.Series, first_two: np.ndarray) -> pd.DataFrame:
+        """
+        First-digit counts per entity (columns 1-9) from one bincount over entity x digit.
+        """
+        codes, labels = pd.factorize(entities)
+        keep = (codes >= 0) & (first_two > 0)
+        counts = np.bincount(codes[keep] * 10 + first_two[keep] // 10, minlength=len(labels) * 10)
+        table = pd.DataFrame(counts.reshape(len(labels), 10)[:, 1:], index=labels, columns=range(1, 10))
+        return table[table.sum(axis=1) > 0]
 
     def benford_law_test(self, series: pd.Series) -> Dict[str, Any]:
         """
         Applies Benford's Law on the first digit of transaction amounts.
         """
-        clean_series = series[series > 0]
-        first_digits = clean_series.astype(str).str.lstrip('0. ').str[0].astype(int)
-        
-        counts = first_digits.value_counts().reindex(range(1, 10), fill_value=0)
-        observed_freq = counts / len(first_digits)
-        
-        expected_freq = np.log10(1 + 1/np.arange(1, 10))
+        return self.benford_from_counts(self.first_digit_counts(series))
+
+    def benford_from_counts(self, digit_counts: np.ndarray) -> Dict[str, Any]:
+        result = self.digit_test("first_digit", digit_counts)
+        result["explanation"] = "Calculates the distribution of first digits. Significant deviation indicates potential data manipulation."
+        return result
+
+    @staticmethod
+    def digit_test(test: str, digit_counts: np.ndarray) -> Dict[str, Any]:
+        """
+        One Benford test on its digit counts: observed and expected frequencies,
+        MAD with Nigrini's conformity levels, chi-square with its p-value and the
+        Kolmogorov-Smirnov distance with its 5% critical value (1.36 / sqrt(N)).
+        """
+        digits, expected_freq, bounds = BENFORD_TESTS[test]
+        counts = digit_counts[digits]
+        total = counts.sum()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            observed_freq = counts / total
+            chi_square = float(total * np.sum((observed_freq - expected_freq) ** 2 / expected_freq))
         mad = np.mean(np.abs(observed_freq - expected_freq))
-        
+        ks = np.max(np.abs(np.cumsum(observed_freq) - np.cumsum(expected_freq)))
+
         conformity = "High"
-        if mad > 0.015: conformity = "Non-conformity"
-        elif mad > 0.012: conformity = "Marginal"
-        elif mad > 0.006: conformity = "Acceptable"
+        if bounds is None:
+            conformity = None
+        elif mad > bounds[2]: conformity = "Non-conformity"
+        elif mad > bounds[1]: conformity = "Marginal"
+        elif mad > bounds[0]: conformity = "Acceptable"
 
         return {
-            "observed": observed_freq.to_dict(),
-            "expected": dict(zip(range(1, 10), expected_freq)),
+            "observed": dict(zip(digits.tolist(), observed_freq.tolist())),
+            "expected": dict(zip(digits.tolist(), expected_freq.tolist())),
+            "sample_size": int(total),
             "mad": float(mad),
             "conformity_status": conformity,
-            "explanation": "Calculates the distribution of first digits. Significant deviation indicates potential data manipulation."
+            "chi_square": chi_square,
+            "p_value": float(special.chdtrc(len(digits) - 1, chi_square)),
+            "ks_statistic": float(ks),
+            "ks_critical_value": float(1.36 / np.sqrt(total)) if total else float('nan')
         }
 
+    def vendor_benford(self, entity_digits: pd.DataFrame) -> Dict[str, Any]:
+        """
+        First-digit test of every vendor at once on the (vendor x digit) count
+        matrix, ranking vendors with enough transactions by MAD.
+        """
+        counts = entity_digits[entity_digits.sum(axis=1) >= self.benford_min_count].sort_index()
+        matrix = np.ascontiguousarray(counts.to_numpy(dtype=np.float64))
+        totals = matrix.sum(axis=1)
+        expected = BENFORD_TESTS["first_digit"][1]
+        observed = matrix / totals[:, None] if len(matrix) else matrix
+        mad = np.abs(observed - expected).mean(axis=1)
+        chi_square = totals * ((observed - expected) ** 2 / expected).sum(axis=1)
+        p_value = special.chdtrc(8, chi_square)
+        bounds = BENFORD_TESTS["first_digit"][2]
+        conformity = np.select([mad > bounds[2], mad > bounds[1], mad > bounds[0]], ["Non-conformity", "Marginal", "Acceptable"], "High")
+
+        top = np.argsort(-mad, kind='stable')[:self.benford_top]
+        vendors = []
+        for i, entity in zip(top.tolist(), counts.index[top].tolist()):
+            vendors.append({
+                "entity": entity,
+                "transactions": int(totals[i]),
+                "mad": float(mad[i]),
+                "conformity_status": str(conformity[i]),
+                "chi_square": float(chi_square[i]),
+                "p_value": float(p_value[i])
+            })
+
+        return {
+            "vendors_tested": len(counts),
+            "non_conforming_count": int(np.count_nonzero(conformity == "Non-conformity")),
+            "top_vendors": vendors,
+            "explanation": "First-digit Benford test per vendor; vendors whose own amounts deviate most are ranked first."
+        }
+
+    @property
+    def _top_values(self) -> int:
+        # Largest values kept per entity beyond max/sum/count.
+        if self.rsf_method == 'second_largest':
+            return 2
+        return self.rsf_k if self.rsf_method == 'top_k' else 1
+
+    def entity_summary(self, df: pd.DataFrame, amount_col: str, entity_col: str) -> pd.DataFrame:
+        """
+        Per-entity max/sum/count of the amounts, indexed by entity, plus the
+        top_2..top_k largest amounts when the RSF method needs them.
+        """
+        entities = self.plain(df[entity_col])
+        summary = df[amount_col].groupby(entities).agg(['max', 'sum', 'count'])
+        if self._top_values > 1:
+            values = pd.Series(df[amount_col].to_numpy(dtype=np.float64), index=pd.Index(entities))
+            summary = summary.join(self.largest_values(values, self._top_values).drop(columns='max'))
+        return summary
+
+    @staticmethod
+    def largest_values(values: pd.Series, k: int) -> pd.DataFrame:
+        """
+        The k largest values per index label as columns max, top_2, ..., top_k
+        (NaN where a label has fewer values).
+        """
+        values = values.dropna()
+        codes, labels = pd.factorize(values.index)
+        table = Mathematician._largest_by_code(codes, len(labels), values.to_numpy(dtype=np.float64), k)
+        return pd.DataFrame(table, index=labels, columns=['max'] + [f'top_{r}' for r in range(2, k + 1)])
+
+    @staticmethod
+    def _largest_by_code(codes: np.ndarray, groups: int, amounts: np.ndarray, k: int) -> np.ndarray:
+        """
+        (groups x k) table of the k largest amounts per group code. Each rank takes
+        the grouped maximum (unbuffered ufunc.at, no sort) and removes its first
+        occurrence from the amounts left.
+        """
+        table = np.full((groups, k), np.nan)
+        for rank in range(k):
+            if not len(amounts):
+                break
+            largest = np.full(groups, -np.inf)
+            np.maximum.at(largest, codes, amounts)
+            candidates = np.flatnonzero(amounts == largest[codes])
+            first = np.full(groups, len(amounts))
+            np.minimum.at(first, codes[candidates], candidates)
+            found = first < len(amounts)
+            table[found, rank] = amounts[first[found]]
+            rest = np.ones(len(amounts), dtype=bool)
+            rest[first[found]] = False
+            amounts, codes = amounts[rest], codes[rest]
+        return table
+
+    def merge_entity_summaries(self, left: pd.DataFrame, right: pd.DataFrame) -> pd.DataFrame:
+        entities = pd.concat([left, right])
+        merged = entities.groupby(level=0).agg({"max": "max", "sum": "sum", "count": "sum"})
+        top_columns = [c for c in entities.columns if c.startswith('top_')]
+        if top_columns:
+            values = entities[['max'] + top_columns].stack()
+            values.index = values.index.droplevel(1)
+            merged = merged.join(self.largest_values(values, len(top_columns) + 1).drop(columns='max'))
+        return merged
+
     def relative_size_factor(self, df: pd.DataFrame, amount_col: str, entity_col: str) -> Dict[str, Any]:
         """
         RSF = (Largest Transaction) / (Average of Other Transactions)
         """
-        grouped = df.groupby(entity_col)[amount_col].apply(list).to_dict()
-        rsf_results = []
+        return self.rsf_from_summary(self.entity_summary(df, amount_col, entity_col))
+
+    def rsf_table(self, summary: pd.DataFrame) -> pd.DataFrame:
+        """
+        RSF of every entity that has a baseline, indexed by entity, with columns
+        count, largest_transaction, baseline and rsf_value (0 when the baseline is 0).
+        """
+        k = self.rsf_k if self.rsf_method == 'top_k' else 1
+        if self.rsf_method == 'second_largest':
+            summary = summary[summary['count'] >= 2]
+            largest = summary['max']
+            baseline = summary['top_2']
+        else:
+            # The average of the other transactions is (sum - top) / (count - k).
+            summary = summary[summary['count'] > k]
+            top = summary[['max'] + [f'top_{r}' for r in range(2, k + 1)]]
+            largest = top.mean(axis=1)
+            baseline = (summary['sum'] - top.sum(axis=1)) / (summary['count'] - k)
+        rsf = (largest / baseline).where(baseline != 0, 0)
+        return pd.DataFrame({
+            "count": summary['count'],
+            "largest_transaction": largest,
+            "baseline": baseline,
+            "rsf_value": rsf
+        }).sort_index()
+
+    def rsf_column(self, df: pd.DataFrame, amount_col: str = 'amount', entity_col: str = 'vendor_id') -> pd.Series:
+        """
+        The RSF of each transaction's entity, aligned with df (NaN for entities without one).
+        """
+        table = self.rsf_table(self.entity_summary(df, amount_col, entity_col))
+        return self.plain(df[entity_col]).map(table['rsf_value']).rename('rsf_value')
 
-        for entity, amounts in grouped.items():
-            if len(amounts) < 2:
-                continue
-            
-            amounts = sorted(amounts)
-            largest = amounts[-1]
-            avg_others = np.mean(amounts[:-1])
-            
-            if avg_others == 0:
-                rsf = 0
-            else:
-                rsf = largest / avg_others
-            
-            if rsf > 10:
-                rsf_results.append({
-                    "entity": entity,
-                    "rsf_value": float(rsf),
-                    "largest_transaction": float(largest),
-                    "average_others": float(avg_others)
-                })
+    def rsf_from_summary(self, summary: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Flags entities above the threshold; the table is scored in one vectorized
+        pass and only the top entries are turned into records.
+        """
+        table = self.rsf_table(summary)
+        flagged = table[table['rsf_value'] > self.rsf_threshold]
+        top = flagged.sort_values('rsf_value', ascending=False, kind='stable').head(self.rsf_top)
+
+        rsf_results = []
+        for entity, value, largest, baseline in zip(top.index.tolist(), top['rsf_value'].tolist(), top['largest_transaction'].tolist(), top['baseline'].tolist()):
+            rsf_results.append({
+                "entity": entity,
+                "rsf_value": float(value),
+                "largest_transaction": float(largest),
+                "average_others": float(baseline)
+            })
 
         return {
-            "high_risk_entities": sorted(rsf_results, key=lambda x: x['rsf_value'], reverse=True)[:10],
+            "method": self.rsf_method,
+            "entities_scored": len(table),
+            "flagged_count": len(flagged),
+            "high_risk_entities": rsf_results,
             "explanation": "RSF identifies entities whose largest transaction is significantly higher than their average."
         }
 
@@ -88,18 +442,221 @@ class Mathematician(BaseDetector):
         """
         Outlier detection using standard Z-Score and IQR.
         """
-        data = df[amount_col]
-        z_scores = np.abs(stats.zscore(data))
-        z_outliers = df[z_scores > 3]
-        
-        Q1 = data.quantile(0.25)
-        Q3 = data.quantile(0.75)
+        return self.outliers_from_summary(self.amount_summary(df[amount_col].to_numpy(dtype=np.float64)))
+
+    def amount_summary(self, amounts: np.ndarray) -> Dict[str, Any]:
+        """
+        Fixed-size, mergeable summary of amounts for the Z-Score and IQR tests: count,
+        mean and sum of squared deviations (M2) of the finite amounts, the number of
+        missing ones, a quantile sketch of the amounts (grouped by sign, as the sketch
+        buckets magnitudes; with two groups it affords a tenth of sketch_accuracy) and
+        the OUTLIER_TOP largest amounts.
+        """
+        finite = amounts[np.isfinite(amounts)]
+        mean = finite.mean() if len(finite) else 0.0
+        if len(finite) > OUTLIER_TOP:
+            largest = np.sort(finite[np.argpartition(finite, -OUTLIER_TOP)[-OUTLIER_TOP:]])
+        else:
+            largest = np.sort(finite)
+        return {
+            "count": len(finite),
+            "mean": float(mean),
+            "m2": float(np.sum((finite - mean) ** 2)),
+            "missing": len(amounts) - len(finite),
+            "sketch": QuantileSketch(['sign'], self.sketch_accuracy / 10).update(pd.DataFrame({"sign": np.sign(amounts)}), np.abs(amounts)),
+            "largest": largest
+        }
+
+    @staticmethod
+    def merge_amount_summaries(left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+        # Chan et al.'s pairwise update of the mean and M2.
+        count = left["count"] + right["count"]
+        delta = right["mean"] - left["mean"]
+        mean = left["mean"] + delta * right["count"] / count if count else 0.0
+        m2 = left["m2"] + right["m2"] + (delta ** 2 * left["count"] * right["count"] / count if count else 0.0)
+        return {
+            "count": count,
+            "mean": mean,
+            "m2": m2,
+            "missing": left["missing"] + right["missing"],
+            "sketch": left["sketch"].merge(right["sketch"]),
+            "largest": np.sort(np.concatenate([left["largest"], right["largest"]]))[-OUTLIER_TOP:]
+        }
+
+    def outliers_from_summary(self, summary: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Z-Score and IQR outliers from an amount summary. The mean and standard deviation
+        are exact; the quartiles and the counts beyond each bound come from the sketch,
+        so amounts within sketch_accuracy / 10 of a bound may be counted on the wrong side.
+        Like scipy's zscore, any missing amount leaves no Z-Score outliers. top_outliers
+        lists the largest amounts that are Z-Score outliers.
+        """
+        values, weights = self._signed_values(summary["sketch"])
+        count = summary["count"]
+        std = np.sqrt(summary["m2"] / count) if count else np.nan
+        z_count, top = 0, []
+        if count and not summary["missing"] and std > 0:
+            far = np.abs(values - summary["mean"]) > 3 * std
+            z_count = int(weights[far].sum())
+            largest = summary["largest"][::-1]
+            top = largest[np.abs(largest - summary["mean"]) > 3 * std].tolist()
+
+        Q1 = self._weighted_quantile(values, weights, 0.25)
+        Q3 = self._weighted_quantile(values, weights, 0.75)
         IQR = Q3 - Q1
-        iqr_outliers = df[(data < (Q1 - 1.5 * IQR)) | (data > (Q3 + 1.5 * IQR))]
+        iqr_count = weights[(values < Q1 - 1.5 * IQR) | (values > Q3 + 1.5 * IQR)].sum()
 
         return {
-            "z_score_outliers_count": len(z_outliers),
-            "iqr_outliers_count": len(iqr_outliers),
-            "top_outliers": z_outliers.nlargest(5, amount_col)[amount_col].to_list(),
+            "z_score_outliers_count": z_count,
+            "iqr_outliers_count": int(iqr_count) if len(values) else 0,
+            "top_outliers": top,
             "explanation": "Z-Score (>3) and IQR identify statistical extremes in transaction values."
         }
+
+    @staticmethod
+    def _signed_values(sketch: QuantileSketch) -> Tuple[np.ndarray, np.ndarray]:
+        """Ascending bucket values of a sketch grouped by sign, with their counts."""
+        signs = sketch.counts.index.get_level_values('sign').to_numpy(dtype=np.float64)
+        values = signs * sketch.bucket_values()
+        order = np.argsort(values, kind='stable')
+        return values[order], sketch.counts.to_numpy()[order]
+
+    @staticmethod
+    def _weighted_quantile(values: np.ndarray, weights: np.ndarray, q: float) -> float:
+        # Linear interpolation between the order statistics, as Series.quantile.
+        if not len(values):
+            return np.nan
+        cumulative = np.cumsum(weights)
+        position = (cumulative[-1] - 1) * q
+        below, above = np.searchsorted(cumulative, [np.floor(position), np.ceil(position)], side='right')
+        return values[below] + (values[above] - values[below]) * (position - np.floor(position))
+
+    def robust_inputs(self, df: pd.DataFrame, amount_col: str, entity_col: str, id_col: str, date_col: str) -> pd.DataFrame:
+        """
+        Entity, calendar month (as a monthly period ordinal, NO_PERIOD when the
+        date is missing), amount and transaction ID of every row with an entity.
+        The row index stands in for missing IDs.
+        """
+        if date_col in df.columns:
+            period = self._derived(df, date_col, '_year_month').array.asi8
+        else:
+            period = np.full(len(df), NO_PERIOD)
+        frame = pd.DataFrame({
+            "entity": self.plain(df[entity_col]).to_numpy(),
+            "period": period,
+            "amount": df[amount_col].to_numpy(dtype=np.float64),
+            "id": self.plain(df[id_col]).to_numpy() if id_col in df.columns else df.index.to_numpy()
+        })
+        return frame[frame['entity'].notna().to_numpy()]
+
+    @staticmethod
+    def group_keys(entities: np.ndarray, periods: np.ndarray) -> np.ndarray:
+        """
+        One int64 key per (entity, period), equal for equal pairs within a call.
+        """
+        codes, _ = pd.factorize(entities, use_na_sentinel=False)
+        missing = periods == NO_PERIOD
+        first = periods[~missing].min(initial=0)
+        offsets = np.where(missing, 0, periods - first + 1)
+        return codes.astype(np.int64) * (offsets.max(initial=0) + 1) + offsets
+
+    @staticmethod
+    def _concat(left: pd.DataFrame, right: pd.DataFrame) -> pd.DataFrame:
+        if not len(left):
+            return right
+        return pd.concat([left, right], ignore_index=True) if len(right) else left
+
+    def robust_baselines(self, sketch: QuantileSketch) -> pd.DataFrame:
+        """
+        Median, MAD and count per (entity, period), falling back to the entity's
+        overall figures for periods with fewer than robust_min_count amounts.
+        The MAD is floored at the sketch resolution (sketch_accuracy x median).
+        """
+        monthly = sketch.median_mad(self.robust_min_count).reset_index()
+        overall = sketch.rollup(['entity']).median_mad(self.robust_min_count)
+        fallback = overall.reindex(monthly['entity'].to_numpy())
+        sparse_month = (monthly['count'] < self.robust_min_count).to_numpy()
+        for column in ("median", "mad", "count"):
+            monthly[column] = np.where(sparse_month, fallback[column].to_numpy(), monthly[column].to_numpy())
+        monthly['baseline'] = np.where(sparse_month, "entity", "entity_month")
+        monthly['mad'] = np.maximum(monthly['mad'], self.sketch_accuracy * np.abs(monthly['median']))
+        return monthly[(monthly['count'] >= self.robust_min_count).to_numpy()]
+
+    def robust_scores(self, baselines: pd.DataFrame, frame: pd.DataFrame) -> pd.DataFrame:
+        """
+        The rows of frame whose (entity, period) has a baseline, with its median,
+        MAD, count and kind and their Robust Z = 0.6745 (amount - median) / MAD.
+        """
+        keys = self.group_keys(np.concatenate([baselines['entity'].to_numpy(), frame['entity'].to_numpy()]),
+                               np.concatenate([baselines['period'].to_numpy(), frame['period'].to_numpy()]))
+        position = pd.Index(keys[:len(baselines)]).get_indexer(keys[len(baselines):])
+        matched = position >= 0
+        baseline = baselines.iloc[position[matched]]
+        scored = frame[matched].assign(**{c: baseline[c].to_numpy() for c in ("median", "mad", "count", "baseline")})
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scored['robust_z'] = 0.6745 * (scored['amount'] - scored['median']) / scored['mad']
+        return scored
+
+    def prune_candidates(self, sketch: QuantileSketch, candidates: pd.DataFrame, dropped: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Drops the candidates that later rows are unlikely to flag: rows of vendor-months
+        with robust_min_count amounts or more that are not flagged even against a
+        conservative baseline, the median lowered and the MAD narrowed by
+        ROBUST_PRUNE_MARGIN standard errors (1.85 and 1.17 MAD / sqrt(n)). Months with
+        fewer amounts keep all rows, as their baseline changes once they fill up, and
+        so do months missing from sketch. The
+        largest dropped amount of every vendor-month is kept for robust_outliers.
+        """
+        if not len(candidates):
+            return candidates, dropped
+        baselines = self.robust_baselines(sketch)
+        baselines = baselines[(baselines['baseline'] == "entity_month").to_numpy()]
+        error = ROBUST_PRUNE_MARGIN / np.sqrt(baselines['count'].to_numpy())
+        baselines = baselines.assign(median=baselines['median'] - 1.85 * error * baselines['mad'],
+                                     mad=baselines['mad'] * np.maximum(1 - 1.17 * error, 0))
+        scored = self.robust_scores(baselines, candidates)
+        below = scored[~(scored['robust_z'] > self.robust_threshold).to_numpy()]
+        if len(below):
+            dropped = self._concat(dropped, below[['entity', 'period', 'amount']])
+            dropped = dropped.groupby(['entity', 'period'], sort=False, dropna=False)['amount'].max().reset_index()
+        return candidates[~candidates.index.isin(below.index)].reset_index(drop=True), dropped
+
+    def robust_outliers(self, sketch: QuantileSketch, candidates: pd.DataFrame, dropped: pd.DataFrame = None) -> Dict[str, Any]:
+        """
+        Robust Z of the candidates against their vendor-month baseline; every
+        candidate above the threshold is returned. Candidates are pruned against
+        the baselines of the moment, so if later rows lowered a baseline below
+        the largest dropped amount of its vendor-month, that month may miss IDs
+        and is counted in incomplete_groups.
+        """
+        baselines = self.robust_baselines(sketch)
+        scored = self.robust_scores(baselines, candidates)
+        flagged = scored[(scored['robust_z'] > self.robust_threshold).to_numpy()]
+        flagged = flagged.sort_values(['robust_z', 'id'], ascending=[False, True], kind='stable')
+        incomplete = 0
+        if dropped is not None and len(dropped):
+            incomplete = int(np.count_nonzero(self.robust_scores(baselines, dropped)['robust_z'] > self.robust_threshold))
+
+        top_flagged = []
+        top = flagged.head(self.robust_top)
+        for row in top.itertuples(index=False):
+            top_flagged.append({
+                "transaction_id": row.id.item() if hasattr(row.id, 'item') else row.id,
+                "entity": row.entity.item() if hasattr(row.entity, 'item') else row.entity,
+                "period": None if row.period == NO_PERIOD else str(pd.Period(ordinal=row.period, freq='M')),
+                "amount": float(row.amount),
+                "baseline": row.baseline,
+                "baseline_median": float(row.median),
+                "baseline_mad": float(row.mad),
+                "robust_z": float(row.robust_z)
+            })
+
+        return {
+            "threshold": self.robust_threshold,
+            "groups_scored": len(baselines),
+            "flagged_count": len(flagged),
+            "flagged_transaction_ids": flagged['id'].tolist(),
+            "incomplete_groups": incomplete,
+            "top_flagged": top_flagged,
+            "explanation": "Robust Z-Score against each vendor's own monthly median and MAD; scale-free across vendors of different sizes."
+        }
@@ -1,8 +1,20 @@
+import bisect
+import math
+import re
+import zlib
+import numpy as np
 import pandas as pd
-from typing import Dict, Any, List, Tuple
+from collections import defaultdict
+from typing import Dict, Any, List, Tuple, Iterator, Set, Sequence
 from ..core.base import BaseDetector
+from ..utils.sql_source import SQLSource
+
+# Indonesian legal-entity forms, ignored when blocking names.
+LEGAL_FORMS = {'pt', 'cv', 'ud', 'pd', 'fa', 'tbk', 'persero'}
 
 class StringDetective(BaseDetector):
+    state_options = ()
+
     @property
     def name(self) -> str:
         return "String Detective"
@@ -11,32 +23,440 @@ class StringDetective(BaseDetector):
     def description(self) -> str:
         return "Detects near-duplicate entity names (Ghost Vendors) using Levenshtein distance."
 
-    def run(self, df: pd.DataFrame, name_col: str = 'vendor_name') -> Dict[str, Any]:
+    @property
+    def required_columns(self) -> List[str]:
+        return ['vendor_name']
+
+    def run(self, df: pd.DataFrame, name_col: str = 'vendor_name', threshold: float = 0.85, blocking: str = 'lsh') -> Dict[str, Any]:
         """
         Identifies similar names.
+        Only pairs produced by the blocking stage ('lsh', or the lossless but slower
+        'exact' q-gram filter) are scored, and only within the distance budget.
+        """
+        return self.finalize(self.update_state(self.init_state(), df, name_col), threshold, blocking)
+
+    def init_state(self) -> Dict[str, Any]:
+        """
+        Besides the distinct names, the state caches the matching work done by
+        finalize(): the number of keys already compared with each other, their LSH
+        buckets and the similar pairs found. A later finalize() only compares the
+        keys added since, which keeps incremental runs proportional to the new names.
+        """
+        return {
+            "names": {},
+            "key_groups": {},
+            "compared": 0,
+            "matched_with": None,
+            "buckets": None,
+            "matches": []
+        }
+
+    def update_state(self, state: Dict[str, Any], df: pd.DataFrame, name_col: str = 'vendor_name') -> Dict[str, Any]:
+        """
+        Keeps the distinct names in order of first appearance, grouped by lower-cased key.
         """
-        unique_names = df[name_col].unique().tolist()
-        potential_duplicates = []
-        
-        for i in range(len(unique_names)):
-            for j in range(i + 1, len(unique_names)):
-                name1 = str(unique_names[i])
-                name2 = str(unique_names[j])
-                score = self.levenshtein_ratio(name1.lower(), name2.lower())
-                
-                if 0.85 <= score < 1.0:
-                    potential_duplicates.append({
-                        "name_1": name1,
-                        "name_2": name2,
-                        "similarity_score": float(score)
-                    })
+        with self.span("collect_names", len(df)):
+            self._add_names(state, df[name_col].unique().tolist())
+        return state
+
+    def state_from_sql(self, source: SQLSource) -> Dict[str, Any]:
+        """Only the distinct names are read from the database."""
+        return self.update_state(self.init_state(), source.distinct_names())
+
+    def merge_states(self, left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+        # Cached matches refer to key positions, which only stay valid for the left state.
+        merged = dict(left)
+        merged["names"] = dict(left["names"])
+        merged["key_groups"] = {key: list(group) for key, group in left["key_groups"].items()}
+        merged["matches"] = list(left["matches"])
+        self._add_names(merged, right["names"])
+        return merged
+
+    @staticmethod
+    def _add_names(state: Dict[str, Any], names) -> None:
+        for name in names:
+            # Every missing value is one name, as in Series.unique().
+            if pd.isna(name):
+                name = math.nan
+            if name not in state["names"]:
+                state["names"][name] = len(state["names"])
+                state["key_groups"].setdefault(str(name).lower(), []).append(state["names"][name])
+
+    def finalize(self, state: Dict[str, Any], threshold: float = 0.85, blocking: str = 'lsh') -> Dict[str, Any]:
+        unique_names = list(state["names"])
+
+        # Names that only differ by case score 1.0 and are never reported,
+        # so each lower-cased key is matched once and expanded afterwards.
+        key_groups: Dict[str, List[int]] = state["key_groups"]
+        keys = list(key_groups.keys())
+        with self.span("match_names", len(keys), new=len(keys) - state["compared"]):
+            self._match_new_keys(state, keys, threshold, blocking)
+
+        scored: List[Tuple[float, int, int]] = []
+        for score, a, b in state["matches"]:
+            for i in key_groups[keys[a]]:
+                for j in key_groups[keys[b]]:
+                    scored.append((score, min(i, j), max(i, j)))
+
+        # Same ordering as the exhaustive scan: score desc, then enumeration order.
+        scored.sort(key=lambda x: (-x[0], x[1], x[2]))
+        potential_duplicates = [{
+            "name_1": str(unique_names[i]),
+            "name_2": str(unique_names[j]),
+            "similarity_score": float(score)
+        } for score, i, j in scored[:20]]
 
         return {
             "detector_name": self.name,
-            "potential_ghost_vendors": sorted(potential_duplicates, key=lambda x: x['similarity_score'], reverse=True)[:20],
+            "potential_ghost_vendors": potential_duplicates,
             "explanation": "Finds names with high similarity. This often reveals 'Ghost Vendors' or split identities."
         }
 
+    def _match_new_keys(self, state: Dict[str, Any], keys: List[str], threshold: float, blocking: str) -> None:
+        """
+        Scores every candidate pair that involves a key added since the last call
+        and records the similar ones in the state.
+        """
+        if state["matched_with"] != (threshold, blocking):
+            state.update(compared=0, buckets=None, matches=[])
+        new_from = state["compared"]
+        if new_from == len(keys):
+            return
+
+        if blocking == 'lsh':
+            buckets = self.lsh_buckets(keys[new_from:])
+            if state["buckets"] is not None:
+                buckets = np.concatenate([state["buckets"], buckets])
+            pairs = self.bucket_pairs(buckets, new_from)
+            state["buckets"] = buckets
+        elif blocking == 'exact':
+            pairs = self.candidate_pairs(keys, threshold)
+            pairs = pairs[pairs[:, 1] >= new_from]
+        else:
+            raise ValueError(f"Unsupported blocking: {blocking}")
+
+        state["matches"].extend((score, a, b) for a, b, score in self.score_pairs(keys, pairs, threshold) if score < 1.0)
+        state["compared"] = len(keys)
+        state["matched_with"] = (threshold, blocking)
+
+    def find_similar_pairs(self, keys: List[str], threshold: float = 0.85, blocking: str = 'lsh', batch_size: int = 65536) -> Iterator[Tuple[int, int, float]]:
+        """
+        Yields (i, j, ratio) for candidate pairs of keys whose Levenshtein ratio is >= threshold.
+        """
+        if blocking == 'lsh':
+            pairs = self.lsh_candidate_pairs(keys)
+        elif blocking == 'exact':
+            pairs = self.candidate_pairs(keys, threshold)
+        else:
+            raise ValueError(f"Unsupported blocking: {blocking}")
+        return self.score_pairs(keys, pairs, threshold, batch_size)
+
+    def score_pairs(self, keys: List[str], pairs: np.ndarray, threshold: float = 0.85, batch_size: int = 65536) -> Iterator[Tuple[int, int, float]]:
+        """
+        Yields (i, j, ratio) for the candidate pairs whose Levenshtein ratio is >= threshold.
+
+        A ratio >= threshold bounds the edit distance by d = (1 - threshold) * (len1 + len2),
+        so candidates whose lengths differ by more than d are dropped before scoring.
+        Survivors are scored in batches by the bit-parallel kernel.
+        """
+        lengths = np.fromiter(map(len, keys), dtype=np.int64, count=len(keys))
+        len_i, len_j = lengths[pairs[:, 0]], lengths[pairs[:, 1]]
+        max_dist = np.floor((1.0 - threshold) * (len_i + len_j) + 1e-9)
+        pairs = pairs[np.abs(len_i - len_j) <= max_dist]
+
+        for start in range(0, len(pairs), batch_size):
+            batch = pairs[start:start + batch_size]
+            left = [keys[i] for i in batch[:, 0].tolist()]
+            right = [keys[j] for j in batch[:, 1].tolist()]
+            ratios = self._ratios(self.batch_distance(left, right), lengths[batch[:, 0]] + lengths[batch[:, 1]])
+            hits = ratios >= threshold
+            yield from zip(batch[hits, 0].tolist(), batch[hits, 1].tolist(), ratios[hits].tolist())
+
+    def lsh_candidate_pairs(self, keys: List[str], bands: int = 32, rows: int = 4, q: int = 2, seed: int = 42) -> np.ndarray:
+        """
+        Candidate generation by MinHash-LSH over q-gram shingles of normalized names.
+
+        Names are normalized (punctuation, spacing and legal forms such as 'PT.' or 'CV.'
+        removed), so formatting variants always share a bucket. Other pairs collide with
+        probability 1 - (1 - J^rows)^bands for q-gram Jaccard similarity J.
+        Returns an (n, 2) array of distinct candidates (i, j) with i < j.
+        """
+        return self.bucket_pairs(self.lsh_buckets(keys, bands, rows, q, seed))
+
+    def lsh_buckets(self, keys: List[str], bands: int = 32, rows: int = 4, q: int = 2, seed: int = 42) -> np.ndarray:
+        """
+        Returns the (n, bands) bucket ids of the keys; keys sharing a bucket in any band are candidates.
+        """
+        if not keys:
+            return np.empty((0, bands), dtype=np.uint64)
+
+        owners: List[int] = []
+        hashes: List[int] = []
+        for idx, key in enumerate(keys):
+            shingles = self._qgrams(self.normalize(key), q)
+            owners.extend([idx] * len(shingles))
+            hashes.extend(zlib.crc32(s.encode('utf-8')) for s in shingles)
+        owners_arr = np.asarray(owners, dtype=np.int64)
+        hashes_arr = np.asarray(hashes, dtype=np.uint64)
+        starts = np.flatnonzero(np.r_[True, owners_arr[1:] != owners_arr[:-1]])
+
+        # Multiply-shift hashing stands in for random permutations of the shingle space.
+        rng = np.random.default_rng(seed)
+        a = rng.integers(1, 2**63, size=bands * rows, dtype=np.uint64) | np.uint64(1)
+        b = rng.integers(0, 2**63, size=bands * rows, dtype=np.uint64)
+        signature = np.empty((len(keys), bands * rows), dtype=np.uint64)
+        for k in range(bands * rows):
+            values = (hashes_arr * a[k] + b[k]) >> np.uint64(32)
+            signature[:, k] = np.minimum.reduceat(values, starts)
+
+        buckets = np.zeros((len(keys), bands), dtype=np.uint64)
+        for band in range(bands):
+            for column in signature[:, band * rows:(band + 1) * rows].T:
+                buckets[:, band] = (buckets[:, band] * np.uint64(0x100000001B3)) ^ column
+        return buckets
+
+    @staticmethod
+    def bucket_pairs(buckets: np.ndarray, new_from: int = 0) -> np.ndarray:
+        """
+        Distinct pairs (i, j), i < j, sharing a bucket in some band, restricted to
+        pairs with j >= new_from (pairs among earlier keys were already compared).
+        """
+        n = len(buckets)
+        found: List[np.ndarray] = [np.empty(0, dtype=np.int64)]
+        triangles: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        for bucket in buckets.T:
+            order = np.argsort(bucket, kind='stable')
+            sorted_bucket = bucket[order]
+            bounds = np.flatnonzero(np.r_[True, sorted_bucket[1:] != sorted_bucket[:-1], True])
+            sizes = np.diff(bounds)
+            # Buckets of two are by far the most common and are paired in one shot.
+            lo = bounds[:-1][sizes == 2]
+            first, second = np.minimum(order[lo], order[lo + 1]), np.maximum(order[lo], order[lo + 1])
+            keep = second >= new_from
+            found.append(first[keep] * n + second[keep])
+            for lo, size in zip(bounds[:-1][sizes > 2].tolist(), sizes[sizes > 2].tolist()):
+                members = np.sort(order[lo:lo + size])
+                if members[-1] < new_from:
+                    continue
+                if size not in triangles:
+                    triangles[size] = np.triu_indices(size, k=1)
+                left, right = triangles[size]
+                keep = members[right] >= new_from
+                found.append(members[left[keep]] * n + members[right[keep]])
+
+        codes = np.unique(np.concatenate(found))
+        return np.stack([codes // n, codes % n], axis=1) if n else np.empty((0, 2), dtype=np.int64)
+
+    def candidate_pairs(self, keys: List[str], threshold: float = 0.85, q: int = 2) -> np.ndarray:
+        """
+        Lossless candidate generation by q-gram prefix filtering.
+
+        Two keys within distance d share at least |G| - q*d distinct padded q-grams. With
+        q-grams ordered rarest-first, such keys must share a gram within the first q*d + 1
+        grams of each, so only those prefixes are indexed. Exact, but on natural-language
+        names the surviving fraction of pairs stays large; prefer 'lsh' for big registries.
+        Returns an (n, 2) array of distinct candidates (i, j) with i < j.
+        """
+        slack = 1.0 - threshold
+        grams = [self._qgrams(k, q) for k in keys]
+        lengths = [len(k) for k in keys]
+
+        frequency: Dict[str, int] = defaultdict(int)
+        for g in grams:
+            for gram in g:
+                frequency[gram] += 1
+
+        # Probing in length order lets every posting list be cut to the
+        # admissible length window with two bisections.
+        order = sorted(range(len(keys)), key=lambda k: (lengths[k], k))
+        sorted_lengths = [lengths[k] for k in order]
+        postings: Dict[str, List[int]] = defaultdict(list)
+        prefixes: List[List[str]] = [[] for _ in keys]
+        short: List[int] = []
+        for rank, idx in enumerate(order):
+            ordered = sorted(grams[idx], key=lambda x: (frequency[x], x))
+            # As a probe a name only meets longer partners (up to L * (1 + s) / t);
+            # as a posting it is only met by shorter ones, which allow less slack.
+            probe_dist = self._max_distance(lengths[idx] * (1.0 + (1.0 + slack) / threshold), slack) if threshold > 0 else lengths[idx]
+            index_dist = self._max_distance(2.0 * lengths[idx], slack)
+            if q * probe_dist + 1 <= len(ordered):
+                prefixes[idx] = ordered[:q * probe_dist + 1]
+            if q * index_dist + 1 > len(ordered):
+                # Too short to guarantee a shared q-gram; compared by length window only.
+                short.append(rank)
+                continue
+            for gram in ordered[:q * index_dist + 1]:
+                postings[gram].append(rank)
+        index = {gram: np.asarray(ranks, dtype=np.int64) for gram, ranks in postings.items()}
+        short_ranks = np.asarray(short, dtype=np.int64)
+        empty = np.empty(0, dtype=np.int64)
+        order_arr = np.asarray(order, dtype=np.int64)
+
+        found: List[np.ndarray] = [np.empty((0, 2), dtype=np.int64)]
+        for rank, i in enumerate(order):
+            # Longest partner length still within the distance budget.
+            longest = int(math.floor(lengths[i] * (1.0 + slack) / threshold + 1e-9)) if threshold > 0 else sorted_lengths[-1]
+            stop = bisect.bisect_right(sorted_lengths, longest)
+            if not prefixes[i]:
+                candidates = np.arange(rank + 1, stop)
+            else:
+                hits = [short_ranks]
+                for gram in prefixes[i]:
+                    ranks = index.get(gram, empty)
+                    hits.append(ranks[np.searchsorted(ranks, rank, side='right'):np.searchsorted(ranks, stop)])
+                candidates = np.unique(np.concatenate(hits))
+                candidates = candidates[(candidates > rank) & (candidates < stop)]
+
+            others = order_arr[candidates]
+            found.append(np.stack([np.minimum(others, i), np.maximum(others, i)], axis=1))
+        return np.concatenate(found)
+
+    @staticmethod
+    def normalize(name: str) -> str:
+        """
+        Blocking key: lower-case alphanumeric tokens without legal-form tokens.
+        """
+        tokens = re.sub(r'[^0-9a-z]+', ' ', str(name).lower()).split()
+        return ' '.join(t for t in tokens if t not in LEGAL_FORMS)
+
+    @staticmethod
+    def _qgrams(s: str, q: int) -> Set[str]:
+        padded = '\x02' * (q - 1) + s + '\x03' * (q - 1)
+        return {padded[k:k + q] for k in range(len(padded) - q + 1)}
+
+    @staticmethod
+    def _max_distance(total_length: float, slack: float) -> int:
+        # Small epsilon keeps the bound conservative against float rounding.
+        return int(math.floor(slack * total_length + 1e-9))
+
+    def batch_ratio(self, name: str, candidates: Sequence[str]) -> np.ndarray:
+        """
+        Levenshtein ratios of one name against many candidates in a single call.
+        Matches levenshtein_ratio for every candidate.
+        """
+        name = str(name)
+        candidates = [str(c) for c in candidates]
+        total = len(name) + np.fromiter(map(len, candidates), dtype=np.int64, count=len(candidates))
+        return self._ratios(self.batch_distance([name] * len(candidates), candidates), total)
+
+    @staticmethod
+    def _ratios(distances: np.ndarray, total: np.ndarray) -> np.ndarray:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = (total - distances) / total
+        # Two empty strings are identical.
+        return np.where(total > 0, ratios, 1.0)
+
+    @classmethod
+    def batch_distance(cls, left: Sequence[str], right: Sequence[str]) -> np.ndarray:
+        """
+        Edit distances for aligned pairs (left[k], right[k]).
+
+        Uses the bit-parallel algorithm of Myers (1999) in Hyyroe's formulation: one
+        column of the DP matrix is held as bit-vectors, so a pair costs O(len) word
+        operations and O(len) memory. Pairs whose shorter string fits in 64 bits are
+        vectorized across the batch with NumPy; longer ones use Python integers.
+        """
+        left_len = np.fromiter(map(len, left), dtype=np.int64, count=len(left))
+        right_len = np.fromiter(map(len, right), dtype=np.int64, count=len(right))
+        swap = (left_len > right_len).tolist()
+        patterns = [b if sw else a for a, b, sw in zip(left, right, swap)]
+        texts = [a if sw else b for a, b, sw in zip(left, right, swap)]
+
+        distances = np.zeros(len(left), dtype=np.int64)
+        fits = np.minimum(left_len, right_len) <= 64
+        slots = np.flatnonzero(fits).tolist()
+        if slots:
+            distances[fits] = cls._myers_distances([patterns[k] for k in slots], [texts[k] for k in slots])
+        for k in np.flatnonzero(~fits).tolist():
+            distances[k] = cls._myers_distance(patterns[k], texts[k])
+        return distances
+
+    @staticmethod
+    def _encode(strings: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Flattens strings into (code points, owner row, position) arrays.
+        """
+        lengths = np.fromiter(map(len, strings), dtype=np.int64, count=len(strings))
+        codes = np.frombuffer(''.join(strings).encode('utf-32-le'), dtype=np.uint32)
+        owners = np.repeat(np.arange(len(strings)), lengths)
+        positions = np.arange(len(codes)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return codes, owners, positions
+
+    @classmethod
+    def _myers_distances(cls, patterns: List[str], texts: List[str]) -> np.ndarray:
+        n = len(patterns)
+        m = np.fromiter(map(len, patterns), dtype=np.int64, count=n)
+        text_len = np.fromiter(map(len, texts), dtype=np.int64, count=n)
+        p_codes, p_owner, p_pos = cls._encode(patterns)
+        t_codes, t_owner, t_pos = cls._encode(texts)
+
+        # Dense ids for the batch alphabet; id 0 pads texts and never matches.
+        lookup = np.zeros(int(max(p_codes.max(initial=0), t_codes.max(initial=0))) + 1, dtype=np.int64)
+        lookup[p_codes] = 1
+        lookup[t_codes] = 1
+        width = int(lookup.sum()) + 1
+        lookup = np.cumsum(lookup) * lookup
+
+        # Per-pair match masks (Peq), flattened so each column is a single gather.
+        peq = np.zeros(n * width, dtype=np.uint64)
+        np.bitwise_or.at(peq, p_owner * width + lookup[p_codes], np.left_shift(np.uint64(1), p_pos.astype(np.uint64)))
+        text_ids = np.zeros((int(text_len.max(initial=0)), n), dtype=np.int64)
+        text_ids[t_pos, t_owner] = lookup[t_codes]
+        text_ids += np.arange(n) * width
+
+        shift = np.maximum(m, 1).astype(np.uint64)
+        full = np.uint64(0xFFFFFFFFFFFFFFFF)
+        mask = np.where(m >= 64, full, (np.uint64(1) << np.minimum(shift, np.uint64(63))) - np.uint64(1))
+        high = np.uint64(1) << (shift - np.uint64(1))
+
+        pv = mask.copy()
+        mv = np.zeros(n, dtype=np.uint64)
+        score = m.copy()
+        for col in range(text_ids.shape[0]):
+            eq = peq[text_ids[col]]
+            xv = eq | mv
+            xh = (((eq & pv) + pv) ^ pv) | eq
+            ph = mv | ~(xh | pv)
+            mh = pv & xh
+            active = col < text_len
+            score += ((ph & high) != 0) & active
+            score -= ((mh & high) != 0) & active
+            ph = (ph << np.uint64(1)) | np.uint64(1)
+            mh = mh << np.uint64(1)
+            pv = (mh | ~(xv | ph)) & mask
+            mv = ph & xv & mask
+        return np.where(m == 0, text_len, score)
+
+    @staticmethod
+    def _myers_distance(pattern: str, text: str) -> int:
+        """
+        Single-pair Myers/Hyyroe distance on arbitrary-precision integers.
+        """
+        m = len(pattern)
+        if m == 0:
+            return len(text)
+        peq: Dict[str, int] = {}
+        for k, ch in enumerate(pattern):
+            peq[ch] = peq.get(ch, 0) | (1 << k)
+        mask = (1 << m) - 1
+        high = 1 << (m - 1)
+        pv, mv, score = mask, 0, m
+        for ch in text:
+            eq = peq.get(ch, 0)
+            xv = eq | mv
+            xh = (((eq & pv) + pv) ^ pv) | eq
+            ph = mv | (~(xh | pv) & mask)
+            mh = pv & xh
+            if ph & high:
+                score += 1
+            elif mh & high:
+                score -= 1
+            ph = ((ph << 1) | 1) & mask
+            mh = (mh << 1) & mask
+            pv = mh | (~(xv | ph) & mask)
+            mv = ph & xv
+        return score
+
     def levenshtein_ratio(self, s1: str, s2: str) -> float:
         """
         Hand-rolled Levenshtein distance ratio.
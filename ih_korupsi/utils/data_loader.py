@@ -1,30 +1,289 @@
+import numpy as np
 import pandas as pd
+import glob
+import hashlib
 import json
-import sqlite3
-from typing import Union, Optional
+import os
+from typing import Union, Optional, Iterator, Dict, List, Tuple
+
+# Explicit dtypes for streamed chunks, so every chunk is typed the same way
+# regardless of which values it happens to contain.
+CHUNK_DTYPES: Dict[str, str] = {
+    'amount': 'float64',
+}
+
+# Identifier columns repeat heavily and are category-encoded per chunk.
+CATEGORY_COLUMNS = ['vendor_id', 'vendor_name', 'sender_id', 'receiver_id']
+
+# Column-oriented formats read through pyarrow, which is an optional dependency.
+ARROW_TYPES = ('parquet', 'feather')
+
+# File extensions picked up when a directory is given as input.
+SOURCE_EXTENSIONS: Dict[str, Tuple[str, ...]] = {
+    'csv': ('.csv', '.csv.gz'),
+    'json': ('.json', '.jsonl'),
+    'parquet': ('.parquet',),
+    'feather': ('.feather', '.arrow'),
+    'sql': ('.db', '.sqlite'),
+}
+
+DateRange = Tuple[Optional[str], Optional[str]]
+
+def _require_pyarrow():
+    try:
+        import pyarrow.dataset as ds
+    except ImportError as e:
+        raise ImportError("Parquet/Feather support requires pyarrow: pip install pyarrow") from e
+    return ds
 
 class DataLoader:
     """
     Handles data ingestion from various formats.
+
+    columns limits loading to the given columns (missing ones are ignored) and
+    date_range = (start, end) keeps rows whose 'date' falls within the inclusive
+    range; a date-only end includes that whole day. Both are pushed down to the
+    reader for Parquet/Feather (Parquet skips row groups by their statistics)
+    and applied after reading for the text formats.
     """
     @staticmethod
-    def load(source: str, type: str = 'csv') -> pd.DataFrame:
+    def load(source: str, type: str = 'csv', columns: Optional[List[str]] = None, date_range: Optional[DateRange] = None) -> pd.DataFrame:
         if type == 'csv':
-            return pd.read_csv(source)
+            df = pd.read_csv(source, usecols=DataLoader._usecols(columns, date_range))
         elif type == 'json':
-            return pd.read_json(source)
+            df = pd.read_json(source)
         elif type == 'sql':
-            conn = sqlite3.connect(source)
-            df = pd.read_sql_query("SELECT * FROM transactions", conn)
-            conn.close()
-            return df
+            # sql_source builds on DataLoader, hence the local import.
+            from .sql_source import SQLSource
+            with SQLSource(source, date_range=date_range) as sql:
+                return sql.load(columns)
+        elif type in ARROW_TYPES:
+            dataset = DataLoader._arrow_dataset(source, type)
+            return dataset.to_table(columns=DataLoader._arrow_columns(dataset, columns), filter=DataLoader._arrow_filter(dataset, date_range)).to_pandas()
         else:
             raise ValueError(f"Unsupported file type: {type}")
+        return DataLoader._select(df, columns, date_range)
+
+    @staticmethod
+    def iter_chunks(source: str, type: str = 'csv', chunksize: int = 100000, columns: Optional[List[str]] = None, date_range: Optional[DateRange] = None) -> Iterator[pd.DataFrame]:
+        """
+        Streams the input as typed DataFrames of at most chunksize rows.
+        JSON input must be in JSON Lines format (one record per line).
+        """
+        if type == 'csv':
+            header = pd.read_csv(source, nrows=0).columns
+            dtypes = {col: dtype for col, dtype in CHUNK_DTYPES.items() if col in header}
+            reader = pd.read_csv(source, dtype=dtypes, usecols=DataLoader._usecols(columns, date_range), chunksize=chunksize)
+        elif type == 'json':
+            reader = pd.read_json(source, lines=True, chunksize=chunksize)
+        elif type == 'sql':
+            from .sql_source import SQLSource
+            with SQLSource(source, date_range=date_range) as sql:
+                yield from sql.iter_chunks(columns, chunksize)
+            return
+        elif type in ARROW_TYPES:
+            dataset = DataLoader._arrow_dataset(source, type)
+            batches = dataset.to_batches(columns=DataLoader._arrow_columns(dataset, columns), filter=DataLoader._arrow_filter(dataset, date_range), batch_size=chunksize)
+            for batch in batches:
+                if batch.num_rows:
+                    yield DataLoader._typed(batch.to_pandas())
+            return
+        else:
+            raise ValueError(f"Unsupported file type for streaming: {type}")
+
+        with reader:
+            for chunk in reader:
+                yield DataLoader._typed(DataLoader._select(chunk, columns, date_range))
+
+    @staticmethod
+    def expand_sources(source: str, type: str = 'csv') -> List[str]:
+        """
+        Partition files of a dataset: every file of the type under a directory
+        (recursively, e.g. agency=X/month=Y/ layouts), the matches of a glob pattern
+        (** spans directories), or just source itself. Sorted, so results do not
+        depend on listing order.
+        """
+        if os.path.isdir(source):
+            extensions = SOURCE_EXTENSIONS.get(type, ())
+            sources = [os.path.join(root, name) for root, _, names in os.walk(source) for name in names if name.lower().endswith(extensions)]
+        elif any(char in source for char in '*?['):
+            sources = [path for path in glob.glob(source, recursive=True) if os.path.isfile(path)]
+        else:
+            return [source]
+        if not sources:
+            raise FileNotFoundError(f"No {type} files found in {source}")
+        return sorted(sources)
+
+    @staticmethod
+    def iter_partition(source: str, type: str = 'csv', chunksize: Optional[int] = None, columns: Optional[List[str]] = None, date_range: Optional[DateRange] = None) -> Iterator[pd.DataFrame]:
+        """One partition file as typed DataFrames: whole, or in chunks of chunksize rows."""
+        if chunksize:
+            yield from DataLoader.iter_chunks(source, type, chunksize, columns, date_range)
+        else:
+            yield DataLoader._typed(DataLoader.load(source, type, columns, date_range))
+
+    @staticmethod
+    def fingerprint(source: str) -> str:
+        """
+        SHA-256 of the file contents, identifying a batch in incremental mode.
+        """
+        digest = hashlib.sha256()
+        with open(source, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def convert_csv(source: str, target: str, format: str = 'parquet', chunksize: int = 1000000, dtypes: Optional[Dict[str, str]] = None):
+        """
+        Converts a CSV dump to Parquet or Feather without loading it whole.
+        Dates are stored as timestamps, so date ranges can be pushed down; every
+        chunk becomes one Parquet row group (keep dumps sorted by date to make
+        row-group skipping effective).
+
+        Every chunk is written with one explicit schema. The type of each column
+        not given in dtypes is inferred over the whole file in a first pass that
+        reads only those columns, widened across chunks as a whole-file read_csv
+        would (e.g. int64 to float64 for missing values, to str for text).
+        """
+        _require_pyarrow()
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        import pyarrow.ipc as ipc
+
+        if format not in ARROW_TYPES:
+            raise ValueError(f"Unsupported target format: {format}")
+        header = pd.read_csv(source, nrows=0).columns
+        fixed = {**CHUNK_DTYPES, **(dtypes or {})}
+        column_types = {col: dtype for col, dtype in fixed.items() if col in header and col != 'date'}
+        inferred = [col for col in header if col not in column_types and col != 'date']
+        if inferred:
+            column_types.update(DataLoader._csv_dtypes(source, inferred, chunksize))
+        writer = None
+        try:
+            with pd.read_csv(source, dtype=column_types, chunksize=chunksize) as reader:
+                for chunk in reader:
+                    if 'date' in chunk.columns:
+                        chunk['date'] = pd.to_datetime(chunk['date'])
+                    if writer is None:
+                        fields = []
+                        for col in header:
+                            if col == 'date':
+                                fields.append(pa.field(col, pa.timestamp('us', tz=getattr(chunk[col].dt, 'tz', None))))
+                            else:
+                                dtype = pd.api.types.pandas_dtype(column_types[col])
+                                numeric = isinstance(dtype, np.dtype) and dtype.kind in 'iufb'
+                                fields.append(pa.field(col, pa.from_numpy_dtype(dtype) if numeric else pa.large_string()))
+                        schema = pa.schema(fields)
+                        if format == 'parquet':
+                            writer = pq.ParquetWriter(target, schema)
+                        else:
+                            writer = ipc.new_file(target, schema)
+                    writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+        finally:
+            if writer is not None:
+                writer.close()
+
+    @staticmethod
+    def _csv_dtypes(source: str, columns: List[str], chunksize: int) -> Dict[str, str]:
+        """dtypes read_csv infers for the columns over the whole file, chunk by chunk."""
+        found: Dict[str, List] = {col: [] for col in columns}
+        with pd.read_csv(source, usecols=columns, chunksize=chunksize) as reader:
+            for chunk in reader:
+                for col in columns:
+                    found[col].append(chunk[col].dtype)
+        result = {}
+        for col, kinds in found.items():
+            if kinds and all(isinstance(kind, np.dtype) and kind.kind in 'iuf' for kind in kinds):
+                result[col] = str(np.result_type(*kinds))
+            elif kinds and all(isinstance(kind, np.dtype) and kind.kind == 'b' for kind in kinds):
+                result[col] = 'bool'
+            else:
+                result[col] = 'str'
+        return result
+
+    @staticmethod
+    def _typed(chunk: pd.DataFrame) -> pd.DataFrame:
+        columns = {col: chunk[col].astype(dtype) for col, dtype in CHUNK_DTYPES.items() if col in chunk.columns}
+        if 'date' in chunk.columns:
+            columns['date'] = pd.to_datetime(chunk['date'])
+        for col in CATEGORY_COLUMNS:
+            if col in chunk.columns:
+                columns[col] = chunk[col].astype('category')
+        return chunk.assign(**columns)
+
+    @staticmethod
+    def _usecols(columns: Optional[List[str]], date_range: Optional[DateRange]):
+        if columns is None:
+            return None
+        # The date column is read for filtering even when it is not projected.
+        wanted = set(columns) | ({'date'} if date_range else set())
+        return lambda col: col in wanted
+
+    @staticmethod
+    def _date_bounds(date_range: Optional[DateRange]) -> Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+        """Returns [start, stop) for an inclusive (start, end) date range."""
+        start, end = date_range or (None, None)
+        start = pd.Timestamp(start) if start is not None else None
+        stop = None
+        if end is not None:
+            end = pd.Timestamp(end)
+            stop = end + pd.Timedelta(days=1) if end == end.normalize() else end + pd.Timedelta(1, 'ns')
+        return start, stop
+
+    @staticmethod
+    def _select(df: pd.DataFrame, columns: Optional[List[str]], date_range: Optional[DateRange]) -> pd.DataFrame:
+        start, stop = DataLoader._date_bounds(date_range)
+        if start is not None or stop is not None:
+            dates = pd.to_datetime(df['date'])
+            keep = pd.Series(True, index=df.index)
+            if start is not None:
+                keep &= dates >= start
+            if stop is not None:
+                keep &= dates < stop
+            df = df[keep]
+        if columns is not None:
+            df = df[[col for col in df.columns if col in columns]]
+        return df
+
+    @staticmethod
+    def _arrow_dataset(source: str, type: str):
+        ds = _require_pyarrow()
+        return ds.dataset(source, format='ipc' if type == 'feather' else 'parquet')
+
+    @staticmethod
+    def _arrow_columns(dataset, columns: Optional[List[str]]) -> Optional[List[str]]:
+        if columns is None:
+            return None
+        return [col for col in dataset.schema.names if col in columns]
+
+    @staticmethod
+    def _arrow_filter(dataset, date_range: Optional[DateRange]):
+        start, stop = DataLoader._date_bounds(date_range)
+        if start is None and stop is None:
+            return None
+        import pyarrow as pa
+        ds = _require_pyarrow()
+        date_type = dataset.schema.field('date').type
+        if not (pa.types.is_timestamp(date_type) or pa.types.is_date(date_type)):
+            raise ValueError(f"Date filtering needs a timestamp 'date' column, found {date_type}")
+        field = ds.field('date')
+        if pa.types.is_date(date_type):
+            field = field.cast(pa.timestamp('ns'))
+        bound_type = pa.timestamp('us', tz=getattr(date_type, 'tz', None))
+        condition = None
+        if start is not None:
+            condition = field >= pa.scalar(start.to_pydatetime(), type=bound_type)
+        if stop is not None:
+            below = field < pa.scalar(stop.to_pydatetime(), type=bound_type)
+            condition = below if condition is None else condition & below
+        return condition
 
     @staticmethod
-    def generate_sample_data(rows: int = 100) -> pd.DataFrame:
+    def generate_sample_data(rows: int = 100, date_range: Optional[DateRange] = None) -> pd.DataFrame:
         """
-        Generates synthetic data with intentional anomalies.
+        Generates synthetic data with intentional anomalies; date_range keeps the
+        rows dated within it, as for loaded files.
         """
         import random
         from datetime import datetime, timedelta
@@ -64,4 +323,4 @@ class DataLoader:
                 "receiver_id": vendor
             })
 
-        return pd.DataFrame(data)
+        return DataLoader._select(pd.DataFrame(data), None, date_range)
@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+from typing import List, Tuple
+
+# Bucket holding the values <= 0 of a group.
+ZERO_BUCKET = np.iinfo(np.int32).min
+
+class QuantileSketch:
+    """
+    Mergeable approximate quantiles for many groups at once.
+
+    Positive values are counted in logarithmic buckets (as in DDSketch): bucket i
+    covers (gamma**(i-1), gamma**i] with gamma = (1 + a) / (1 - a), so every
+    quantile is returned within a relative error a of a value of its group.
+    Values <= 0 share ZERO_BUCKET. The counts are a plain (group..., bucket)
+    Series, so updating is one grouped count and merging is a sum; the sketch
+    holds at most one entry per occupied bucket of each group.
+    """
+    def __init__(self, group_names: List[str], relative_accuracy: float = 0.01):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.group_names = list(group_names)
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        index = pd.MultiIndex.from_arrays([[] for _ in range(len(group_names) + 1)], names=self.group_names + ['bucket'])
+        self.counts = pd.Series(np.zeros(0, dtype=np.int64), index=index)
+
+    def _bucket(self, values: np.ndarray) -> np.ndarray:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            buckets = np.ceil(np.log(values) / np.log(self.gamma))
+        return np.where(values > 0, buckets, ZERO_BUCKET).astype(np.int64)
+
+    def _value(self, buckets: np.ndarray) -> np.ndarray:
+        # Representative value of a bucket, 0 for ZERO_BUCKET.
+        with np.errstate(over='ignore'):
+            values = 2 * self.gamma ** buckets.astype(np.float64) / (self.gamma + 1)
+        return np.where(buckets == ZERO_BUCKET, 0.0, values)
+
+    def update(self, groups: pd.DataFrame, values: np.ndarray) -> 'QuantileSketch':
+        """
+        Adds values (NaN ignored) to the groups given row by row in the columns
+        group_names of groups.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        valid = np.isfinite(values)
+        keys = groups[self.group_names].reset_index(drop=True)[valid]
+        chunk = QuantileSketch(self.group_names, self.relative_accuracy)
+        counted = keys.assign(bucket=self._bucket(values[valid]))
+        chunk.counts = counted.groupby(self.group_names + ['bucket'], sort=False, dropna=False).size()
+        return self.merge(chunk)
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        if other.gamma != self.gamma or other.group_names != self.group_names:
+            raise ValueError("Only sketches with the same groups and accuracy can be merged")
+        merged = QuantileSketch(self.group_names, self.relative_accuracy)
+        if not len(self.counts) or not len(other.counts):
+            merged.counts = other.counts if not len(self.counts) else self.counts
+        else:
+            combined = pd.concat([self.counts, other.counts])
+            merged.counts = combined.groupby(level=list(range(combined.index.nlevels)), sort=False, dropna=False).sum()
+        return merged
+
+    def rollup(self, group_names: List[str]) -> 'QuantileSketch':
+        """The sketch of coarser groups, e.g. per entity from per (entity, month)."""
+        rolled = QuantileSketch(group_names, self.relative_accuracy)
+        if len(self.counts):
+            codes, labels = self._codes(group_names + ['bucket'])
+            sums = np.bincount(codes, weights=self.counts.to_numpy(), minlength=len(labels)).astype(np.int64)
+            rolled.counts = pd.Series(sums, index=labels)
+        return rolled
+
+    def subset(self, groups: pd.Index) -> 'QuantileSketch':
+        """The sketch of just the given groups (labels as returned by count())."""
+        codes, labels = self._groups()
+        wanted = np.zeros(len(labels), dtype=bool)
+        positions = labels.get_indexer(groups)
+        wanted[positions[positions >= 0]] = True
+        subset = QuantileSketch(self.group_names, self.relative_accuracy)
+        subset.counts = self.counts[wanted[codes]] if len(self.counts) else self.counts
+        return subset
+
+    def _codes(self, names: List[str]) -> Tuple[np.ndarray, pd.MultiIndex]:
+        """Code of every entry by its labels on the given levels, and those labels."""
+        index = self.counts.index
+        positions = [index.names.index(name) for name in names]
+        # Level codes are -1 for missing labels, hence the shift by one.
+        dims = [len(index.levels[i]) + 1 for i in positions]
+        flat = np.ravel_multi_index([index.codes[i] + 1 for i in positions], dims)
+        if np.prod(dims, dtype=np.float64) <= 4 * len(flat) + 1024:
+            # Few possible keys: a dense presence table beats hashing.
+            present = np.zeros(int(np.prod(dims)), dtype=bool)
+            present[flat] = True
+            uniques = np.flatnonzero(present)
+            codes = (np.cumsum(present) - 1)[flat]
+        else:
+            codes, uniques = pd.factorize(flat)
+        level_codes = [c - 1 for c in np.unravel_index(uniques, dims)]
+        return codes, pd.MultiIndex(levels=[index.levels[i] for i in positions], codes=level_codes, names=names)
+
+    def _groups(self) -> Tuple[np.ndarray, pd.Index]:
+        """Group code of every entry and the group labels."""
+        codes, labels = self._codes(self.group_names)
+        if len(self.group_names) == 1:
+            labels = labels.get_level_values(0)
+        return codes, labels
+
+    def bucket_values(self) -> np.ndarray:
+        """Representative value of every entry of counts (0 for ZERO_BUCKET)."""
+        return self._value(self.counts.index.get_level_values('bucket').to_numpy())
+
+    def count(self) -> pd.Series:
+        """Number of values per group."""
+        codes, labels = self._groups()
+        return pd.Series(np.bincount(codes, weights=self.counts.to_numpy(), minlength=len(labels)).astype(np.int64), index=labels)
+
+    def quantile(self, q: float) -> pd.Series:
+        """The q-quantile of every group (lower of the two middle values for the median)."""
+        codes, labels = self._groups()
+        buckets = self.counts.index.get_level_values('bucket').to_numpy()
+        return pd.Series(self._value(self._weighted_quantile(codes, len(labels), buckets, self.counts.to_numpy(), q)), index=labels)
+
+    def median_mad(self, min_count: int = 1) -> pd.DataFrame:
+        """
+        Median, median absolute deviation and count of every group; the median and
+        MAD are NaN for groups with fewer than min_count values, which are skipped.
+        The deviations of the bucket values are bucketed again, so the MAD carries
+        about twice the relative error of the median.
+        """
+        codes, labels = self._groups()
+        buckets = self.counts.index.get_level_values('bucket').to_numpy()
+        weights = self.counts.to_numpy()
+        counts = np.bincount(codes, weights=weights, minlength=len(labels)).astype(np.int64)
+        keep = counts[codes] >= min_count
+        codes, buckets, weights = codes[keep], buckets[keep], weights[keep]
+        medians = self._value(self._weighted_quantile(codes, len(labels), buckets, weights, 0.5))
+        deviations = np.abs(self._value(buckets) - medians[codes])
+        mad = self._value(self._weighted_quantile(codes, len(labels), self._bucket(deviations), weights, 0.5))
+        scored = counts >= min_count
+        return pd.DataFrame({
+            "median": np.where(scored, medians, np.nan),
+            "mad": np.where(scored, mad, np.nan),
+            "count": counts
+        }, index=labels)
+
+    @staticmethod
+    def _weighted_quantile(codes: np.ndarray, groups: int, buckets: np.ndarray, weights: np.ndarray, q: float) -> np.ndarray:
+        """Bucket of weighted rank floor(q * (n - 1)) (0-based) within each group."""
+        result = np.full(groups, ZERO_BUCKET, dtype=np.int64)
+        if not len(buckets):
+            return result
+        # One integer sort by (group, bucket); ZERO_BUCKET sorts just below the rest.
+        low = buckets[buckets != ZERO_BUCKET].min(initial=0) - 1
+        offsets = np.where(buckets == ZERO_BUCKET, low, buckets) - low
+        order = np.argsort(codes * (offsets.max() + 1) + offsets)
+        codes, buckets, weights = codes[order], buckets[order], weights[order]
+        cumulative = np.cumsum(weights)
+        ends = np.flatnonzero(np.r_[codes[1:] != codes[:-1], True])
+        before = np.r_[0, cumulative[ends[:-1]]]
+        rank = np.floor(q * (cumulative[ends] - before - 1))
+        result[codes[ends]] = buckets[np.searchsorted(cumulative, before + rank, side='right')]
+        return result
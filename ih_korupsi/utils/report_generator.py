@@ -1,18 +1,26 @@
-import json
+import itertools
 from datetime import datetime
+from typing import Any, Dict, IO, List, Optional, Tuple
+from jinja2 import DictLoader, Environment
 
-class ReportGenerator:
-    """
-    Generates visual reports in HTML format.
-    """
-    @staticmethod
-    def generate_html(report_data: dict) -> str:
-        metadata = report_data.get('metadata', {})
-        findings = report_data.get('findings', {})
-        
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        html = f"""
+# Included rather than a macro: macro output is built as one string, includes are streamed.
+TABLE_TEMPLATE = """
+            <table class="paged">
+                <thead><tr>{% for header in headers %}<th>{{ header }}</th>{% endfor %}</tr></thead>
+{% for page in table.rows|batch(page_size) %}
+                <tbody>
+{% for row in page %}
+                <tr>{% for cell in row %}<td>{{ cell }}</td>{% endfor %}</tr>
+{% endfor %}
+                </tbody>
+{% endfor %}
+            </table>
+{% if table.total > table.shown %}
+            <p class="explanation">Showing the first {{ '{:,}'.format(table.shown) }} of {{ '{:,}'.format(table.total) }} rows; the JSON report lists all of them.</p>
+{% endif %}
+"""
+
+HTML_TEMPLATE = """
 <!DOCTYPE html>
 <html lang="en">
 <head>
@@ -20,138 +28,202 @@ class ReportGenerator:
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>IH-Korupsi Forensic Report</title>
     <style>
-        body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; color: #333; max-width: 1000px; margin: 0 auto; padding: 20px; background-color: #f4f7f6; }}
-        header {{ background: #1a3a5f; color: white; padding: 30px; border-radius: 8px; margin-bottom: 30px; text-align: center; }}
-        h1 {{ margin: 0; font-size: 2.5em; }}
-        .metadata {{ display: grid; grid-template-columns: repeat(3, 1fr); gap: 20px; margin-bottom: 30px; }}
-        .card {{ background: white; padding: 20px; border-radius: 8px; box-shadow: 0 2px 5px rgba(0,0,0,0.1); }}
-        .card h3 {{ margin-top: 0; color: #1a3a5f; border-bottom: 2px solid #eee; padding-bottom: 10px; }}
-        .finding-section {{ margin-bottom: 40px; }}
-        .red-flag {{ color: #d9534f; font-weight: bold; border: 1px solid #d9534f; padding: 5px 10px; border-radius: 4px; }}
-        .success {{ color: #5cb85c; font-weight: bold; }}
-        table {{ width: 100%; border-collapse: collapse; margin: 15px 0; }}
-        th, td {{ padding: 12px; text-align: left; border-bottom: 1px solid #eee; }}
-        th {{ background-color: #f8f9fa; color: #1a3a5f; }}
-        .explanation {{ font-style: italic; color: #666; font-size: 0.9em; margin-top: 10px; }}
-        footer {{ text-align: center; margin-top: 50px; color: #888; border-top: 1px solid #ddd; padding-top: 20px; }}
+        body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; color: #333; max-width: 1000px; margin: 0 auto; padding: 20px; background-color: #f4f7f6; }
+        header { background: #1a3a5f; color: white; padding: 30px; border-radius: 8px; margin-bottom: 30px; text-align: center; }
+        h1 { margin: 0; font-size: 2.5em; }
+        .metadata { display: grid; grid-template-columns: repeat(3, 1fr); gap: 20px; margin-bottom: 30px; }
+        .card { background: white; padding: 20px; border-radius: 8px; box-shadow: 0 2px 5px rgba(0,0,0,0.1); }
+        .card h3 { margin-top: 0; color: #1a3a5f; border-bottom: 2px solid #eee; padding-bottom: 10px; }
+        .finding-section { margin-bottom: 40px; }
+        .red-flag { color: #d9534f; font-weight: bold; border: 1px solid #d9534f; padding: 5px 10px; border-radius: 4px; }
+        .success { color: #5cb85c; font-weight: bold; }
+        table { width: 100%; border-collapse: collapse; margin: 15px 0; }
+        th, td { padding: 12px; text-align: left; border-bottom: 1px solid #eee; }
+        th { background-color: #f8f9fa; color: #1a3a5f; }
+        .explanation { font-style: italic; color: #666; font-size: 0.9em; margin-top: 10px; }
+        footer { text-align: center; margin-top: 50px; color: #888; border-top: 1px solid #ddd; padding-top: 20px; }
+        .pager { text-align: center; color: #666; }
+        .pager button { margin: 0 10px; }
     </style>
 </head>
 <body>
     <header>
         <h1>IH-Korupsi Report</h1>
         <p>Intelligent Hunting (IH) - Korupsi - Forensic Data Toolkit</p>
-        <p>Analysis Time: {timestamp}</p>
+        <p>Analysis Time: {{ timestamp }}</p>
     </header>
 
     <div class="metadata">
         <div class="card">
             <h3>Total Transactions</h3>
-            <p style="font-size: 1.5em; font-weight: bold;">{metadata.get('total_rows', 0):,}</p>
+            <p style="font-size: 1.5em; font-weight: bold;">{{ '{:,}'.format(metadata.total_rows|default(0)) }}</p>
         </div>
         <div class="card">
             <h3>Total Amount</h3>
-            <p style="font-size: 1.5em; font-weight: bold;">{metadata.get('currency', 'IDR')} {metadata.get('total_amount', 0):,.2f}</p>
+            <p style="font-size: 1.5em; font-weight: bold;">{{ metadata.currency|default('IDR') }} {{ '{:,.2f}'.format(metadata.total_amount|default(0)) }}</p>
         </div>
         <div class="card">
             <h3>Currency</h3>
-            <p style="font-size: 1.5em; font-weight: bold;">{metadata.get('currency', 'IDR')}</p>
+            <p style="font-size: 1.5em; font-weight: bold;">{{ metadata.currency|default('IDR') }}</p>
         </div>
     </div>
-"""
-
-        # Mathematician Section
-        math = findings.get('The Mathematician', {})
-        if math:
-            benford = math.get('benford_test', {})
-            rsf = math.get('rsf_test', {})
-            
-            conformity = benford.get('conformity_status')
-            status_class = "red-flag" if conformity == "Non-conformity" else "success"
-            
-            html += f"""
+{% if 'benford_test' in math %}
     <div class="finding-section">
         <h2>Statistical Detection (The Mathematician)</h2>
         <div class="card">
             <h3>Benford's Law Test</h3>
-            <p>Status: <span class="{status_class}">{conformity}</span> (MAD: {benford.get('mad', 0):.4f})</p>
-            <p class="explanation">{benford.get('explanation')}</p>
+            <p>Status: <span class="{{ 'red-flag' if math.benford_test.conformity_status == 'Non-conformity' else 'success' }}">{{ math.benford_test.conformity_status }}</span> (MAD: {{ '%.4f'|format(math.benford_test.mad|default(0)) }})</p>
+            <p class="explanation">{{ math.benford_test.explanation }}</p>
         </div>
-        
+{% if math.rsf_test is defined %}
         <div class="card" style="margin-top:20px;">
             <h3>High Risk Entities (RSF)</h3>
-            <table>
-                <tr><th>Entity</th><th>RSF Score</th><th>Largest Transaction</th><th>Average of Others</th></tr>
-"""
-            for e in rsf.get('high_risk_entities', []):
-                html += f"<tr><td>{e['entity']}</td><td>{e['rsf_value']:.2f}</td><td>{e['largest_transaction']:,.0f}</td><td>{e['average_others']:,.0f}</td></tr>"
-            
-            html += f"""
-            </table>
-            <p class="explanation">{rsf.get('explanation')}</p>
+{% with headers = ['Entity', 'RSF Score', 'Largest Transaction', 'Average of Others'], table = tables.rsf %}{% include 'table.html' %}{% endwith %}
+            <p class="explanation">{{ math.rsf_test.explanation }}</p>
         </div>
+{% endif %}
     </div>
-"""
-
-        # Chronologist Section
-        chrono = findings.get('The Chronologist', {})
-        if chrono:
-            cliff = chrono.get('fiscal_cliff', {})
-            velocity = chrono.get('velocity_anomalies', {})
-            
-            status = cliff.get('status')
-            status_class = "red-flag" if status == "Extreme Dumping" else "success"
-            
-            html += f"""
+{% endif %}
+{% if 'fiscal_cliff' in chrono %}
     <div class="finding-section">
         <h2>Time-Series Detection (The Chronologist)</h2>
         <div class="card">
             <h3>Fiscal Cliff (Budget Dumping)</h3>
-            <p>Status: <span class="{status_class}">{status}</span> (Ratio: {cliff.get('december_vs_avg_ratio', 0):.2f}x)</p>
-            <p class="explanation">{cliff.get('explanation')}</p>
+            <p>Status: <span class="{{ 'red-flag' if chrono.fiscal_cliff.status == 'Extreme Dumping' else 'success' }}">{{ chrono.fiscal_cliff.status }}</span> (Ratio: {{ '%.2f'|format(cliff_ratio) }}x)</p>
+            <p class="explanation">{{ chrono.fiscal_cliff.explanation }}</p>
         </div>
-        
+{% if chrono.velocity_anomalies is defined %}
         <div class="card" style="margin-top:20px;">
             <h3>High Frequency Transaction Events</h3>
-            <table>
-                <tr><th>Vendor/Entity</th><th>Date</th><th>Transaction Count</th></tr>
-"""
-            for v in velocity.get('high_velocity_events', []):
-                html += f"<tr><td>{v['vendor_id']}</td><td>{v['date_only']}</td><td>{v['count']}</td></tr>"
-            
-            html += f"""
-            </table>
-            <p class="explanation">{velocity.get('explanation')}</p>
+{% with headers = ['Vendor/Entity', 'Date', 'Window', 'Transaction Count'], table = tables.velocity %}{% include 'table.html' %}{% endwith %}
+            <p class="explanation">{{ chrono.velocity_anomalies.explanation }}</p>
         </div>
+{% endif %}
+{% if chrono.period_spikes is defined %}
+        <div class="card" style="margin-top:20px;">
+            <h3>Period Spikes by Entity</h3>
+{% with headers = ['Entity', 'Peak Period', 'Peak Ratio', 'Spikes (Year-End)'], table = tables.spikes %}{% include 'table.html' %}{% endwith %}
+            <p class="explanation">{{ chrono.period_spikes.explanation }}</p>
+        </div>
+{% endif %}
     </div>
-"""
-
-        # String Detective Section
-        string_det = findings.get('String Detective', {})
-        if string_det:
-            ghosts = string_det.get('potential_ghost_vendors', [])
-            html += f"""
+{% endif %}
+{% if 'potential_ghost_vendors' in string_det %}
     <div class="finding-section">
         <h2>String Detection (String Detective)</h2>
         <div class="card">
             <h3>Potential Ghost Vendors / Name Duplication</h3>
-            <table>
-                <tr><th>Name 1</th><th>Name 2</th><th>Similarity Score</th></tr>
-"""
-            for g in ghosts:
-                html += f"<tr><td>{g['name_1']}</td><td>{g['name_2']}</td><td>{g['similarity_score']*100:.1f}%</td></tr>"
-            
-            html += f"""
-            </table>
-            <p class="explanation">{string_det.get('explanation')}</p>
+{% with headers = ['Name 1', 'Name 2', 'Similarity Score'], table = tables.ghosts %}{% include 'table.html' %}{% endwith %}
+            <p class="explanation">{{ string_det.explanation }}</p>
         </div>
     </div>
-"""
+{% endif %}
+{% if failed %}
+    <div class="finding-section">
+        <h2>Detectors Without Findings</h2>
+{% for name, error in failed.items() %}
+        <div class="card" style="margin-top:20px;">
+            <h3>{{ name }}</h3>
+            <p><span class="red-flag">Failed</span> {{ error }}</p>
+        </div>
+{% endfor %}
+    </div>
+{% endif %}
 
-        html += """
     <footer>
         <p>Created by OurCreativity Edisi Coding - Towards a More Transparent Future</p>
     </footer>
+    <script>
+        // Shows one page (tbody) of every long table at a time; without scripts all rows stay visible.
+        document.querySelectorAll('table.paged').forEach(function (table) {
+            var pages = table.tBodies, current = 0;
+            if (pages.length < 2) return;
+            var nav = document.createElement('p');
+            nav.className = 'pager';
+            nav.innerHTML = '<button>&larr; Previous</button><span></span><button>Next &rarr;</button>';
+            function show(page) {
+                current = page;
+                for (var i = 0; i < pages.length; i++) pages[i].hidden = i !== page;
+                nav.children[1].textContent = 'Page ' + (page + 1) + ' of ' + pages.length;
+            }
+            nav.children[0].onclick = function () { show(Math.max(current - 1, 0)); };
+            nav.children[2].onclick = function () { show(Math.min(current + 1, pages.length - 1)); };
+            table.after(nav);
+            show(0);
+        });
+    </script>
 </body>
 </html>
 """
-        return html
+
+_ENVIRONMENT = Environment(loader=DictLoader({'report.html': HTML_TEMPLATE, 'table.html': TABLE_TEMPLATE}),
+                           autoescape=True, trim_blocks=True, lstrip_blocks=True)
+
+class ReportGenerator:
+    """
+    Generates visual reports in HTML format.
+
+    The page is a streamed Jinja2 template: write_html renders it section by
+    section straight to a file, with table rows produced lazily and split into
+    pages of page_size rows, so memory does not grow with the number of findings.
+    """
+    @staticmethod
+    def generate_html(report_data: dict, page_size: int = 100, max_rows: Optional[int] = None) -> str:
+        return "".join(ReportGenerator._stream(report_data, page_size, max_rows))
+
+    @staticmethod
+    def write_html(report_data: dict, f: IO[str], page_size: int = 100, max_rows: Optional[int] = None):
+        """Renders the report to the file handle f; max_rows caps the rows of every table."""
+        ReportGenerator._stream(report_data, page_size, max_rows).dump(f)
+
+    @staticmethod
+    def _stream(report_data: dict, page_size: int, max_rows: Optional[int]):
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1")
+        findings = report_data.get('findings', {})
+        math = findings.get('The Mathematician', {})
+        chrono = findings.get('The Chronologist', {})
+        string_det = findings.get('String Detective', {})
+        failed = {name: result['error'] for name, result in findings.items() if isinstance(result, dict) and 'error' in result}
+        cliff = chrono.get('fiscal_cliff', {})
+
+        def rows(items: List[Dict[str, Any]], format_row) -> Dict[str, Any]:
+            shown = len(items) if max_rows is None else min(len(items), max_rows)
+            return {"rows": (format_row(item) for item in itertools.islice(items, shown)), "total": len(items), "shown": shown}
+
+        tables = {
+            "rsf": rows(math.get('rsf_test', {}).get('high_risk_entities', []), ReportGenerator._rsf_row),
+            "velocity": rows(chrono.get('velocity_anomalies', {}).get('high_velocity_events', []), ReportGenerator._velocity_row),
+            "spikes": rows(chrono.get('period_spikes', {}).get('top_entities', []), ReportGenerator._spike_row),
+            "ghosts": rows(string_det.get('potential_ghost_vendors', []), ReportGenerator._ghost_row)
+        }
+        stream = _ENVIRONMENT.get_template('report.html').stream(
+            timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            metadata=report_data.get('metadata', {}),
+            math=math,
+            chrono=chrono,
+            string_det=string_det,
+            failed=failed,
+            cliff_ratio=cliff.get('year_end_vs_avg_ratio', cliff.get('december_vs_avg_ratio', 0)),
+            tables=tables,
+            page_size=page_size
+        )
+        # Writes in blocks rather than one call per template fragment.
+        stream.enable_buffering(64)
+        return stream
+
+    @staticmethod
+    def _rsf_row(e: Dict[str, Any]) -> Tuple:
+        return (e['entity'], f"{e['rsf_value']:.2f}", f"{e['largest_transaction']:,.0f}", f"{e['average_others']:,.0f}")
+
+    @staticmethod
+    def _velocity_row(v: Dict[str, Any]) -> Tuple:
+        return (v['vendor_id'], v['date_only'], v.get('window', '1 day'), v['count'])
+
+    @staticmethod
+    def _spike_row(e: Dict[str, Any]) -> Tuple:
+        return (e['entity'], e['peak_period'], f"{e['peak_ratio']:.2f}x", f"{e['spikes']} ({e['year_end_spikes']})")
+
+    @staticmethod
+    def _ghost_row(g: Dict[str, Any]) -> Tuple:
+        return (g['name_1'], g['name_2'], f"{g['similarity_score']*100:.1f}%")
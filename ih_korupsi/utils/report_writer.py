@@ -0,0 +1,105 @@
+import json
+from typing import Any, Dict, IO, Iterator, Optional
+
+REPORT_FORMATS = ('json', 'compact', 'jsonl')
+
+# Lists of scalars are encoded this many items at a time.
+SLICE_SIZE = 10000
+
+class ReportWriter:
+    """
+    Writes reports to a file handle piece by piece, so memory stays flat however
+    many findings a report holds.
+
+    'json' is the indented report, 'compact' the same without whitespace, and
+    'jsonl' one JSON object per line: the metadata, a summary of every test and
+    one line per item of the tests' lists (flagged transactions, events, ...),
+    which can be loaded or filtered line by line.
+    """
+    @staticmethod
+    def save(report: Dict[str, Any], output_path: str, format: str = 'json'):
+        if format not in REPORT_FORMATS:
+            raise ValueError(f"Unsupported report format: {format}")
+        with open(output_path, 'w', encoding='utf-8') as f:
+            if format == 'json':
+                ReportWriter.write_json(report, f, indent=4)
+            elif format == 'compact':
+                ReportWriter.write_json(report, f)
+            else:
+                ReportWriter.write_jsonl(report, f)
+
+    @staticmethod
+    def write_json(report: Dict[str, Any], f: IO[str], indent: Optional[int] = None):
+        if indent is not None:
+            # The indenting encoder is a lazy generator already.
+            for chunk in json.JSONEncoder(indent=indent).iterencode(report):
+                f.write(chunk)
+        else:
+            for chunk in ReportWriter._compact(report, json.JSONEncoder(separators=(',', ':'))):
+                f.write(chunk)
+
+    @staticmethod
+    def _compact(value: Any, encoder: json.JSONEncoder) -> Iterator[str]:
+        """
+        Compact JSON of value in pieces. json.dump streams through the slow
+        pure-Python encoder; here the C encoder is handed bounded pieces instead:
+        the leaves of dicts, list items, and slices of lists of scalars.
+        """
+        if isinstance(value, dict):
+            yield '{'
+            for i, (key, item) in enumerate(value.items()):
+                yield (',' if i else '') + encoder.encode(str(key)) + ':'
+                yield from ReportWriter._compact(item, encoder)
+            yield '}'
+        elif isinstance(value, (list, tuple)):
+            yield '['
+            for start in range(0, len(value), SLICE_SIZE):
+                piece = value[start:start + SLICE_SIZE]
+                if any(isinstance(item, (dict, list, tuple)) for item in piece):
+                    # Findings records (events, entities) are small each.
+                    encoded = ",".join(encoder.encode(item) for item in piece)
+                else:
+                    encoded = encoder.encode(list(piece))[1:-1]
+                yield (',' if start else '') + encoded
+            yield ']'
+        else:
+            yield encoder.encode(value)
+
+    @staticmethod
+    def write_jsonl(report: Dict[str, Any], f: IO[str]):
+        """
+        Lines: {"record": "metadata", ...}, then per detector and test a
+        {"record": "summary", "detector", "test", "data"} line with its scalar
+        fields and one {"record": "item", "detector", "test", "field", "value"}
+        line per item of each of its lists. Lists directly under a detector have
+        test null.
+        """
+        encoder = json.JSONEncoder(separators=(',', ':'))
+        f.write(encoder.encode({"record": "metadata", **report.get("metadata", {})}) + "\n")
+        for detector, findings in report.get("findings", {}).items():
+            if not isinstance(findings, dict):
+                findings = {"value": findings}
+            scalars = {}
+            for test, result in findings.items():
+                if isinstance(result, dict):
+                    ReportWriter._write_test(f, encoder, detector, test, result)
+                elif isinstance(result, list):
+                    ReportWriter._write_items(f, encoder, detector, None, test, result)
+                else:
+                    scalars[test] = result
+            if scalars:
+                f.write(encoder.encode({"record": "summary", "detector": detector, "test": None, "data": scalars}) + "\n")
+
+    @staticmethod
+    def _write_test(f: IO[str], encoder: json.JSONEncoder, detector: str, test: str, result: Dict[str, Any]):
+        data = {key: value for key, value in result.items() if not isinstance(value, list)}
+        f.write(encoder.encode({"record": "summary", "detector": detector, "test": test, "data": data}) + "\n")
+        for field, items in result.items():
+            if isinstance(items, list):
+                ReportWriter._write_items(f, encoder, detector, test, field, items)
+
+    @staticmethod
+    def _write_items(f: IO[str], encoder: json.JSONEncoder, detector: str, test: Any, field: str, items: list):
+        prefix = encoder.encode({"record": "item", "detector": detector, "test": test, "field": field})[:-1] + ',"value":'
+        for start in range(0, len(items), SLICE_SIZE):
+            f.write("".join(prefix + encoder.encode(item) + "}\n" for item in items[start:start + SLICE_SIZE]))
@@ -0,0 +1,193 @@
+import pathlib
+import sqlite3
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import pandas as pd
+from .data_loader import DataLoader, DateRange
+
+# Column names the detectors use; SQLSource maps them to the table's own names.
+LOGICAL_COLUMNS = ['transaction_id', 'date', 'amount', 'vendor_name', 'vendor_id', 'sender_id', 'receiver_id']
+
+# Month ordinal (months since 1970-01) of an ISO-8601 date, like pandas' monthly periods.
+# Slicing the text is several times faster than SQLite's date functions.
+MONTH_ORDINAL = "(CAST(substr({date}, 1, 4) AS INTEGER) - 1970) * 12 + CAST(substr({date}, 6, 2) AS INTEGER) - 1"
+# Calendar day (YYYY-MM-DD) of an ISO-8601 date.
+DAY = "substr({date}, 1, 10)"
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+class SQLSource:
+    """
+    A transactions table in a SQLite file, read through one reused read-only
+    connection.
+
+    Besides streaming rows, it answers the GROUP BY queries that detectors with
+    aggregate-only inputs push down (see BaseDetector.state_from_sql), so only
+    their small results cross into Python. columns maps the detectors' column
+    names (LOGICAL_COLUMNS) to the table's where they differ; date_range =
+    (start, end) restricts every query to an inclusive date range. Dates must be
+    stored as ISO-8601 text, as pandas' to_sql writes them.
+    """
+    def __init__(self, path: str, table: str = 'transactions', columns: Optional[Dict[str, str]] = None,
+                 date_range: Optional[DateRange] = None):
+        unknown = set(columns or {}) - set(LOGICAL_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown columns in mapping: {', '.join(sorted(unknown))}")
+        self.path = path
+        self.table = table
+        self.columns = {col: (columns or {}).get(col, col) for col in LOGICAL_COLUMNS}
+        self.date_range = date_range
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            uri = pathlib.Path(self.path).resolve().as_uri() + "?mode=ro"
+            self._connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getstate__(self):
+        # Connections cannot be pickled; a copy opens its own.
+        return {**self.__dict__, "_connection": None}
+
+    def col(self, name: str) -> str:
+        """The quoted table column of a logical column name."""
+        return _quote(self.columns[name])
+
+    def table_columns(self) -> List[str]:
+        """Logical names of the mapped columns present in the table."""
+        present = {row[1] for row in self.connection.execute(f"PRAGMA table_info({_quote(self.table)})")}
+        if not present:
+            raise ValueError(f"Table {self.table} not found in {self.path}")
+        return [col for col in LOGICAL_COLUMNS if self.columns[col] in present]
+
+    def where(self, *conditions: str) -> Tuple[str, List[Any]]:
+        """WHERE clause of the date range and extra conditions, with its parameters."""
+        clauses, params = list(conditions), []
+        start, stop = DataLoader._date_bounds(self.date_range)
+        # ISO-8601 text compares in date order.
+        if start is not None:
+            clauses.append(f"{self.col('date')} >= ?")
+            params.append(start.isoformat(sep=' '))
+        if stop is not None:
+            clauses.append(f"{self.col('date')} < ?")
+            params.append(stop.isoformat(sep=' '))
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query(self, sql: str, params: Sequence[Any] = ()) -> pd.DataFrame:
+        return pd.read_sql_query(sql, self.connection, params=list(params))
+
+    def suggested_indexes(self) -> List[str]:
+        """CREATE INDEX statements that speed up the pushed-down queries and are missing."""
+        existing = set()
+        for index in self.connection.execute(f"PRAGMA index_list({_quote(self.table)})").fetchall():
+            existing.add(tuple(row[2] for row in self.connection.execute(f"PRAGMA index_info({_quote(index[1])})")))
+        available = set(self.table_columns())
+        wanted = [('vendor_id', 'date'), ('sender_id', 'receiver_id'), ('vendor_name',), ('date',)]
+        statements = []
+        for columns in wanted:
+            physical = tuple(self.columns[c] for c in columns)
+            if set(columns) <= available and physical not in existing:
+                name = _quote(f"idx_{self.table}_{'_'.join(physical)}")
+                statements.append(f"CREATE INDEX {name} ON {_quote(self.table)} ({', '.join(map(_quote, physical))});")
+        return statements
+
+    def totals(self) -> Tuple[int, float]:
+        """Row count and total amount."""
+        where, params = self.where()
+        rows, amount = self.connection.execute(f"SELECT COUNT(*), TOTAL({self.col('amount')}) FROM {_quote(self.table)}{where}", params).fetchone()
+        return int(rows), float(amount)
+
+    def _rows_query(self, columns: Optional[List[str]]) -> Tuple[str, List[Any]]:
+        available = self.table_columns()
+        selected = [c for c in (columns or available) if c in available]
+        where, params = self.where()
+        select = ", ".join(f"{self.col(c)} AS {_quote(c)}" for c in selected)
+        return f"SELECT {select} FROM {_quote(self.table)}{where} ORDER BY rowid", params
+
+    def load(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Rows of the given logical columns (all mapped ones by default), in table order."""
+        return self.query(*self._rows_query(columns))
+
+    def iter_chunks(self, columns: Optional[List[str]] = None, chunksize: int = 100000) -> Iterator[pd.DataFrame]:
+        """load() as typed chunks of chunksize rows (see DataLoader.iter_chunks)."""
+        sql, params = self._rows_query(columns)
+        for chunk in pd.read_sql_query(sql, self.connection, params=params, chunksize=chunksize):
+            yield DataLoader._typed(chunk)
+
+    def date_bounds(self) -> Tuple[Optional[str], Optional[str]]:
+        """First and last date of the transactions with a vendor."""
+        where, params = self.where(f"{self.col('vendor_id')} IS NOT NULL", f"{self.col('date')} IS NOT NULL")
+        return self.connection.execute(f"SELECT MIN({self.col('date')}), MAX({self.col('date')}) FROM {_quote(self.table)}{where}", params).fetchone()
+
+    def monthly_totals(self) -> pd.DataFrame:
+        """Columns period (month ordinal) and amount: total spending per calendar month."""
+        period = MONTH_ORDINAL.format(date=self.col('date'))
+        where, params = self.where(f"{period} IS NOT NULL")
+        return self.query(f"SELECT {period} AS period, TOTAL({self.col('amount')}) AS amount FROM {_quote(self.table)}{where} "
+                          "GROUP BY period ORDER BY period", params)
+
+    def entity_period_totals(self, period: str = 'M') -> pd.DataFrame:
+        """
+        Columns entity, period and amount: spending per (vendor, month) with the month
+        ordinal, or per (vendor, week) with the week's last day (Sunday) for period 'W'.
+        Groups are in order of first appearance.
+        """
+        key = MONTH_ORDINAL.format(date=self.col('date')) if period == 'M' else f"date({self.col('date')}, 'weekday 0')"
+        where, params = self.where(f"{self.col('vendor_id')} IS NOT NULL", f"{key} IS NOT NULL")
+        return self.query(f"SELECT {self.col('vendor_id')} AS entity, {key} AS period, TOTAL({self.col('amount')}) AS amount "
+                          f"FROM {_quote(self.table)}{where} GROUP BY entity, period ORDER BY MIN(rowid)", params)
+
+    def entity_day_counts(self) -> pd.DataFrame:
+        """Columns entity, day (ISO date) and count: dated transactions per vendor and day."""
+        day = DAY.format(date=self.col('date'))
+        where, params = self.where(f"{self.col('vendor_id')} IS NOT NULL", f"{self.col('date')} IS NOT NULL")
+        return self.query(f"SELECT {self.col('vendor_id')} AS entity, {day} AS day, COUNT(*) AS count "
+                          f"FROM {_quote(self.table)}{where} GROUP BY entity, day", params)
+
+    def entity_day_events(self, days: pd.DataFrame) -> pd.DataFrame:
+        """
+        Columns entity, date, amount and id of the transactions on the given
+        (entity, day) pairs, which are joined through a temporary table.
+        """
+        day = DAY.format(date=f"t.{self.col('date')}")
+        connection = self.connection
+        connection.execute("CREATE TEMP TABLE IF NOT EXISTS _ih_days (_ih_entity, _ih_day, PRIMARY KEY (_ih_entity, _ih_day))")
+        try:
+            connection.executemany("INSERT OR IGNORE INTO temp._ih_days VALUES (?, ?)", days[['entity', 'day']].itertuples(index=False, name=None))
+            where, params = self.where()
+            where = where.replace(" WHERE ", " AND ", 1) if where else ""
+            transaction_id = self.col('transaction_id') if 'transaction_id' in self.table_columns() else "rowid - 1"
+            return self.query(f"SELECT t.{self.col('vendor_id')} AS entity, t.{self.col('date')} AS date, t.{self.col('amount')} AS amount, "
+                              f"t.{transaction_id} AS id FROM {_quote(self.table)} AS t JOIN temp._ih_days AS d "
+                              f"ON t.{self.col('vendor_id')} = d._ih_entity AND {day} = d._ih_day{where} ORDER BY t.rowid", params)
+        finally:
+            connection.execute("DROP TABLE temp._ih_days")
+
+    def edge_totals(self) -> pd.DataFrame:
+        """
+        Columns source, target, amount, count, first_date and last_date per
+        (sender, receiver) pair, in order of first appearance.
+        """
+        sender, receiver, date = self.col('sender_id'), self.col('receiver_id'), self.col('date')
+        where, params = self.where()
+        return self.query(f"SELECT {sender} AS source, {receiver} AS target, TOTAL({self.col('amount')}) AS amount, COUNT(*) AS count, "
+                          f"MIN({date}) AS first_date, MAX({date}) AS last_date FROM {_quote(self.table)}{where} "
+                          f"GROUP BY source, target ORDER BY MIN(rowid)", params)
+
+    def distinct_names(self) -> pd.DataFrame:
+        """Column vendor_name: every distinct vendor name, in order of first appearance."""
+        name = self.col('vendor_name')
+        where, params = self.where()
+        return self.query(f"SELECT {name} AS vendor_name FROM {_quote(self.table)}{where} GROUP BY {name} ORDER BY MIN(rowid)", params)
@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List
+
+PREFIXES = ["PT.", "CV.", "UD.", "Koperasi"]
+WORDS = [
+    "Maju", "Jaya", "Sumber", "Makmur", "Berdikari", "Sentosa", "Abadi", "Karya", "Mandiri", "Sejahtera",
+    "Bangun", "Persada", "Nusantara", "Cahaya", "Mulia", "Harapan", "Indah", "Lestari", "Prima", "Utama",
+    "Sinar", "Bintang", "Mitra", "Teknik", "Global", "Sarana", "Cipta", "Graha", "Putra", "Agung",
+    "Buana", "Wijaya", "Perkasa", "Gemilang", "Samudra", "Pratama", "Kencana", "Mega", "Surya", "Anugrah"
+]
+
+class SyntheticDataGenerator:
+    """
+    Vectorized, seeded generator of transaction exports at any scale (10M+ rows),
+    with planted anomalies whose ground truth is kept in `planted`.
+
+    Vendors follow a Zipf-like popularity and a per-vendor amount scale; each is
+    paid mostly by one home agency. A name_noise share of vendors also appears
+    under a misspelled variant name. Planted: payment cycles between vendors,
+    and per group of anomalous_vendors vendors one huge transaction (RSF), a burst
+    within an hour (velocity), fiscal year-end dumping and fabricated amounts
+    starting with 5 (Benford).
+    """
+    def __init__(self, vendors: int = 1000, agencies: int = 50, name_noise: float = 0.1, cycles: int = 20,
+                 max_cycle_length: int = 6, anomalous_vendors: int = 10, start: str = '2024-01-01',
+                 days: int = 730, fiscal_year_end: int = 12, seed: int = 42):
+        if vendors < max(max_cycle_length, 4 * anomalous_vendors, 2):
+            raise ValueError("Too few vendors for the planted cycles and anomalies")
+        self.vendors = vendors
+        self.agencies = agencies
+        self.name_noise = name_noise
+        self.cycles = cycles
+        self.max_cycle_length = max(3, max_cycle_length)
+        self.anomalous_vendors = anomalous_vendors
+        self.start = pd.Timestamp(start)
+        self.days = days
+        self.fiscal_year_end = fiscal_year_end
+        self.seed = seed
+        self.planted: Dict[str, Any] = {}
+
+    def vendor_names(self, rng: np.random.Generator) -> List[str]:
+        """One distinct canonical name per vendor."""
+        combos = len(PREFIXES) * len(WORDS) ** 2
+        names = []
+        for i in rng.permutation(self.vendors).tolist():
+            name = f"{PREFIXES[(i // len(WORDS) ** 2) % len(PREFIXES)]} {WORDS[i % len(WORDS)]} {WORDS[(i // len(WORDS)) % len(WORDS)]}"
+            names.append(name if i < combos else f"{name} {i // combos + 1}")
+        return names
+
+    @staticmethod
+    def name_variant(name: str, kind: int, position: int) -> str:
+        """A misspelling of name: double space, dropped period, upper case or two swapped letters."""
+        if kind == 0:
+            return name.replace(" ", "  ", 1)
+        if kind == 1 and "." in name:
+            return name.replace(".", "", 1)
+        if kind == 2:
+            return name.upper()
+        i = 1 + position % max(len(name) - 2, 1)
+        return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+
+    def generate(self, rows: int) -> pd.DataFrame:
+        """
+        Columns: transaction_id, date, amount, vendor_name, vendor_id, sender_id and
+        receiver_id (names and IDs as categoricals).
+        """
+        rng = np.random.default_rng(self.seed)
+        names = self.vendor_names(rng)
+        agencies = [f"Dinas_{k:03d}" for k in range(self.agencies)]
+
+        # Misspelled variants, skipping any that collide with another name.
+        known = set(names)
+        noisy = np.flatnonzero(rng.random(self.vendors) < self.name_noise)
+        kinds = rng.integers(0, 4, len(noisy))
+        variant_code = np.full(self.vendors, -1)
+        variants = []
+        for vendor, kind in zip(noisy.tolist(), kinds.tolist()):
+            variant = self.name_variant(names[vendor], kind, vendor)
+            if variant not in known:
+                known.add(variant)
+                variant_code[vendor] = self.vendors + len(variants)
+                variants.append(variant)
+
+        popularity = 1.0 / np.arange(1, self.vendors + 1) ** 1.1
+        vendor = rng.choice(self.vendors, rows, p=popularity / popularity.sum())
+        scale = rng.lognormal(10, 1, self.vendors)
+        amount = np.round(scale[vendor] * rng.lognormal(0, 1, rows), 2)
+        seconds = rng.integers(0, self.days * 86400, rows)
+        home = rng.integers(0, self.agencies, self.vendors)
+        sender = np.where(rng.random(rows) < 0.8, home[vendor], rng.integers(0, self.agencies, rows))
+        receiver = np.zeros(rows, dtype=np.int64)
+
+        planted_rows = self.cycles * self.max_cycle_length + self.anomalous_vendors * (1 + 25 + 20 + 30)
+        if planted_rows > rows // 2:
+            raise ValueError(f"At least {2 * planted_rows} rows are needed for the planted anomalies")
+        free = iter(np.split(rng.choice(rows, planted_rows, replace=False), np.cumsum(
+            [self.max_cycle_length] * self.cycles + [1, 25, 20, 30] * self.anomalous_vendors)[:-1]))
+
+        # Cycles: vendor i pays vendor i + 1 (the last pays the first) a decaying amount on consecutive days.
+        cycles = []
+        for _ in range(self.cycles):
+            idx = next(free)
+            length = int(rng.integers(3, self.max_cycle_length + 1))
+            idx = idx[:length]
+            members = rng.choice(self.vendors, length, replace=False)
+            sender[idx] = self.agencies + members
+            receiver[idx] = vendor[idx] = np.roll(members, -1)
+            amount[idx] = np.round(rng.lognormal(13, 0.5) * 0.97 ** np.arange(length), 2)
+            seconds[idx] = rng.integers(0, (self.days - length) * 86400) + np.arange(length) * 86400
+            cycles.append([names[m] for m in members])
+
+        groups = rng.choice(self.vendors // 2, 4 * self.anomalous_vendors, replace=False).reshape(4, -1)
+        year_ends = pd.date_range(self.start, periods=max(self.days // 28, 1), freq='MS')
+        year_ends = year_ends[year_ends.month == self.fiscal_year_end]
+        for rsf, burst, dumping, benford in groups.T.tolist():
+            idx = next(free)
+            vendor[idx] = rsf
+            amount[idx] = np.round(scale[rsf] * 100, 2)
+            idx = next(free)
+            vendor[idx] = burst
+            seconds[idx] = rng.integers(0, self.days * 86400 - 3600) + np.sort(rng.integers(0, 3600, len(idx)))
+            idx = next(free)
+            vendor[idx] = dumping
+            amount[idx] = np.round(scale[dumping] * rng.lognormal(2.5, 0.3, len(idx)), 2)
+            if len(year_ends):
+                month_start = (year_ends[rng.integers(0, len(year_ends))] - self.start).total_seconds()
+                seconds[idx] = int(month_start) + rng.integers(0, 28 * 86400, len(idx))
+            idx = next(free)
+            vendor[idx] = benford
+            amount[idx] = (500 + rng.integers(0, 100, len(idx))) * 10.0 ** rng.integers(2, 5, len(idx))
+        # Agencies pay the row's vendor; cycle rows keep their vendor-to-vendor edge.
+        receiver = np.where(sender < self.agencies, vendor, receiver)
+
+        use_variant = (variant_code[vendor] >= 0) & (rng.random(rows) < 0.3)
+        name_code = np.where(use_variant, variant_code[vendor], vendor)
+        self.planted = {
+            "cycles": cycles,
+            "rsf_vendors": groups[0].tolist(),
+            "velocity_vendors": groups[1].tolist(),
+            "year_end_vendors": groups[2].tolist(),
+            "benford_vendors": groups[3].tolist(),
+            "name_variants": {names[v]: variants[variant_code[v] - self.vendors] for v in np.flatnonzero(variant_code >= 0).tolist()}
+        }
+        return pd.DataFrame({
+            "transaction_id": np.arange(rows),
+            "date": self.start + pd.to_timedelta(seconds, unit='s'),
+            "amount": amount,
+            "vendor_name": pd.Categorical.from_codes(name_code, names + variants),
+            "vendor_id": vendor,
+            "sender_id": pd.Categorical.from_codes(sender, agencies + names),
+            "receiver_id": pd.Categorical.from_codes(receiver, names)
+        })
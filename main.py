@@ -1,41 +1,209 @@
 import argparse
 import sys
 import json
-from ih_korupsi.utils.data_loader import DataLoader
-from ih_korupsi.core.engine import FraudEngine
-from ih_korupsi.utils.report_generator import ReportGenerator
+from ih_korupsi.core.registry import BUILTIN_DETECTORS, registry
 
 def main():
     parser = argparse.ArgumentParser(description="IH-Korupsi: Open Source Forensic Data Toolkit")
-    parser.add_argument("--input", type=str, help="Path to input data (CSV/JSON)")
-    parser.add_argument("--type", type=str, choices=['csv', 'json', 'sample'], default='sample', help="Data format")
+    parser.add_argument("--input", type=str, help="Path to input data (CSV/JSON/Parquet/Feather), or a directory or glob pattern (quoted) of partition files")
+    parser.add_argument("--type", type=str, choices=['csv', 'json', 'parquet', 'feather', 'sql', 'sample'], default='sample', help="Data format")
     parser.add_argument("--output", type=str, default="fraud_report.json", help="Path to JSON report output")
+    parser.add_argument("--output-format", type=str, choices=['json', 'compact', 'jsonl'], default='json', help="Report format: indented JSON, compact JSON, or JSON Lines with one line per finding")
     parser.add_argument("--html", type=str, help="If provided, save a visual HTML report to this path")
+    parser.add_argument("--page-size", type=int, default=100, help="Rows per page of the HTML report's tables")
+    parser.add_argument("--html-max-rows", type=int, help="Cap the rows of every HTML table (the JSON report keeps all findings)")
+    parser.add_argument("--mode", type=str, choices=['sequential', 'thread', 'process'], default='sequential', help="How detectors are executed")
+    parser.add_argument("--workers", type=int, help="Worker count for thread/process mode (default: one per detector), or for partitioned input (default: one per core)")
+    parser.add_argument("--timeout", type=float, help="Per-detector timeout in seconds for thread/process mode")
+    parser.add_argument("--date-from", type=str, help="Only analyze transactions on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--date-to", type=str, help="Only analyze transactions on or before this date (YYYY-MM-DD)")
+    parser.add_argument("--convert", type=str, metavar="PATH", help="Convert the --input CSV to Parquet (or Feather for .feather/.arrow) at PATH and exit")
+    parser.add_argument("--chunksize", type=int, help="Stream the input in chunks of this many rows (bounded memory; JSON must be JSON Lines)")
+    parser.add_argument("--state-dir", type=str, help="Incremental mode: add --input to the detector states kept in this directory and report on all batches so far")
+    parser.add_argument("--sql-table", type=str, default="transactions", help="Table holding the transactions for --type sql")
+    parser.add_argument("--sql-columns", type=str, help="Column names of the SQL table that differ, e.g. vendor_id=supplier_code,date=posted_at")
+    parser.add_argument("--cache-dir", type=str, default=".ih_korupsi_cache", help="Directory of cached detector findings, reused when a detector's input columns and settings are unchanged")
+    parser.add_argument("--cache-size", type=int, default=1024, help="Cache size limit in MB; least recently used findings are evicted beyond it")
+    parser.add_argument("--no-cache", action="store_true", help="Neither read nor write cached findings")
+    parser.add_argument("--trace", type=str, metavar="PATH", help="Write a trace of engine stages and detector sub-steps to PATH")
+    parser.add_argument("--trace-format", type=str, choices=['chrome', 'json'], default='chrome', help="Trace format: Chrome trace events (chrome://tracing, Perfetto) or plain JSON")
+    parser.add_argument("--trace-memory", action="store_true", help="Also measure the memory each span allocates (tracemalloc; slower)")
+    parser.add_argument("--profile", action="store_true", help="Profile every detector call with cProfile; the top functions go into the report metadata and the trace")
+    parser.add_argument("--detectors", type=str, help=f"Comma-separated detectors to run (default: all): {', '.join(BUILTIN_DETECTORS)} or installed plugins")
+    parser.add_argument("--skip", type=str, help="Comma-separated detectors not to run")
+    parser.add_argument("--serve", action="store_true", help="Run as a server that keeps datasets loaded and answers jobs over HTTP (--input is preloaded as dataset 'default')")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Address the server listens on")
+    parser.add_argument("--port", type=int, default=8765, help="Port the server listens on")
+    parser.add_argument("--socket", type=str, help="Listen on this Unix socket instead of a TCP port")
+    parser.add_argument("--risk-index", type=str, metavar="DIR", help="Also join all findings into a per-vendor and per-transaction risk index saved in DIR")
+    parser.add_argument("--query-index", type=str, metavar="DIR", help="Query the risk index in DIR (see --top, --entity, --signal) and exit")
+    parser.add_argument("--top", type=int, default=10, help="Entries --query-index returns")
+    parser.add_argument("--entity", type=str, help="With --query-index: everything on this vendor (ID, name or graph label)")
+    parser.add_argument("--signal", type=str, help="With --query-index: only vendors with this signal (e.g. rsf, benford, velocity, ghost)")
+    parser.add_argument("--quick", action="store_true", help="Quick triage: estimate the Mathematician's Benford/outlier tests and the Chronologist's monthly profile from a stratified sample, with confidence intervals")
+    parser.add_argument("--sample-size", type=int, default=100000, help="Rows --quick samples at most")
+    parser.add_argument("--quick-time", type=float, default=60.0, help="Seconds --quick spends reading the input at most; estimates then cover the rows read (0: no limit)")
+    parser.add_argument("--list-detectors", action="store_true", help="List the available detectors, including installed plugins, and exit")
     
     args = parser.parse_args()
 
+    if args.list_detectors:
+        print("\n".join(registry.names()))
+        return
+
+    if args.query_index:
+        # Needs only NumPy: the index columns are memory-mapped, nothing is recomputed.
+        from ih_korupsi.core.risk_index import RiskIndex
+        index = RiskIndex.load(args.query_index)
+        try:
+            if args.entity:
+                result = index.entity(args.entity, args.top)
+            else:
+                result = {"entities": index.top_entities(args.top, args.signal), "transactions": index.top_transactions(args.top)}
+        except (KeyError, ValueError) as e:
+            print(f"Error: {e.args[0]}")
+            sys.exit(1)
+        print(json.dumps(result, indent=4, default=str))
+        return
+
+    # Imported after parsing so --help stays fast: these pull in pandas, and only
+    # the selected detectors' modules are imported (see core.registry).
+    from ih_korupsi.utils.data_loader import DataLoader
+    from ih_korupsi.core.engine import FraudEngine
+    from ih_korupsi.core.state_store import StateStore
+    from ih_korupsi.core.cache import ResultCache
+    from ih_korupsi.core.tracing import Tracer
+    from ih_korupsi.utils.report_generator import ReportGenerator
+    from ih_korupsi.utils.sql_source import SQLSource
+    from ih_korupsi.core.risk_index import INDEX_COLUMNS
+
     print("--- IH-Korupsi Forensic Toolkit ---")
     
-    if args.type == 'sample':
+    if args.convert:
+        if not args.input:
+            print("Error: --input is required for --convert.")
+            sys.exit(1)
+        target_format = 'feather' if args.convert.endswith(('.feather', '.arrow')) else 'parquet'
+        DataLoader.convert_csv(args.input, args.convert, target_format)
+        print(f"Converted {args.input} to {target_format} at {args.convert}")
+        return
+
+    try:
+        detectors = registry.select(args.detectors.split(',') if args.detectors else None, args.skip.split(',') if args.skip else None)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if not detectors:
+        print("Error: no detectors left to run.")
+        sys.exit(1)
+    if args.quick and (args.state_dir or args.risk_index):
+        print("Error: --quick only estimates; it cannot be combined with --state-dir or --risk-index.")
+        sys.exit(1)
+    if args.risk_index and args.state_dir:
+        print("Error: --risk-index needs every transaction the report covers; it cannot be combined with --state-dir.")
+        sys.exit(1)
+    if args.state_dir and len(detectors) < len(registry.names()):
+        print("Error: --state-dir keeps the state of every detector; it cannot be combined with --detectors or --skip.")
+        sys.exit(1)
+
+    date_range = (args.date_from, args.date_to) if args.date_from or args.date_to else None
+    if args.serve:
+        import asyncio
+        from ih_korupsi.core.server import AnalysisServer
+        server = AnalysisServer(workers=args.workers)
+        if args.type == 'sample':
+            server.add_dataset('default', DataLoader.generate_sample_data(500, date_range), 'sample')
+        elif args.input:
+            print(f"Loading {args.input} as dataset 'default'...")
+            server.add_dataset('default', DataLoader.load(args.input, args.type, date_range=date_range), args.input)
+        print(f"Serving on {args.socket or f'http://{args.host}:{args.port}'} (Ctrl+C to stop)")
+        try:
+            asyncio.run(server.serve(args.host, args.port, args.socket))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    cache = None if args.no_cache else ResultCache(args.cache_dir, args.cache_size * 1024 * 1024)
+    tracer = Tracer(memory=args.trace_memory, profile=args.profile) if args.trace or args.trace_memory or args.profile else None
+    engine = FraudEngine(mode=args.mode, workers=args.workers, timeout=args.timeout, cache=cache, tracer=tracer, detectors=detectors)
+    columns = engine.input_columns()
+    df = None
+
+    if args.quick:
+        import contextlib
+        from ih_korupsi.core.quick_scan import QUICK_COLUMNS
+        opened = contextlib.ExitStack()
+        if args.type == 'sample':
+            chunks = iter([DataLoader.generate_sample_data(500, date_range)])
+        elif not args.input:
+            print("Error: --input is required for non-sample data.")
+            sys.exit(1)
+        elif args.type == 'sql':
+            mapping = dict(pair.split('=', 1) for pair in args.sql_columns.split(',')) if args.sql_columns else None
+            source = opened.enter_context(SQLSource(args.input, args.sql_table, mapping, date_range))
+            chunks = source.iter_chunks(QUICK_COLUMNS, args.chunksize or 100000)
+        else:
+            import itertools
+            import random
+            sources = DataLoader.expand_sources(args.input, args.type)
+            # Partitions are read in random order, so a time-limited scan is not confined to the first ones.
+            random.Random(0).shuffle(sources)
+            chunks = itertools.chain.from_iterable(DataLoader.iter_chunks(path, args.type, args.chunksize or 100000, QUICK_COLUMNS, date_range) for path in sources)
+        try:
+            with opened:
+                report = engine.process_quick(chunks, args.sample_size, args.quick_time or None)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        print("Quick scan: findings worth an exact run: " + (", ".join(report["metadata"]["quick_scan"]["exact_run"]) or "none"))
+    elif args.type == 'sample':
         print("Generating 500 rows of synthetic transaction data...")
-        df = DataLoader.generate_sample_data(500)
+        df = DataLoader.generate_sample_data(500, date_range)
+        report = engine.process(df)
     else:
         if not args.input:
             print("Error: --input is required for non-sample data.")
             sys.exit(1)
-        df = DataLoader.load(args.input, args.type)
+        sources = DataLoader.expand_sources(args.input, args.type)
+        partitioned = sources != [args.input]
+        if args.state_dir and partitioned:
+            print("Error: --state-dir takes one file per run; ingest partitions one at a time.")
+            sys.exit(1)
+        if args.state_dir:
+            chunks = DataLoader.iter_chunks(args.input, args.type, args.chunksize or 100000, columns, date_range)
+            report = engine.process_chunks(chunks, StateStore(args.state_dir), batch_id=DataLoader.fingerprint(args.input))
+        elif args.type == 'sql' and not partitioned:
+            mapping = dict(pair.split('=', 1) for pair in args.sql_columns.split(',')) if args.sql_columns else None
+            with SQLSource(args.input, args.sql_table, mapping, date_range) as source:
+                report = engine.process_sql(source, args.chunksize or 100000)
+                if args.risk_index:
+                    df = source.load(INDEX_COLUMNS)
+        elif partitioned:
+            report = engine.process_partitions(sources, args.type, columns, date_range, args.chunksize)
+        elif args.chunksize:
+            report = engine.process_chunks(DataLoader.iter_chunks(args.input, args.type, args.chunksize, columns, date_range))
+        else:
+            df = DataLoader.load(args.input, args.type, columns, date_range)
+            report = engine.process(df)
+        if args.risk_index and df is None:
+            # Streamed inputs were never held in memory; the index only needs these columns.
+            import pandas as pd
+            df = pd.concat([DataLoader.load(path, args.type, INDEX_COLUMNS, date_range) for path in sources], ignore_index=True)
 
-    engine = FraudEngine()
-    report = engine.process(df)
+    if args.risk_index:
+        engine.risk_index(report, df, args.risk_index)
+        print(f"Risk index saved to {args.risk_index}")
     
     # Save JSON
-    engine.save_report(report, args.output)
+    engine.save_report(report, args.output, args.output_format)
+    if args.trace:
+        tracer.save(args.trace, args.trace_format)
+        print(f"Trace saved to {args.trace}")
     
     # Save HTML if requested
     if args.html:
-        html_content = ReportGenerator.generate_html(report)
         with open(args.html, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+            ReportGenerator.write_html(report, f, args.page_size, args.html_max_rows)
         print(f"Visual HTML report saved to {args.html}")
 
     print("Analysis complete. Check the report for detailed mathematical evidence.")
@@ -0,0 +1,46 @@
+import json
+import math
+
+import pandas as pd
+import pytest
+
+from ih_korupsi.utils.synthetic import SyntheticDataGenerator
+
+
+@pytest.fixture(scope="session")
+def transactions() -> pd.DataFrame:
+    """6,000 synthetic rows over a year with planted anomalies, in time order."""
+    df = SyntheticDataGenerator(vendors=200, agencies=10, cycles=5, days=365, seed=7).generate(6000)
+    return df.sort_values('date', kind='stable').reset_index(drop=True)
+
+
+def normalized_findings(report: dict) -> dict:
+    """The findings as plain JSON, with the unordered community samples sorted."""
+    findings = json.loads(json.dumps(report["findings"], default=str))
+    communities = findings.get("The Connector", {}).get("communities")
+    if communities:
+        communities["sample_large_clusters"] = sorted(sorted(c) for c in communities["sample_large_clusters"])
+    return findings
+
+
+def assert_same(expected, actual, path="findings"):
+    """Equal up to floating-point rounding (sums depend on the folding order)."""
+    if isinstance(expected, dict):
+        assert isinstance(actual, dict) and set(expected) == set(actual), path
+        for key in expected:
+            assert_same(expected[key], actual[key], f"{path}/{key}")
+    elif isinstance(expected, list):
+        assert isinstance(actual, list) and len(expected) == len(actual), path
+        for i, (a, b) in enumerate(zip(expected, actual)):
+            assert_same(a, b, f"{path}[{i}]")
+    elif isinstance(expected, float) and isinstance(actual, float):
+        assert math.isclose(expected, actual, rel_tol=1e-9, abs_tol=1e-9) or (math.isnan(expected) and math.isnan(actual)), path
+    else:
+        assert expected == actual, path
+
+
+@pytest.fixture
+def assert_same_findings():
+    def check(expected: dict, actual: dict):
+        assert_same(normalized_findings(expected), normalized_findings(actual))
+    return check
@@ -0,0 +1,73 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from ih_korupsi.detectors.connector import Connector
+
+
+def random_graph(seed: int, nodes: int = 40, p: float = 0.08) -> nx.DiGraph:
+    G = nx.gnp_random_graph(nodes, p, seed=seed, directed=True)
+    rng = np.random.default_rng(seed)
+    for source, target in G.edges:
+        G[source][target]['amount'] = float(rng.lognormal(10, 1))
+    return G
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("weight", [None, 'amount'])
+def test_pagerank_matches_networkx(seed, weight):
+    G = random_graph(seed)
+    expected = nx.pagerank(G, weight=weight, tol=1e-10)
+    pagerank = Connector.pagerank_csr(Connector.to_csr(G, weight), tol=1e-10)
+    np.testing.assert_allclose(pagerank, [expected[node] for node in G], atol=1e-8)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("k", [None, 10])
+def test_betweenness_matches_networkx(seed, k):
+    G = random_graph(seed)
+    expected = nx.betweenness_centrality(G, k=k, seed=seed)
+    betweenness = Connector.betweenness_csr(Connector.to_csr(G), k, seed)
+    np.testing.assert_allclose(betweenness, [expected[node] for node in G], atol=1e-12)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("length", [None, 3])
+def test_cycle_count_matches_networkx(seed, length):
+    G = random_graph(seed, nodes=25, p=0.12)
+    G.add_edge(0, 0, amount=1.0)
+    expected = sum(1 for _ in nx.simple_cycles(G, length_bound=length))
+    cycles = Connector(max_cycle_length=length, cycle_time_budget=None).detect_cycles(G)
+    assert cycles["cycles_count"] == expected
+    assert cycles["cycles_count_is_exact"]
+
+
+def test_cycle_count_is_a_lower_bound_past_max_cycles():
+    G = random_graph(0, nodes=25, p=0.15)
+    cycles = Connector(max_cycles=10).detect_cycles(G)
+    assert cycles["cycles_count"] == 10
+    assert not cycles["cycles_count_is_exact"] and cycles["stopped_by"] == "max_cycles"
+
+
+def test_ranked_sample_holds_the_largest_cycles():
+    G = random_graph(1, nodes=25, p=0.12)
+    amounts = sorted((Connector.cycle_amount(G, cycle) for cycle in nx.simple_cycles(G)), reverse=True)
+    cycles = Connector(rank_cycles_by_amount=True, cycle_time_budget=None).detect_cycles(G, sample_size=5)
+    np.testing.assert_allclose(cycles["sample_cycle_amounts"], amounts[:5])
+
+
+def test_graph_keeps_every_transfer(transactions):
+    connector = Connector()
+    G = connector.build_graph(connector.aggregate_edges(transactions))
+    totals = transactions.groupby(['sender_id', 'receiver_id'], observed=True)['amount'].agg(['sum', 'size'])
+    assert G.number_of_edges() == len(totals)
+    for (source, target), row in totals.iterrows():
+        assert G[source][target]['amount'] == pytest.approx(row['sum'])
+        assert G[source][target]['count'] == row['size']
+
+
+def test_compact_graph_gives_the_same_findings(transactions, assert_same_findings):
+    def report(connector):
+        return {"findings": {connector.name: connector.run(transactions)}}
+    # Components are searched in another order, so the sample is ranked to compare it.
+    assert_same_findings(report(Connector(rank_cycles_by_amount=True)), report(Connector(rank_cycles_by_amount=True, compact=True)))
@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+from ih_korupsi.core.engine import FraudEngine
+from ih_korupsi.core.state_store import StateStore
+from ih_korupsi.utils.data_loader import DataLoader
+
+
+def write_monthly_batches(df, directory) -> list:
+    paths = []
+    for month, rows in df.groupby(df['date'].dt.to_period('M'), sort=True):
+        path = os.path.join(directory, f"{month}.csv")
+        rows.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def ingest(engine, path, store):
+    return engine.process_chunks(DataLoader.iter_chunks(path, 'csv', 500), store, DataLoader.fingerprint(path))
+
+
+@pytest.mark.parametrize("compact_segments", [3, 16])
+def test_incremental_runs_match_process(transactions, assert_same_findings, tmp_path, monkeypatch, compact_segments):
+    monkeypatch.setattr(StateStore, "COMPACT_SEGMENTS", compact_segments)
+    paths = write_monthly_batches(transactions, tmp_path)
+    engine = FraudEngine()
+    for path in paths:
+        report = ingest(engine, path, StateStore(str(tmp_path / "state")))
+
+    assert report["metadata"]["total_rows"] == len(transactions)
+    assert report["metadata"]["incremental"]["batches_ingested"] == len(paths)
+    transactions.to_csv(tmp_path / "all.csv", index=False)
+    assert_same_findings(engine.process(DataLoader.load(str(tmp_path / "all.csv"))), report)
+
+    segments = StateStore(str(tmp_path / "state")).load_metadata()["segments"]
+    assert 1 <= len(segments) < compact_segments
+    assert len(os.listdir(tmp_path / "state")) == 1 + len(segments) * len(engine.detectors)
+
+
+def test_repeated_batch_is_not_counted_twice(transactions, assert_same_findings, tmp_path):
+    path = write_monthly_batches(transactions.head(1000), tmp_path)[0]
+    engine = FraudEngine()
+    first = ingest(engine, path, StateStore(str(tmp_path / "state")))
+    again = ingest(engine, path, StateStore(str(tmp_path / "state")))
+    assert again["metadata"]["incremental"]["new_rows"] == 0
+    assert again["metadata"]["total_rows"] == first["metadata"]["total_rows"]
+    assert_same_findings(first, again)
@@ -0,0 +1,68 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ih_korupsi.utils.quantile_sketch import QuantileSketch
+
+
+def random_parts(seed: int, parts: int = 4, rows: int = 3000) -> list:
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        'entity': rng.integers(0, 20, rows),
+        'period': rng.integers(0, 6, rows),
+        'amount': np.r_[rng.lognormal(8, 2, rows - 30), np.zeros(10), -np.ones(10), np.full(10, np.nan)]
+    })
+    frame = frame.sample(frac=1, random_state=seed)
+    return [frame.iloc[i::parts] for i in range(parts)]
+
+
+def sketch_of(frame: pd.DataFrame, accuracy: float = 0.01) -> QuantileSketch:
+    return QuantileSketch(['entity', 'period'], accuracy).update(frame, frame['amount'].to_numpy())
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_merge_is_order_independent(seed):
+    sketches = [sketch_of(part) for part in random_parts(seed)]
+    expected = sketch_of(pd.concat(random_parts(seed))).counts.sort_index()
+    for order in itertools.permutations(sketches):
+        merged = order[0]
+        for sketch in order[1:]:
+            merged = merged.merge(sketch)
+        pd.testing.assert_series_equal(merged.counts.sort_index(), expected, check_names=False)
+    # Merging is associative too: (a + b) + (c + d).
+    tree = sketches[0].merge(sketches[1]).merge(sketches[2].merge(sketches[3]))
+    pd.testing.assert_series_equal(tree.counts.sort_index(), expected, check_names=False)
+
+
+@pytest.mark.parametrize("accuracy", [0.01, 0.05])
+def test_quantiles_within_relative_accuracy(accuracy):
+    frame = pd.concat(random_parts(0))
+    sketch = sketch_of(frame, accuracy)
+    for q in (0.1, 0.5, 0.9):
+        estimates = sketch.quantile(q)
+        # The sketch returns the value of rank floor(q (n - 1)); zeros and negatives sort first.
+        for (entity, period), amounts in frame.dropna().groupby(['entity', 'period'])['amount']:
+            exact = np.sort(amounts.to_numpy())[int(np.floor(q * (len(amounts) - 1)))]
+            estimate = estimates.loc[(entity, period)]
+            if exact > 0:
+                assert abs(estimate - exact) <= accuracy * exact * (1 + 1e-9)
+            else:
+                assert estimate == 0
+
+
+def test_rollup_matches_coarser_sketch():
+    frame = pd.concat(random_parts(1))
+    rolled = sketch_of(frame).rollup(['entity'])
+    direct = QuantileSketch(['entity']).update(frame, frame['amount'].to_numpy())
+    pd.testing.assert_series_equal(rolled.counts.sort_index(), direct.counts.sort_index(), check_names=False)
+
+
+def test_subset_keeps_only_the_given_groups():
+    frame = pd.concat(random_parts(2))
+    sketch = sketch_of(frame)
+    wanted = sketch.count().index[:5]
+    subset = sketch.subset(wanted)
+    assert list(subset.count().index) == list(wanted)
+    pd.testing.assert_frame_equal(subset.median_mad(), sketch.median_mad().loc[wanted])
@@ -0,0 +1,29 @@
+import sqlite3
+
+import pytest
+
+import ih_korupsi.detectors.chronologist as chronologist
+from ih_korupsi.core.engine import FraudEngine
+from ih_korupsi.utils.data_loader import DataLoader
+from ih_korupsi.utils.sql_source import SQLSource
+
+
+@pytest.fixture
+def database(transactions, tmp_path) -> str:
+    path = str(tmp_path / "transactions.db")
+    table = transactions.astype({c: str for c in ('vendor_name', 'sender_id', 'receiver_id')})
+    table['date'] = table['date'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    with sqlite3.connect(path) as connection:
+        table.to_sql('transactions', connection, index=False)
+    return path
+
+
+# 0 reads only the velocity candidate days, 2 always every event.
+@pytest.mark.parametrize("event_share", [0.0, 2.0])
+def test_sql_pushdown_matches_process(database, assert_same_findings, monkeypatch, event_share):
+    monkeypatch.setattr(chronologist, "SQL_EVENT_SHARE", event_share)
+    with SQLSource(database) as source:
+        report = FraudEngine().process_sql(source, chunksize=1000)
+    expected = FraudEngine().process(DataLoader.load(database, 'sql'))
+    assert report["metadata"]["total_rows"] == expected["metadata"]["total_rows"]
+    assert_same_findings(expected, report)
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ih_korupsi.core.engine import FraudEngine
+from ih_korupsi.detectors.chronologist import Chronologist
+from ih_korupsi.detectors.mathematician import Mathematician
+
+
+def chunked(df: pd.DataFrame, size: int) -> list:
+    return [df.iloc[start:start + size] for start in range(0, len(df), size)]
+
+
+@pytest.mark.parametrize("order", ["time", "shuffled"])
+@pytest.mark.parametrize("size", [700, 6000])
+def test_chunks_match_process(transactions, assert_same_findings, order, size):
+    df = transactions if order == "time" else transactions.sample(frac=1, random_state=0).reset_index(drop=True)
+    engine = FraudEngine()
+    assert_same_findings(engine.process(df), engine.process_chunks(chunked(df, size)))
+
+
+def test_velocity_pruning_keeps_every_burst(transactions):
+    detector = Chronologist()
+    inputs = FraudEngine(detectors=[detector]).prepare_inputs(transactions)[detector.name]
+    state = detector.init_state()
+    for chunk in chunked(inputs, 200):
+        state = detector.update_state(state, chunk)
+    kept = sum(len(frame) for frame in state["events"])
+    assert kept < len(transactions) / 2
+
+    velocity = detector.finalize(state)["velocity_anomalies"]
+    expected = detector.run(inputs)["velocity_anomalies"]
+    assert velocity["incomplete_entities"] == 0
+    assert velocity["flagged_count"] > 0
+    assert velocity == expected
+
+
+def test_amount_summary_merge_matches_one_pass():
+    rng = np.random.default_rng(0)
+    amounts = np.r_[rng.lognormal(10, 1, 5000), -rng.lognormal(5, 1, 50), [0.0, np.nan, np.inf]]
+    detector = Mathematician()
+    parts = np.array_split(rng.permutation(amounts), 7)
+    merged = detector.amount_summary(parts[0])
+    for part in parts[1:]:
+        merged = detector.merge_amount_summaries(merged, detector.amount_summary(part))
+    whole = detector.amount_summary(amounts)
+
+    for key in ("count", "missing"):
+        assert merged[key] == whole[key]
+    for key in ("mean", "m2"):
+        assert merged[key] == pytest.approx(whole[key], rel=1e-9)
+    np.testing.assert_array_equal(merged["largest"], whole["largest"])
+    pd.testing.assert_series_equal(merged["sketch"].counts.sort_index(), whole["sketch"].counts.sort_index(), check_names=False)
+
+
+def test_amount_summary_outliers_are_close_to_exact(transactions):
+    detector = Mathematician()
+    amounts = transactions['amount'].to_numpy()
+    outliers = detector.outliers_from_summary(detector.amount_summary(amounts))
+    z_exact = int(np.count_nonzero(np.abs(amounts - amounts.mean()) > 3 * amounts.std()))
+    q1, q3 = np.percentile(amounts, [25, 75])
+    iqr_exact = int(np.count_nonzero((amounts < q1 - 1.5 * (q3 - q1)) | (amounts > q3 + 1.5 * (q3 - q1))))
+    assert outliers["z_score_outliers_count"] == pytest.approx(z_exact, rel=0.02, abs=2)
+    assert outliers["iqr_outliers_count"] == pytest.approx(iqr_exact, rel=0.02, abs=2)
@@ -0,0 +1,27 @@
+import random
+
+import numpy as np
+import pytest
+
+from ih_korupsi.detectors.string_detective import StringDetective
+
+
+def random_names(rng: random.Random, count: int, max_length: int) -> list:
+    alphabet = "abcdeAB .-éü漢"
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, max_length))) for _ in range(count)]
+
+
+@pytest.mark.parametrize("max_length", [8, 64, 150])
+def test_batch_ratio_matches_levenshtein_ratio(max_length):
+    # 64 and beyond cover both the vectorized and the Python-integer kernels.
+    detective = StringDetective()
+    rng = random.Random(max_length)
+    for name in random_names(rng, 20, max_length):
+        candidates = random_names(rng, 30, max_length) + [name, name[::-1], name.upper()]
+        expected = [detective.levenshtein_ratio(name, candidate) for candidate in candidates]
+        np.testing.assert_allclose(detective.batch_ratio(name, candidates), expected, rtol=0, atol=1e-12)
+
+
+def test_batch_ratio_of_empty_names():
+    np.testing.assert_array_equal(StringDetective().batch_ratio("", ["", "ab"]), [1.0, 0.0])
+